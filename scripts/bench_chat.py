@@ -0,0 +1,137 @@
+# /**
+#  * @file bench_chat.py
+#  * @brief Throughput and latency benchmark for the chat channel.
+#  *        Native protocol clients (see protocol_client.py) are connected to the chat
+#  *        port and each one sends to the next in a ring at a fixed rate. Every message
+#  *        carries its sequence number and send timestamp ("<seq>:<monotonic_ns>:xxx..."),
+#  *        so the receiver measures end-to-end latency without any clock sync.
+#  *
+#  *        Reported metrics: delivered msgs/sec, p50/p95/p99/max latency, connect
+#  *        (ID_ASSIGN) latency and lost messages. Results are written as JSON.
+#  *
+#  *        Usage:
+#  *        - python scripts/bench_chat.py --clients 10 --size 128 --rate 20 --duration 10
+#  *        - python scripts/bench_chat.py --version 2.5 --rate 0   # as fast as possible
+#  *
+#  * @author Oussama Amara
+#  * @version 1.0
+#  * @date 2025-10-22
+#  */
+
+import argparse, asyncio, re, time
+from bench_common import launch_server, percentiles, write_results, add_common_args, format_latency, BENCH_BASE_PORT
+from protocol_client import connect_clients, raise_fd_limit
+
+BENCHMARK = "chat"
+MESSAGE_RE = re.compile(r"chat (\d+):(\d+):")
+
+def make_payload(seq, size):
+    """Sequence number and send time, padded with 'x' up to `size` characters."""
+    head = f"{seq}:{time.monotonic_ns()}:"
+    return head + "x" * max(0, size - len(head))
+
+async def chat_workload(port, clients=2, size=64, rate=10.0, duration=10.0, drain=5.0, concurrency=200):
+    """
+    Runs the ring workload against a chat port and returns the metrics dict.
+    `rate` is messages/sec per client (0 = as fast as the client pacing allows).
+    """
+    peers, failures = await connect_clients(clients, port=port, concurrency=concurrency)
+    if len(peers) < 2:
+        raise RuntimeError(f"❌ Only {len(peers)} client(s) connected ({len(failures)} failure(s))")
+    await asyncio.gather(*(peer.wait_started() for peer in peers))
+
+    latencies = []
+    sent = [0]
+    received = [0]
+    last_received = [0.0]
+    all_received = asyncio.Event()
+
+    async def receive(peer):
+        while True:
+            msg = await peer.messages.get()
+            match = MESSAGE_RE.match(msg.text)
+            if not match:
+                continue
+            latencies.append(msg.received_at - int(match.group(2)) / 1e9)
+            received[0] += 1
+            last_received[0] = msg.received_at
+            if sending_done.is_set() and received[0] >= sent[0]:
+                all_received.set()
+
+    async def send(index, peer):
+        target = peers[(index + 1) % len(peers)].client_id
+        interval = 1.0 / rate if rate else 0.0
+        seq = 0
+        while time.monotonic() < stop_at:
+            await peer.send_chat(target, make_payload(seq, size))
+            sent[0] += 1
+            seq += 1
+            if interval:
+                delay = start + seq * interval - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+    sending_done = asyncio.Event()
+    receivers = [asyncio.create_task(receive(peer)) for peer in peers]
+    start = time.monotonic()
+    stop_at = start + duration
+    await asyncio.gather(*(send(i, peer) for i, peer in enumerate(peers)))
+    send_window = time.monotonic() - start
+    sending_done.set()
+    if received[0] < sent[0]:
+        try:
+            await asyncio.wait_for(all_received.wait(), drain)
+        except asyncio.TimeoutError:
+            pass
+
+    for task in receivers:
+        task.cancel()
+    await asyncio.gather(*(peer.close() for peer in peers))
+
+    elapsed = (last_received[0] - start) if received[0] else send_window
+    return {
+        "clients_connected": len(peers),
+        "connect_failures": len(failures),
+        "sent": sent[0],
+        "received": received[0],
+        "lost": sent[0] - received[0],
+        "msgs_per_sec": received[0] / elapsed if elapsed > 0 else 0.0,
+        "latency_ms": percentiles(latencies),
+        "connect_ms": percentiles([peer.connect_latency for peer in peers]),
+    }
+
+def run_benchmark(version=None, base_port=BENCH_BASE_PORT, **params):
+    """Launches a server of `version`, runs the chat workload and returns (version, metrics)."""
+    with launch_server(version, base_port) as server:
+        metrics = asyncio.run(chat_workload(server.chat_port, **params))
+    return server.version, metrics
+
+def print_summary(version, metrics):
+    print(f"📊 Chat benchmark on server {version}")
+    print(f"   - Clients    : {metrics['clients_connected']} ({metrics['connect_failures']} failed)")
+    print(f"   - Delivered  : {metrics['received']}/{metrics['sent']} ({metrics['lost']} lost)")
+    print(f"   - Throughput : {metrics['msgs_per_sec']:.1f} msgs/s")
+    print(f"   - Latency    : {format_latency(metrics['latency_ms'])}")
+    print(f"   - Connect    : {format_latency(metrics['connect_ms'])}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Chat channel throughput/latency benchmark.")
+    parser.add_argument("--clients", type=int, default=2, help="Connected clients (each sends to the next)")
+    parser.add_argument("--size", type=int, default=64, help="Message size in characters")
+    parser.add_argument("--rate", type=float, default=10.0, help="Messages/sec per client (0 = unthrottled)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of sending")
+    parser.add_argument("--drain", type=float, default=5.0, help="Seconds to wait for in-flight messages")
+    add_common_args(parser)
+    args = parser.parse_args()
+    if args.clients < 2:
+        parser.error("--clients must be at least 2")
+
+    raise_fd_limit()
+    params = {"clients": args.clients, "size": args.size, "rate": args.rate,
+              "duration": args.duration, "drain": args.drain}
+    version, metrics = run_benchmark(args.version, args.base_port, **params)
+    print_summary(version, metrics)
+    write_results(BENCHMARK, version, params, metrics, args.output)
+
+if __name__ == "__main__":
+    main()
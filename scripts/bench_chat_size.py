@@ -0,0 +1,216 @@
+# /**
+#  * @file bench_chat_size.py
+#  * @brief Chat message size scaling and chunk reassembly benchmark.
+#  *        Sends chat messages from 16 characters up to the largest message the server
+#  *        still delivers (found by bisection, the server silently drops longer ones)
+#  *        and reports per size:
+#  *        - CHUNK frames per message (the server reassembles them and forwards the
+#  *          whole message in one frame)
+#  *        - end-to-end latency (first chunk sent -> message received) and reassembly
+#  *          latency (last chunk sent -> message received)
+#  *        - server CPU time per chunk handled (chunks read plus frames forwarded)
+#  *        - integrity: every message embeds its sequence number and a CRC-32 of its body
+#  *          ("<seq>:<crc32>:<body>"), checked after reassembly
+#  *
+#  *        Messages are sent one at a time (the next one after the previous arrived), so
+#  *        latencies are not inflated by queueing. Server CPU is read from the per-thread
+#  *        /proc schedstat run time (nanoseconds; n/a where the kernel lacks it); the
+#  *        sweep-wide CPU per chunk and the latency added by each extra chunk (linear fit)
+#  *        are reported as well.
+#  *
+#  *        Usage:
+#  *        - python scripts/bench_chat_size.py
+#  *        - python scripts/bench_chat_size.py --sizes 16,256,1000 --messages 100
+#  *
+#  * @author Oussama Amara
+#  * @version 1.0
+#  * @date 2025-10-25
+#  */
+
+import argparse, asyncio, random, re, statistics, time, zlib
+from bench_common import launch_server, percentiles, write_results, add_common_args, format_latency, BENCH_BASE_PORT
+from proc_monitor import cpu_time
+from protocol import CHUNK_SIZE
+from protocol_client import connect_clients
+
+BENCHMARK = "chat_size"
+MESSAGE_RE = re.compile(r"chat (\d+):([0-9a-f]{8}):(.*)", re.S)
+BODY_CHARS = "0123456789.,;:-+=_"  # no letters, so the profanity filter never rewrites a body
+PROBE_LIMIT = 8192                 # upper bound of the size bisection
+PROBE_TIMEOUT = 1.0
+
+def make_message(seq, size):
+    """'<seq>:<crc32>:<body>' of exactly `size` characters (the head may exceed a tiny size)."""
+    head_len = len(f"{seq}:00000000:")
+    rng = random.Random(seq)
+    body = "".join(rng.choice(BODY_CHARS) for _ in range(max(0, size - head_len)))
+    return f"{seq}:{zlib.crc32(body.encode()):08x}:{body}"
+
+def check_message(text, seq):
+    """True when `text` is the intact message number `seq`."""
+    match = MESSAGE_RE.fullmatch(text)
+    return bool(match) and int(match.group(1)) == seq and int(match.group(2), 16) == zlib.crc32(match.group(3).encode())
+
+def message_seq(text):
+    match = MESSAGE_RE.match(text)
+    return int(match.group(1)) if match else None
+
+async def roundtrip(sender, receiver, seq, size, timeout):
+    """
+    Sends one message and returns (first_sent_at, last_sent_at, message, chunks);
+    message is None when it did not arrive within `timeout`. Late arrivals of
+    earlier messages are discarded, never taken for this one.
+    """
+    while not receiver.messages.empty():
+        receiver.messages.get_nowait()
+    sent_at = time.monotonic()
+    chunks = await sender.send_chat(receiver.client_id, make_message(seq, size))
+    last_sent_at = time.monotonic()
+    deadline = last_sent_at + timeout
+    message = None
+    while message is None:
+        try:
+            arrived = await asyncio.wait_for(receiver.messages.get(), max(0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            break
+        if message_seq(arrived.text) == seq:
+            message = arrived
+    return sent_at, last_sent_at, message, chunks
+
+async def find_max_size(sender, receiver, low=16, high=PROBE_LIMIT):
+    """Largest message size (characters) the server still forwards, by bisection."""
+    seq = 0
+    if (await roundtrip(sender, receiver, seq, low, PROBE_TIMEOUT))[2] is None:
+        raise RuntimeError(f"❌ Even a {low}-character message was not delivered")
+    while low < high:
+        middle = (low + high + 1) // 2
+        seq += 1
+        if (await roundtrip(sender, receiver, seq, middle, PROBE_TIMEOUT))[2] is None:
+            high = middle - 1
+        else:
+            low = middle
+    return low
+
+async def measure_size(server, sender, receiver, size, messages, timeout, first_seq):
+    delivered = [0]
+
+    def on_frame(frame, now):
+        if frame.channel == "chat":
+            delivered[0] += 1
+
+    receiver.on_frame = on_frame
+    latencies, reassembly = [], []
+    client_chunks = corrupted = lost = 0
+    cpu_before = cpu_time(server.pid)
+    for seq in range(first_seq, first_seq + messages):
+        sent_at, last_sent_at, message, chunks = await roundtrip(sender, receiver, seq, size, timeout)
+        client_chunks += chunks
+        if message is None:
+            lost += 1
+            continue
+        latencies.append(message.received_at - sent_at)
+        reassembly.append(message.received_at - last_sent_at)
+        if not check_message(message.text, seq):
+            corrupted += 1
+    cpu_after = cpu_time(server.pid)
+    cpu_s = cpu_after - cpu_before if cpu_before is not None and cpu_after is not None else None
+    receiver.on_frame = None
+
+    handled = client_chunks + delivered[0]  # chunks the server read plus frames it wrote
+    return {
+        "size": size,
+        "messages": messages,
+        "chunks_per_message": client_chunks / messages,
+        "frames_delivered_per_message": delivered[0] / max(1, messages - lost),
+        "latency_ms": percentiles(latencies),
+        "reassembly_ms": percentiles(reassembly),
+        "server_cpu_ms": cpu_s * 1000 if cpu_s is not None else None,
+        "chunks_handled": handled,
+        "server_cpu_us_per_chunk": cpu_s * 1e6 / handled if cpu_s is not None and handled else None,
+        "lost": lost,
+        "corrupted": corrupted,
+        "intact": lost == 0 and corrupted == 0,
+    }
+
+def format_cpu(us):
+    return "n/a" if us is None else f"{us:.1f}"
+
+def default_sizes(max_size):
+    sizes = []
+    size = 16
+    while size < max_size:
+        sizes.append(size)
+        size *= 2
+    # Also the last size before and the first after each chunk boundary ("chat " is sent too)
+    boundaries = [n * CHUNK_SIZE - len("chat ") for n in range(1, max_size // CHUNK_SIZE + 1)]
+    sizes += [b + d for b in boundaries for d in (0, 1) if b + d < max_size]
+    return sorted(set(sizes + [max_size]))
+
+async def size_workload(server, sizes=None, messages=20, timeout=5.0):
+    peers, failures = await connect_clients(2, port=server.chat_port)
+    if len(peers) < 2:
+        raise RuntimeError(f"❌ Only {len(peers)} client(s) connected ({len(failures)} failure(s))")
+    sender, receiver = peers
+    await asyncio.gather(sender.wait_started(), receiver.wait_started())
+    try:
+        max_size = await find_max_size(sender, receiver)
+        print(f"📏 Largest chat message delivered: {max_size} characters")
+        results = []
+        for index, size in enumerate(sorted(sizes or default_sizes(max_size))):
+            result = await measure_size(server, sender, receiver, size, messages, timeout, (index + 1) * 100000)
+            results.append(result)
+            print(f"{'✅' if result['intact'] else '❌'} {size:>5} chars: "
+                  f"{result['chunks_per_message']:.0f} chunk(s), latency {format_latency(result['latency_ms'])}, "
+                  f"reassembly p50 {result['reassembly_ms'].get('p50', 0):.2f} ms, "
+                  f"server CPU {format_cpu(result['server_cpu_us_per_chunk'])} us/chunk, "
+                  f"{result['lost']} lost, {result['corrupted']} corrupted")
+    finally:
+        await asyncio.gather(sender.close(), receiver.close())
+    points = [(r["chunks_per_message"], r["latency_ms"]["p50"]) for r in results if r["latency_ms"].get("count")]
+    slope = None
+    if len({chunks for chunks, _ in points}) > 1:
+        slope = statistics.linear_regression([c for c, _ in points], [ms for _, ms in points])[0]
+    handled = sum(r["chunks_handled"] for r in results)
+    cpu_ms = [r["server_cpu_ms"] for r in results]
+    return {
+        "max_message_size": max_size,
+        "sizes": results,
+        "latency_ms_per_chunk": slope,
+        "server_cpu_us_per_chunk": sum(cpu_ms) * 1000 / handled if handled and None not in cpu_ms else None,
+        "all_intact": all(r["intact"] for r in results),
+    }
+
+def run_benchmark(version=None, base_port=BENCH_BASE_PORT, **params):
+    """Launches a server of `version`, runs the size sweep and returns (version, metrics)."""
+    with launch_server(version, base_port) as server:
+        metrics = asyncio.run(size_workload(server, **params))
+    return server.version, metrics
+
+def main():
+    parser = argparse.ArgumentParser(description="Chat message size scaling and reassembly benchmark.")
+    parser.add_argument("--sizes", default=None, help="Comma-separated message sizes (default: 16 up to the server limit)")
+    parser.add_argument("--messages", type=int, default=20, help="Messages per size")
+    parser.add_argument("--timeout", type=float, default=5.0, help="Seconds to wait for each message")
+    add_common_args(parser)
+    args = parser.parse_args()
+    try:
+        sizes = [int(s) for s in args.sizes.split(",")] if args.sizes else None
+    except ValueError:
+        parser.error(f"Invalid --sizes: {args.sizes}")
+    if args.messages < 1:
+        parser.error("--messages must be at least 1")
+
+    params = {"sizes": sizes, "messages": args.messages, "timeout": args.timeout}
+    version, metrics = run_benchmark(args.version, args.base_port, **params)
+    print(f"📊 Chat size scaling on server {version}")
+    print(f"   - Largest message   : {metrics['max_message_size']} characters")
+    if metrics["latency_ms_per_chunk"] is not None:
+        print(f"   - Latency per chunk : {metrics['latency_ms_per_chunk']:.2f} ms")
+    if metrics["server_cpu_us_per_chunk"] is not None:
+        print(f"   - Server CPU        : {metrics['server_cpu_us_per_chunk']:.1f} us per chunk")
+    write_results(BENCHMARK, version, params, metrics, args.output)
+    if not metrics["all_intact"]:
+        raise SystemExit("❌ Some messages were lost or corrupted.")
+
+if __name__ == "__main__":
+    main()
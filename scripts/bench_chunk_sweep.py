@@ -0,0 +1,182 @@
+# /**
+#  * @file bench_chunk_sweep.py
+#  * @brief File transfer sweep over round-trip time and file size, for transfer tuning.
+#  *        Every transfer runs through fault_proxy with half the RTT added in each
+#  *        direction (optionally dropping CHUNK frames to force RETRY round trips).
+#  *        Reported per (RTT, size) cell:
+#  *        - effective MB/s and chunk rate, both over the whole REQUEST -> DONE transfer
+#  *          (the receiver's reads batch the delayed chunks, so the chunk arrivals
+#  *          alone would not give a rate)
+#  *        - startup time (REQUEST -> first CHUNK, i.e. the INCOMING/READY round trips)
+#  *        - RETRY count and stall time spent waiting after each RETRY
+#  *        - bandwidth-delay product and the window (in CHUNK_SIZE chunks) a sliding
+#  *          window transfer would need to keep the link busy at that RTT, next to
+#  *          the modeled throughput of a stop-and-wait (one ACK per chunk) transfer
+#  *
+#  *        The chunk size is fixed in the binaries (protocol.CHUNK_SIZE), so chunk size
+#  *        and window only appear in the model columns, which are derived from the
+#  *        link rate measured at the lowest RTT.
+#  *
+#  *        Results: JSON plus a long-format CSV (one row per cell) and a matrix CSV of
+#  *        MB/s (rows = RTT, columns = size), both ready for a heatmap.
+#  *
+#  *        Usage:
+#  *        - python scripts/bench_chunk_sweep.py
+#  *        - python scripts/bench_chunk_sweep.py --rtts 0,20,100 --sizes 64K,1M --loss 0.01
+#  *
+#  * @author Oussama Amara
+#  * @version 1.0
+#  * @date 2025-10-25
+#  */
+
+import argparse, asyncio, csv, math, os, statistics
+from bench_common import launch_server, write_results, add_common_args, BENCH_BASE_PORT
+from bench_file_transfer import generate_file, parse_size, format_size, transfer_file, MIN_RATE
+from fault_proxy import FaultProxy, Shaping
+from protocol import CHUNK_SIZE
+from protocol_client import ProtocolClient
+
+BENCHMARK = "chunk_sweep"
+DEFAULT_RTTS = "0,10,50,100,200"
+DEFAULT_SIZES = "16K,256K,1M"
+CSV_FIELDS = ["rtt_ms", "size", "label", "status", "mb_per_sec", "chunks_per_sec", "startup_ms",
+              "retries", "retry_stall_ms", "bdp_bytes", "window_chunks", "stop_and_wait_mb_per_sec"]
+
+async def sweep_cell(server, rtt, size, filename, loss, timeout, seed):
+    """One transfer of `filename` through a proxy adding `rtt` seconds of round trip."""
+    # Both directions get half the RTT; frames go out unpaced, the native client parses bursts
+    half = Shaping(delay=rtt / 2, gap=0.0)
+    down = Shaping(delay=rtt / 2, gap=0.0, drop=loss, match=r"\|CHUNK\|")
+    proxy = await FaultProxy([(0, server.file_port)], upstream=half, downstream=down, seed=seed).start()
+    sender = ProtocolClient(port=proxy.ports[0], name="sender")
+    receiver = ProtocolClient(port=proxy.ports[0], name="receiver", received_dir=server.received_dir)
+    try:
+        await sender.connect()
+        await receiver.connect()
+        await asyncio.gather(sender.wait_started(), receiver.wait_started())
+        transfer, requested_at = await transfer_file(sender, receiver, filename, timeout)
+    finally:
+        await asyncio.gather(sender.close(), receiver.close())
+        await proxy.close()
+        received = os.path.join(server.received_dir, filename)
+        if os.path.exists(received):
+            os.remove(received)
+
+    duration = transfer.finished_at - requested_at
+    return {
+        "status": transfer.status,
+        "mb_per_sec": transfer.bytes / duration / (1 << 20) if duration > 0 else 0.0,
+        "chunks_per_sec": transfer.chunks / duration if duration > 0 else None,
+        "startup_ms": (transfer.first_chunk_at - requested_at) * 1000 if transfer.first_chunk_at else None,
+        "retries": transfer.retries,
+        "retry_stall_ms": transfer.retry_wait * 1000,
+        "dropped": proxy.stats["down"]["dropped"],
+    }
+
+def format_rate(value):
+    return "n/a" if value is None else f"{value:.0f}"
+
+def add_window_model(cells):
+    """
+    Adds the bandwidth-delay product of each cell and what it implies for the
+    transfer window. The link rate is the best throughput at the lowest RTT (the
+    largest files, where the startup round trips weigh least).
+    """
+    if not cells:
+        return
+    base_rtt = min(c["rtt_ms"] for c in cells)
+    link = max(c["mb_per_sec"] for c in cells if c["rtt_ms"] == base_rtt) * (1 << 20)
+    for cell in cells:
+        rtt = cell["rtt_ms"] / 1000
+        cell["bdp_bytes"] = round(link * rtt)
+        cell["window_chunks"] = max(1, math.ceil(cell["bdp_bytes"] / CHUNK_SIZE))
+        per_chunk = rtt + (CHUNK_SIZE / link if link else 0.0)
+        cell["stop_and_wait_mb_per_sec"] = CHUNK_SIZE / per_chunk / (1 << 20) if per_chunk > 0 else None
+
+async def sweep_workload(server, rtts, sizes, repeat=1, loss=0.0, seed=None):
+    # An idle client keeps the accept loop awake between cells
+    keeper = ProtocolClient(port=server.chat_port, name="keeper")
+    await keeper.connect()
+    cells = []
+    try:
+        for size in sizes:
+            label = format_size(size)
+            filename = f"sweep_{label}.bin"
+            source = os.path.join(server.to_send_dir, filename)
+            generate_file(source, size)
+            for rtt_ms in rtts:
+                timeout = 30 + size / MIN_RATE + 4 * rtt_ms / 1000 * max(1, size // CHUNK_SIZE) * loss
+                runs = [await sweep_cell(server, rtt_ms / 1000, size, filename, loss, timeout,
+                                         None if seed is None else seed + i)
+                        for i in range(repeat)]
+                ok = [r for r in runs if r["status"] == "DONE"]
+                cell = {"rtt_ms": rtt_ms, "size": size, "label": label,
+                        "status": "DONE" if len(ok) == len(runs) else f"{len(ok)}/{len(runs)} DONE"}
+                for key in ("mb_per_sec", "chunks_per_sec", "startup_ms"):
+                    values = [r[key] for r in ok if r[key] is not None]
+                    cell[key] = statistics.median(values) if values else None
+                # Failed runs count here too, an unanswered RETRY stalls until the timeout
+                cell["retry_stall_ms"] = statistics.median(r["retry_stall_ms"] for r in runs)
+                cell["retries"] = sum(r["retries"] for r in runs)
+                cell["dropped"] = sum(r["dropped"] for r in runs)
+                cells.append(cell)
+                print(f"{'✅' if len(ok) == len(runs) else '❌'} {label} @ {rtt_ms:g} ms RTT: "
+                      f"{cell['mb_per_sec'] or 0:.2f} MB/s, {format_rate(cell['chunks_per_sec'])} chunks/s, "
+                      f"startup {cell['startup_ms'] or 0:.0f} ms, {cell['retries']} retries "
+                      f"({cell['retry_stall_ms'] or 0:.0f} ms stalled)")
+            os.remove(source)
+    finally:
+        await keeper.close()
+
+    add_window_model([c for c in cells if c["mb_per_sec"]])
+    return {"chunk_size": CHUNK_SIZE, "loss": loss, "repeat": repeat, "cells": cells}
+
+def write_heatmaps(cells, path):
+    """Writes the long-format CSV at `path` and a RTT x size MB/s matrix next to it."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, CSV_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(cells)
+    matrix = os.path.splitext(path)[0] + "_mbps.csv"
+    labels = list(dict.fromkeys(c["label"] for c in cells))
+    with open(matrix, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["rtt_ms"] + labels)
+        for rtt in dict.fromkeys(c["rtt_ms"] for c in cells):
+            row = {c["label"]: c["mb_per_sec"] for c in cells if c["rtt_ms"] == rtt}
+            writer.writerow([rtt] + [f"{row[label]:.4f}" if row.get(label) is not None else "" for label in labels])
+    print(f"📁 Heatmap CSVs written to {path} and {matrix}")
+
+def run_benchmark(version=None, base_port=BENCH_BASE_PORT, rtts=DEFAULT_RTTS, sizes=DEFAULT_SIZES, **params):
+    """Launches a server of `version`, runs the RTT x size sweep and returns (version, metrics)."""
+    rtt_list = [float(r) for r in rtts.split(",")] if isinstance(rtts, str) else list(rtts)
+    size_list = [parse_size(s) for s in sizes.split(",")] if isinstance(sizes, str) else list(sizes)
+    with launch_server(version, base_port) as server:
+        metrics = asyncio.run(sweep_workload(server, rtt_list, size_list, **params))
+    return server.version, metrics
+
+def main():
+    parser = argparse.ArgumentParser(description="File transfer RTT x size sweep through a delay proxy.")
+    parser.add_argument("--rtts", default=DEFAULT_RTTS, help="Comma-separated round-trip times in ms")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma-separated file sizes, e.g. 16K,1M")
+    parser.add_argument("--repeat", type=int, default=1, help="Transfers per cell (the median is reported)")
+    parser.add_argument("--loss", type=float, default=0.0, help="Probability of dropping each CHUNK frame")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for the loss")
+    add_common_args(parser)
+    args = parser.parse_args()
+    try:
+        rtts = [float(r) for r in args.rtts.split(",")]
+        sizes = [parse_size(s) for s in args.sizes.split(",")]
+    except ValueError as e:
+        parser.error(str(e))
+    if min(rtts) < 0 or args.repeat < 1 or not 0 <= args.loss < 1:
+        parser.error("RTTs must be >= 0, --repeat >= 1 and --loss in [0, 1)")
+
+    params = {"rtts": rtts, "sizes": sizes, "repeat": args.repeat, "loss": args.loss, "seed": args.seed}
+    version, metrics = run_benchmark(args.version, args.base_port, **params)
+    output = write_results(BENCHMARK, version, params, metrics, args.output)
+    write_heatmaps(metrics["cells"], os.path.splitext(output)[0] + ".csv")
+
+if __name__ == "__main__":
+    main()
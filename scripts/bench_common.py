@@ -0,0 +1,122 @@
+# /**
+#  * @file bench_common.py
+#  * @brief Shared plumbing for the benchmark scripts (bench_*.py).
+#  *        Launches the server binary of a chosen bins/ version on free ports inside a
+#  *        private workspace, summarizes latency samples and stores results as JSON
+#  *        under results/bench/ so releases can be compared run against run.
+#  *
+#  *        Functions:
+#  *        - launch_server(version): Context manager yielding a running BenchServer
+#  *        - percentiles(samples): count/mean/p50/p95/p99/max (ms) of samples in seconds
+#  *        - write_results(benchmark, version, params, metrics): Stores one JSON result file
+#  *        - add_common_args(parser): --version / --base-port / --output options
+#  *        - format_latency(stats): One-line rendering of percentiles()
+#  *
+#  * @author Oussama Amara
+#  * @version 1.0
+#  * @date 2025-10-22
+#  */
+
+import contextlib, json, logging, math, os, platform, subprocess, time
+from utils import resolve_environment, list_versions, spawn, wait_for_pattern, PORT_ENV_VARS, STARTUP_TIMEOUT
+from test_runner import allocate_ports, ROOT_DIR
+
+BENCH_DIR = os.path.join(ROOT_DIR, "results", "bench")
+BENCH_BASE_PORT = 30000   # Kept apart from the test runner's port blocks
+SERVER_LOG_LINES = 10000  # Server output kept in memory; the full log goes to server.log
+
+class BenchServer:
+    """A server binary running in its own workspace (cwd holds assets/to_send and assets/received)."""
+
+    def __init__(self, version, ports, workspace, proc, out, environment=None):
+        self.version = version
+        self.environment = environment  # resolved binaries and configs, to start matching clients
+        self.chat_port, self.file_port, self.game_port = ports
+        self.workspace = workspace
+        self.proc = proc
+        self.out = out
+        self.to_send_dir = os.path.join(workspace, "assets", "to_send")
+        self.received_dir = os.path.join(workspace, "assets", "received")
+
+    @property
+    def pid(self):
+        return self.proc.pid
+
+@contextlib.contextmanager
+def launch_server(version=None, base_port=BENCH_BASE_PORT, workspace=None):
+    environment = resolve_environment(version)
+    version = environment.version
+    ports = allocate_ports(1, base_port)[0]
+    workspace = workspace or os.path.join(
+        BENCH_DIR, "workspaces", f"{version}_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}"
+    )
+    os.makedirs(os.path.join(workspace, "assets", "to_send"), exist_ok=True)
+    os.makedirs(os.path.join(workspace, "assets", "received"), exist_ok=True)
+
+    env = os.environ.copy()
+    for channel, port in zip(("chat", "file", "game"), ports):
+        env[PORT_ENV_VARS[channel]] = str(port)
+
+    proc, out = spawn(
+        [environment.binary("server"), environment.config("server")], os.path.join(workspace, "server.log"),
+        env=env, cwd=workspace, max_lines=SERVER_LOG_LINES
+    )
+    try:
+        wait_for_pattern(out, r"Server listening", STARTUP_TIMEOUT, count=3)
+        print(f"🚀 Server {version} (pid {proc.pid}) on ports {ports[0]}/{ports[1]}/{ports[2]}")
+        yield BenchServer(version, ports, workspace, proc, out, environment)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+def percentiles(samples):
+    """Nearest-rank percentiles of durations in seconds, reported in milliseconds."""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def rank(p):
+        return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean": sum(ordered) / len(ordered) * 1000,
+        "p50": rank(50),
+        "p95": rank(95),
+        "p99": rank(99),
+        "max": ordered[-1] * 1000,
+    }
+
+def write_results(benchmark, version, params, metrics, output=None):
+    """Writes one result record as JSON and returns its path."""
+    record = {
+        "benchmark": benchmark,
+        "version": version,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": platform.node(),
+        "platform": platform.platform(),
+        "params": params,
+        "metrics": metrics,
+    }
+    output = output or os.path.join(BENCH_DIR, f"{benchmark}_{version}_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(record, f, indent=2)
+    logging.info(f"Benchmark results written to {output}")
+    print(f"📁 Results written to {output}")
+    return output
+
+def add_common_args(parser):
+    parser.add_argument("--version", choices=list_versions(), default=None, help="bins/ version to benchmark (default: latest)")
+    parser.add_argument("--base-port", type=int, default=BENCH_BASE_PORT, help="First port tried for the server")
+    parser.add_argument("--output", default=None, help="JSON result file (default: results/bench/<name>_<version>_<time>.json)")
+    return parser
+
+def format_latency(stats):
+    if not stats.get("count"):
+        return "n/a"
+    return f"p50={stats['p50']:.2f} p95={stats['p95']:.2f} p99={stats['p99']:.2f} max={stats['max']:.2f} ms"
@@ -0,0 +1,243 @@
+# /**
+#  * @file bench_connect_storm.py
+#  * @brief Connection storm benchmark: accept rate and handshake latency under ramping load.
+#  *        Opens connections to the chat port open-loop at increasing target rates
+#  *        (e.g. 50 -> 5000 connects/sec), as after a network blip when every client
+#  *        reconnects at once. Each connection is closed as soon as its ID_ASSIGN arrives,
+#  *        except a few "sticky" ones per step that stay until they appear in the LIST
+#  *        broadcast seen by the watcher clients.
+#  *
+#  *        Reported per rate step: offered and accepted connects/sec, time-to-ID_ASSIGN
+#  *        percentiles, failures (refused, reset or timed out), LIST visibility lag and the
+#  *        largest gap between LIST broadcasts, plus server CPU time (proc_monitor.cpu_time,
+#  *        nanosecond resolution) and connects per server CPU-second. The first step that misses the target rate, fails
+#  *        connections or exceeds the latency limit is the saturation point; the step
+#  *        before it is the max sustainable rate.
+#  *
+#  *        Usage:
+#  *        - python scripts/bench_connect_storm.py
+#  *        - python scripts/bench_connect_storm.py --rates 100,500,1000,2000 --step-duration 5
+#  *
+#  * @author Oussama Amara
+#  * @version 1.0
+#  * @date 2025-10-24
+#  */
+
+import argparse, asyncio, os, re, time
+from bench_common import launch_server, percentiles, write_results, add_common_args, format_latency, BENCH_BASE_PORT
+from proc_monitor import cpu_time
+from protocol_client import ProtocolClient, raise_fd_limit
+
+BENCHMARK = "connect_storm"
+DEFAULT_RATES = "50,100,250,500,1000,2000,5000"
+LIST_PERIOD = 3.0       # The server broadcasts LIST to every client on this tick
+BURST_WINDOW = 0.1      # LIST frames closer than this belong to the same broadcast
+LIST_ID_RE = re.compile(r"(\d+),")
+
+class ListWatcher:
+    """
+    Records the LIST broadcasts received by one client. Frames closer than
+    BURST_WINDOW form one broadcast: {"at", "end", "ids", "bytes", "frames"}.
+    `first_seen` maps each client ID to the first time it was listed.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.client.on_frame = self._on_frame
+        self.first_seen = {}
+        self.bursts = []
+
+    def _on_frame(self, frame, now):
+        if frame.kind != "LIST":
+            return
+        if not self.bursts or now - self.bursts[-1]["end"] > BURST_WINDOW:
+            self.bursts.append({"at": now, "end": now, "ids": set(), "bytes": 0, "frames": 0})
+        burst = self.bursts[-1]
+        burst["end"] = now
+        burst["bytes"] += len(frame.encode())
+        burst["frames"] += 1
+        for cid in LIST_ID_RE.findall(frame.payload):
+            burst["ids"].add(int(cid))
+            self.first_seen.setdefault(int(cid), now)
+
+    def reset(self):
+        self.first_seen.clear()
+
+    def max_gap(self, since):
+        # Include the last broadcast before `since`, steps are often shorter than one period
+        first = max([i for i, b in enumerate(self.bursts) if b["at"] < since], default=0)
+        times = [b["at"] for b in self.bursts[first:]]
+        gaps = [b - a for a, b in zip(times, times[1:])]
+        return max(gaps) if gaps else None
+
+async def storm_step(port, rate, duration, sticky, timeout, watchers):
+    """
+    Fires round(rate * duration) connections on an open-loop schedule and
+    returns the step metrics. Sticky clients are spread evenly over the step.
+    """
+    total = max(1, round(rate * duration))
+    sticky_every = max(1, total // sticky) if sticky else 0
+    latencies, lags = [], []
+    failures = {}
+    kept = []
+    late_starts = [0]
+
+    async def one(index, scheduled):
+        client = ProtocolClient(port=port, name=f"storm_{index}")
+        if time.monotonic() - scheduled > 1.0 / rate:
+            late_starts[0] += 1
+        try:
+            await client.connect(timeout)
+        except (OSError, asyncio.TimeoutError, ConnectionError) as e:
+            failures[type(e).__name__] = failures.get(type(e).__name__, 0) + 1
+            await client.close()
+            return
+        latencies.append(client.connect_latency)
+        if sticky_every and index % sticky_every == 0 and len(kept) < sticky:
+            kept.append((client, time.monotonic()))
+        else:
+            await client.close()
+
+    for watcher in watchers:
+        watcher.reset()
+    start = time.monotonic()
+    tasks = []
+    for index in range(total):
+        scheduled = start + index / rate
+        delay = scheduled - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(index, scheduled)))
+    offered_window = time.monotonic() - start
+    await asyncio.gather(*tasks)
+    accept_window = time.monotonic() - start
+
+    # Sticky clients must show up in the next LIST broadcasts of every watcher
+    deadline = time.monotonic() + 2 * LIST_PERIOD + 1
+    while kept and time.monotonic() < deadline:
+        if all(c.client_id in w.first_seen for c, _ in kept for w in watchers):
+            break
+        await asyncio.sleep(0.05)
+    for client, assigned_at in kept:
+        for watcher in watchers:
+            seen = watcher.first_seen.get(client.client_id)
+            lags.append(seen - assigned_at if seen and seen >= assigned_at else None)
+    await asyncio.gather(*(c.close() for c, _ in kept))
+
+    visible = [lag for lag in lags if lag is not None]
+    return {
+        "target_rate": rate,
+        "attempted": total,
+        "connected": len(latencies),
+        "failures": failures,
+        "late_starts": late_starts[0],
+        "offered_rate": total / offered_window if offered_window > 0 else float(total),
+        "accepted_rate": len(latencies) / accept_window if accept_window > 0 else 0.0,
+        "connect_ms": percentiles(latencies),
+        "list_visible": f"{len(visible)}/{len(lags)}",
+        "list_lag_ms": percentiles(visible),
+        "list_gap_max_s": max((g for g in (w.max_gap(start) for w in watchers) if g is not None), default=None),
+    }
+
+def is_saturated(step, latency_limit_ms):
+    """Returns the reason a step missed its target, or None when it kept up."""
+    if sum(step["failures"].values()):
+        return f"{sum(step['failures'].values())} failed connection(s)"
+    if step["accepted_rate"] < 0.9 * step["target_rate"]:
+        return f"accepted {step['accepted_rate']:.0f}/s of {step['target_rate']}/s"
+    if step["connect_ms"].get("p99", 0) > latency_limit_ms:
+        return f"p99 {step['connect_ms']['p99']:.0f} ms over {latency_limit_ms:.0f} ms"
+    return None
+
+def format_cpu(seconds):
+    return "n/a" if seconds is None else f"{seconds * 1000:.1f} ms"
+
+async def storm_workload(server, rates, duration=3.0, sticky=4, watchers=2, timeout=3.0,
+                         latency_limit_ms=500.0, settle=1.0, stop_on_saturation=True):
+    # The accept loop sleeps a few seconds after its first client; the watchers absorb it
+    listeners = [ListWatcher(ProtocolClient(port=server.chat_port, name=f"watcher_{i}")) for i in range(watchers)]
+    for watcher in listeners:
+        await watcher.client.connect()
+    await asyncio.sleep(LIST_PERIOD)
+
+    steps = []
+    sustainable = None
+    saturation = None
+    try:
+        for rate in rates:
+            cpu_before = cpu_time(server.pid)
+            step = await storm_step(server.chat_port, rate, duration, sticky, timeout, listeners)
+            cpu_after = cpu_time(server.pid)
+            step["server_cpu_s"] = cpu_after - cpu_before if cpu_before is not None and cpu_after is not None else None
+            step["connects_per_cpu_s"] = step["connected"] / step["server_cpu_s"] if step["server_cpu_s"] else None
+            reason = is_saturated(step, latency_limit_ms)
+            step["saturated"] = reason
+            if step["offered_rate"] < 0.9 * rate:
+                # The generator itself fell behind; the server was not offered the target rate
+                step["generator_limited"] = True
+            steps.append(step)
+            print(f"{'❌' if reason else '✅'} {rate}/s: accepted {step['accepted_rate']:.0f}/s "
+                  f"(offered {step['offered_rate']:.0f}/s), connect {format_latency(step['connect_ms'])}, "
+                  f"LIST {step['list_visible']} visible, server CPU {format_cpu(step['server_cpu_s'])}"
+                  f"{' - ' + reason if reason else ''}")
+            if reason:
+                saturation = saturation or rate
+                if stop_on_saturation:
+                    break
+            elif saturation is None:
+                sustainable = step
+            await asyncio.sleep(settle)
+    finally:
+        await asyncio.gather(*(w.client.close() for w in listeners))
+
+    return {
+        "cpu_count": os.cpu_count(),
+        "steps": steps,
+        "saturation_rate": saturation,
+        "max_sustainable_rate": sustainable["target_rate"] if sustainable else None,
+        "connects_per_cpu_s": sustainable["connects_per_cpu_s"] if sustainable else None,
+    }
+
+def run_benchmark(version=None, base_port=BENCH_BASE_PORT, rates=DEFAULT_RATES, **params):
+    """Launches a server of `version`, runs the rate ramp and returns (version, metrics)."""
+    rate_list = [int(r) for r in rates.split(",")] if isinstance(rates, str) else list(rates)
+    with launch_server(version, base_port) as server:
+        metrics = asyncio.run(storm_workload(server, rate_list, **params))
+    return server.version, metrics
+
+def main():
+    parser = argparse.ArgumentParser(description="Connection storm / accept-rate benchmark.")
+    parser.add_argument("--rates", default=DEFAULT_RATES, help="Comma-separated target connects/sec, in ramp order")
+    parser.add_argument("--step-duration", type=float, default=3.0, help="Seconds of connecting per rate step")
+    parser.add_argument("--sticky", type=int, default=4, help="Connections per step kept open until seen in LIST")
+    parser.add_argument("--watchers", type=int, default=2, help="Long-lived clients checking LIST broadcasts")
+    parser.add_argument("--timeout", type=float, default=3.0, help="Seconds to wait for ID_ASSIGN")
+    parser.add_argument("--latency-limit", type=float, default=500.0, help="p99 time-to-ID_ASSIGN (ms) that counts as saturated")
+    parser.add_argument("--keep-going", action="store_true", help="Run every rate even after saturation")
+    add_common_args(parser)
+    args = parser.parse_args()
+    try:
+        rates = [int(r) for r in args.rates.split(",")]
+    except ValueError:
+        parser.error(f"Invalid --rates: {args.rates}")
+    if args.watchers < 1 or min(rates) <= 0:
+        parser.error("--watchers and every rate must be positive")
+
+    raise_fd_limit()
+    params = {"rates": rates, "duration": args.step_duration, "sticky": args.sticky, "watchers": args.watchers,
+              "timeout": args.timeout, "latency_limit_ms": args.latency_limit,
+              "stop_on_saturation": not args.keep_going}
+    version, metrics = run_benchmark(args.version, args.base_port, **params)
+
+    print(f"📊 Connection storm on server {version} ({metrics['cpu_count']} CPU)")
+    if metrics["max_sustainable_rate"]:
+        per_cpu = metrics["connects_per_cpu_s"]
+        print(f"   - Max sustainable rate : {metrics['max_sustainable_rate']} connects/s"
+              f"{f' (~{per_cpu:.0f} per server CPU-second)' if per_cpu else ''}")
+    else:
+        print("   - Max sustainable rate : below the first step")
+    print(f"   - Saturation           : {metrics['saturation_rate'] or 'not reached'}")
+    write_results(BENCHMARK, version, params, metrics, args.output)
+
+if __name__ == "__main__":
+    main()
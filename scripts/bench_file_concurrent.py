@@ -0,0 +1,179 @@
+# /**
+#  * @file bench_file_concurrent.py
+#  * @brief Concurrent file transfer stress test: M simultaneous transfers among N clients.
+#  *        Every transfer gets its own generated file (sizes cycled from --sizes) and all
+#  *        requests go out at once on the file port. Client i requests its file for
+#  *        client i+1, so each client receives at most one file at a time. Every received
+#  *        file in assets/received/ is checked against its source with a streaming SHA-256.
+#  *
+#  *        Reported: per-transfer MB/s and duration, aggregate MB/s over the whole run,
+#  *        fairness among transfers of the same size (slowest vs fastest throughput and
+#  *        Jain's index; small files are dominated by the request round trip) and how many
+#  *        transfers were actually streaming at the same time. A peak concurrency of 1
+#  *        (or an overlap ratio near 1) means the server serializes transfers.
+#  *
+#  *        Usage:
+#  *        - python scripts/bench_file_concurrent.py
+#  *        - python scripts/bench_file_concurrent.py --transfers 16 --clients 20 --sizes 16K,1M,4M
+#  *
+#  * @author Oussama Amara
+#  * @version 1.0
+#  * @date 2025-10-25
+#  */
+
+import argparse, asyncio, os, time
+from bench_common import launch_server, write_results, add_common_args, BENCH_BASE_PORT
+from bench_file_transfer import generate_file, sha256_file, parse_size, format_size, transfer_file, MIN_RATE
+from protocol_client import connect_clients
+
+BENCHMARK = "file_concurrent"
+DEFAULT_SIZES = "16K,256K,1M"
+
+def jain_index(values):
+    """Jain's fairness index: 1.0 when all values are equal, 1/n when one takes everything."""
+    values = [v for v in values if v is not None]
+    if not values or not any(values):
+        return None
+    return sum(values) ** 2 / (len(values) * sum(v * v for v in values))
+
+def fairness(done):
+    """Spread and Jain's index of throughput, per file size: {label: {...}}."""
+    groups = {}
+    for r in done:
+        groups.setdefault(format_size(r["size"]), []).append(r["mb_per_sec"])
+    return {
+        label: {
+            "transfers": len(rates),
+            "slowest_mb_per_sec": min(rates),
+            "fastest_mb_per_sec": max(rates),
+            "spread": max(rates) / min(rates) if min(rates) > 0 else None,
+            "jain_index": jain_index(rates),
+        }
+        for label, rates in groups.items()
+    }
+
+def overlap(intervals):
+    """Returns (peak number of overlapping intervals, sum of lengths / length of their union)."""
+    events = sorted([(start, 1) for start, _ in intervals] + [(end, -1) for _, end in intervals])
+    active = peak = 0
+    union = 0.0
+    opened = None
+    for at, step in events:
+        if active == 0 and step == 1:
+            opened = at
+        active += step
+        peak = max(peak, active)
+        if active == 0:
+            union += at - opened
+    total = sum(end - start for start, end in intervals)
+    return peak, total / union if union > 0 else None
+
+async def concurrent_workload(server, transfers, clients, sizes, keep=False):
+    peers, failures = await connect_clients(clients, port=server.file_port, received_dir=server.received_dir)
+    if len(peers) < 2:
+        raise RuntimeError(f"❌ Only {len(peers)} of {clients} clients connected ({failures})")
+    await asyncio.gather(*(peer.wait_started() for peer in peers))
+
+    plan = []
+    for index in range(transfers):
+        size = sizes[index % len(sizes)]
+        filename = f"concurrent_{index}_{format_size(size)}.bin"
+        expected = generate_file(os.path.join(server.to_send_dir, filename), size)
+        plan.append((peers[index % len(peers)], peers[(index + 1) % len(peers)], filename, size, expected))
+    timeout = 30 + sum(sizes[i % len(sizes)] for i in range(transfers)) / MIN_RATE
+
+    print(f"🧪 {transfers} transfers among {len(peers)} clients...")
+    started = time.monotonic()
+    try:
+        outcomes = await asyncio.gather(
+            *(transfer_file(sender, receiver, filename, timeout) for sender, receiver, filename, _, _ in plan),
+            return_exceptions=True
+        )
+    finally:
+        await asyncio.gather(*(peer.close() for peer in peers))
+
+    results = []
+    for (sender, receiver, filename, size, expected), outcome in zip(plan, outcomes):
+        received = os.path.join(server.received_dir, filename)
+        result = {"file": filename, "size": size, "sender": sender.client_id, "receiver": receiver.client_id}
+        if isinstance(outcome, Exception):
+            result.update(status=f"{type(outcome).__name__}: {outcome}", intact=False, mb_per_sec=None)
+        else:
+            transfer, requested_at = outcome
+            duration = transfer.finished_at - requested_at
+            result.update(
+                status=transfer.status,
+                intact=transfer.status == "DONE" and os.path.exists(received) and sha256_file(received) == expected,
+                duration_s=duration,
+                mb_per_sec=transfer.bytes / duration / (1 << 20) if duration > 0 else 0.0,
+                retries=transfer.retries,
+                streaming=(transfer.first_chunk_at - started, transfer.finished_at - started)
+                          if transfer.first_chunk_at else None,
+            )
+        results.append(result)
+        if not keep:
+            for path in (os.path.join(server.to_send_dir, filename), received):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    done = [r for r in results if r["status"] == "DONE"]
+    makespan = max((r["streaming"][1] for r in done if r.get("streaming")), default=0.0)
+    by_size = fairness(done)
+    spreads = [g["spread"] for g in by_size.values() if g["transfers"] > 1 and g["spread"]]
+    peak, overlap_ratio = overlap([r["streaming"] for r in done if r.get("streaming")])
+    return {
+        "transfers": results,
+        "all_intact": all(r["intact"] for r in results),
+        "completed": len(done),
+        "aggregate_mb_per_sec": sum(r["size"] for r in done) / makespan / (1 << 20) if makespan > 0 else 0.0,
+        "fairness": by_size,
+        "worst_spread": max(spreads, default=None),
+        "peak_concurrent": peak,
+        "overlap_ratio": overlap_ratio,
+        "serialized": peak <= 1 if len(done) > 1 else None,
+    }
+
+def run_benchmark(version=None, base_port=BENCH_BASE_PORT, transfers=8, clients=None, sizes=DEFAULT_SIZES, keep=False):
+    """Launches a server of `version`, runs the concurrent transfers and returns (version, metrics)."""
+    size_list = [parse_size(s) for s in sizes.split(",")] if isinstance(sizes, str) else list(sizes)
+    with launch_server(version, base_port) as server:
+        metrics = asyncio.run(concurrent_workload(server, transfers, clients or transfers + 1, size_list, keep))
+    return server.version, metrics
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent file transfer stress test.")
+    parser.add_argument("--transfers", type=int, default=8, help="Simultaneous transfers (M)")
+    parser.add_argument("--clients", type=int, default=None, help="Connected clients (N, default M+1)")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="File sizes, cycled over the transfers")
+    parser.add_argument("--keep", action="store_true", help="Keep generated and received files")
+    add_common_args(parser)
+    args = parser.parse_args()
+    try:
+        [parse_size(s) for s in args.sizes.split(",")]
+    except ValueError as e:
+        parser.error(str(e))
+    clients = args.clients or args.transfers + 1
+    if args.transfers < 1 or clients < 2 or args.transfers > clients:
+        parser.error("Need 1 <= --transfers <= --clients and at least 2 clients (one incoming file per client)")
+
+    params = {"transfers": args.transfers, "clients": clients, "sizes": args.sizes, "keep": args.keep}
+    version, metrics = run_benchmark(args.version, args.base_port, **params)
+
+    for r in metrics["transfers"]:
+        rate = f", {r['mb_per_sec']:.2f} MB/s in {r['duration_s']:.2f}s" if r.get("mb_per_sec") is not None else ""
+        print(f"{'✅' if r['intact'] else '❌'} {r['file']}: {r['status']}{rate}")
+    print(f"📊 {metrics['completed']}/{args.transfers} transfers on server {version}, "
+          f"aggregate {metrics['aggregate_mb_per_sec']:.2f} MB/s")
+    for label, group in metrics["fairness"].items():
+        if group["transfers"] > 1:
+            print(f"   - {label} fairness: slowest {group['slowest_mb_per_sec']:.2f} MB/s, fastest "
+                  f"{group['fastest_mb_per_sec']:.2f} MB/s (x{group['spread'] or float('nan'):.1f}), "
+                  f"Jain {group['jain_index'] or float('nan'):.2f}")
+    print(f"   - Peak concurrent transfers: {metrics['peak_concurrent']}"
+          f"{' ⚠️ the server serializes transfers' if metrics['serialized'] else ''}")
+    write_results(BENCHMARK, version, params, metrics, args.output)
+    if not metrics["all_intact"]:
+        raise SystemExit("❌ At least one received file is missing or differs from its source.")
+
+if __name__ == "__main__":
+    main()
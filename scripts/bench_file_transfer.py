@@ -0,0 +1,153 @@
+# /**
+#  * @file bench_file_transfer.py
+#  * @brief File transfer throughput benchmark across file sizes (1 KB to 1 GB).
+#  *        Generates one file per size in the server's assets/to_send/, then has a native
+#  *        sender request it for a native receiver on the file port. The receiver streams
+#  *        chunks to assets/received/ and both files are compared with a streaming SHA-256,
+#  *        so even 1 GB files are never held in memory.
+#  *
+#  *        Reported per size: MB/s, chunks/sec, time-to-first-chunk (REQUEST -> first
+#  *        CHUNK), total duration, retries and integrity. Results are written as JSON.
+#  *
+#  *        Usage:
+#  *        - python scripts/bench_file_transfer.py                       # 1K,16K,256K,1M,16M
+#  *        - python scripts/bench_file_transfer.py --sizes 1K,1M,100M,1G
+#  *
+#  * @author Oussama Amara
+#  * @version 1.0
+#  * @date 2025-10-22
+#  */
+
+import argparse, asyncio, base64, hashlib, math, os, re, time
+from bench_common import launch_server, write_results, add_common_args, BENCH_BASE_PORT
+from protocol import CHUNK_SIZE
+from protocol_client import ProtocolClient
+
+BENCHMARK = "file_transfer"
+DEFAULT_SIZES = "1K,16K,256K,1M,16M"
+BLOCK_SIZE = 1 << 20
+MIN_RATE = 1 << 20  # bytes/sec assumed when deriving a transfer timeout from the file size
+UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+
+def parse_size(text):
+    match = re.fullmatch(r"(\d+)([KMG]?)B?", text.strip().upper())
+    if not match:
+        raise ValueError(f"Invalid size: {text}")
+    return int(match.group(1)) * UNITS[match.group(2)]
+
+def format_size(size):
+    for unit in ("G", "M", "K"):
+        if size >= UNITS[unit] and size % UNITS[unit] == 0:
+            return f"{size // UNITS[unit]}{unit}"
+    return f"{size}B"
+
+def generate_file(path, size):
+    """
+    Writes `size` bytes of base64 text (the binaries treat payloads as C strings,
+    so no NUL or '|' may appear) and returns its SHA-256, computed while writing.
+    """
+    digest = hashlib.sha256()
+    remaining = size
+    with open(path, "wb") as f:
+        while remaining:
+            block = base64.b64encode(os.urandom(BLOCK_SIZE * 3 // 4))[:remaining]
+            f.write(block)
+            digest.update(block)
+            remaining -= len(block)
+    return digest.hexdigest()
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+async def transfer_file(sender, receiver, filename, timeout):
+    """Requests `filename` for the receiver and returns the finished FileTransfer and its request time."""
+    requested_at = time.monotonic()
+    await sender.request_file(receiver.client_id, filename)
+    await receiver.wait_for(lambda f: f.channel == "file" and f.kind == "INCOMING" and f.payload.endswith(filename), timeout)
+    transfer = receiver.transfers[filename]
+    try:
+        await asyncio.wait_for(transfer.done.wait(), timeout)
+    except asyncio.TimeoutError:
+        transfer.finish("TIMEOUT", time.monotonic())
+    return transfer, requested_at
+
+async def file_workload(server, sizes, keep=False):
+    sender = ProtocolClient(port=server.file_port, name="sender")
+    receiver = ProtocolClient(port=server.file_port, name="receiver", received_dir=server.received_dir)
+    await sender.connect()
+    await receiver.connect()
+    await asyncio.gather(sender.wait_started(), receiver.wait_started())
+
+    results = []
+    try:
+        for size in sizes:
+            label = format_size(size)
+            filename = f"bench_{label}.bin"
+            source = os.path.join(server.to_send_dir, filename)
+            print(f"🧪 {label}: generating {filename}...")
+            expected = generate_file(source, size)
+
+            timeout = 30 + size / MIN_RATE
+            transfer, requested_at = await transfer_file(sender, receiver, filename, timeout)
+            duration = transfer.finished_at - requested_at
+            received = os.path.join(server.received_dir, filename)
+            intact = transfer.status == "DONE" and sha256_file(received) == expected
+
+            result = {
+                "size": size,
+                "label": label,
+                "status": transfer.status,
+                "bytes": transfer.bytes,
+                "chunks": transfer.chunks,
+                "expected_chunks": max(1, math.ceil(size / CHUNK_SIZE)),
+                "retries": transfer.retries,
+                "duration_s": duration,
+                "mb_per_sec": transfer.bytes / duration / (1 << 20) if duration > 0 else 0.0,
+                "chunks_per_sec": transfer.chunks / duration if duration > 0 else 0.0,
+                "time_to_first_chunk_ms": (transfer.first_chunk_at - requested_at) * 1000 if transfer.first_chunk_at else None,
+                "intact": intact,
+            }
+            results.append(result)
+            print(f"{'✅' if intact else '❌'} {label}: {result['mb_per_sec']:.2f} MB/s, "
+                  f"{result['chunks_per_sec']:.0f} chunks/s, first chunk after "
+                  f"{result['time_to_first_chunk_ms'] or 0:.1f} ms, {transfer.retries} retries")
+
+            if not keep:
+                for path in (source, received):
+                    if os.path.exists(path):
+                        os.remove(path)
+    finally:
+        await sender.close()
+        await receiver.close()
+    return {"transfers": results, "all_intact": all(r["intact"] for r in results)}
+
+def run_benchmark(version=None, base_port=BENCH_BASE_PORT, sizes=DEFAULT_SIZES, keep=False):
+    """Launches a server of `version`, transfers one file per size and returns (version, metrics)."""
+    size_list = [parse_size(s) for s in sizes.split(",")] if isinstance(sizes, str) else list(sizes)
+    with launch_server(version, base_port) as server:
+        metrics = asyncio.run(file_workload(server, size_list, keep))
+    return server.version, metrics
+
+def main():
+    parser = argparse.ArgumentParser(description="File transfer throughput benchmark.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma-separated sizes, e.g. 1K,1M,1G")
+    parser.add_argument("--keep", action="store_true", help="Keep generated and received files")
+    add_common_args(parser)
+    args = parser.parse_args()
+    try:
+        [parse_size(s) for s in args.sizes.split(",")]
+    except ValueError as e:
+        parser.error(str(e))
+
+    params = {"sizes": args.sizes, "keep": args.keep}
+    version, metrics = run_benchmark(args.version, args.base_port, **params)
+    write_results(BENCHMARK, version, params, metrics, args.output)
+    if not metrics["all_intact"]:
+        raise SystemExit("❌ At least one received file differs from its source.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+# /**
+#  * @file bench_game.py
+#  * @brief Game channel (game port) latency and throughput scenarios.
+#  *        A game session is two native protocol clients on the game port taking turns:
+#  *        each turn is one game frame ("move <turn> <x> <y>") sent to the opponent.
+#  *        Scenarios:
+#  *        - turn: one session, closed loop; turn round-trip latency and turns/sec
+#  *        - sessions: 1, 4, 16... concurrent sessions playing closed loop; aggregate
+#  *          and per-session turns/sec and latency at each level
+#  *        - rate: open loop, every session sends commands at a fixed rate; processed
+#  *          vs offered commands/sec and latency per rate, up to saturation
+#  *
+#  *        A turn completes when the server acknowledges the command. The released
+#  *        servers stub the game channel: they log "[GAME] Game feature not yet
+#  *        implemented." and send nothing back, so the acknowledgement is that log line,
+#  *        timestamped as it is read from the server's stdout (commands are matched to
+#  *        lines in send order). As soon as a server answers with game frames, the
+#  *        answer becomes the acknowledgement (`ack_source` tells which one was used).
+#  *
+#  *        Results follow the chat benchmark format (sent, received, lost, latency_ms,
+#  *        connect_ms) under one key per scenario.
+#  *
+#  *        Usage:
+#  *        - python scripts/bench_game.py
+#  *        - python scripts/bench_game.py --scenarios turn --turns 1000
+#  *        - python scripts/bench_game.py --sessions 1,8,32 --rates 50,200,800 --version 2.6
+#  *
+#  * @author Oussama Amara
+#  * @version 1.0
+#  * @date 2025-10-27
+#  */
+
+import argparse, asyncio, collections, re, time
+from bench_common import launch_server, percentiles, write_results, add_common_args, format_latency, BENCH_BASE_PORT
+from protocol_client import ProtocolClient, connect_clients, raise_fd_limit
+
+BENCHMARK = "game"
+SCENARIOS = ("turn", "sessions", "rate")
+ACK_RE = re.compile(r"\[GAME\]|Game command received")
+DEFAULT_SESSIONS = "1,4,16,64"
+DEFAULT_RATES = "10,50,100,250,500"
+ACK_TIMEOUT = 2.0          # Seconds before a command counts as lost
+CALIBRATION_WAIT = 0.5     # Seconds given to one command to print all its log lines
+SATURATION = 0.95          # Processed/offered ratio below which a rate counts as saturated
+
+class GameAcks:
+    """
+    Matches game commands with the server's acknowledgements: game frames sent
+    back to a player of the session, otherwise the server's game log lines, in
+    send order (`lines_per_command` lines each).
+    """
+
+    def __init__(self, out):
+        self.loop = asyncio.get_running_loop()
+        self.out = out
+        self.pending = collections.deque()
+        self.lines_per_command = 1
+        self.lines = 0
+        self.replies = False
+        self.sources = collections.Counter()
+        out.on_line = self._on_line
+
+    def expect(self):
+        future = self.loop.create_future()
+        self.pending.append(future)
+        return future
+
+    def _on_line(self, line, now):
+        # Reader thread of the server's stdout; the server's threads can share a line
+        count = len(ACK_RE.findall(line))
+        if count:
+            self.loop.call_soon_threadsafe(self._log_ack, now, count)
+
+    def _log_ack(self, now, count):
+        for _ in range(count):
+            self.lines += 1
+            if not self.replies and self.lines % self.lines_per_command == 0:
+                self._ack(now, "server_log")
+
+    def on_reply(self, future, frame, now):
+        if frame.channel == "game" and future is not None and not future.done():
+            self.replies = True
+            future.set_result((now, "reply"))
+            self.sources["reply"] += 1
+
+    def _ack(self, now, source):
+        while self.pending:
+            future = self.pending.popleft()
+            if not future.done():
+                future.set_result((now, source))
+                self.sources[source] += 1
+                return
+
+    async def calibrate(self, session):
+        """Counts the game log messages the server prints for one command (at least one is needed)."""
+        before = self.lines
+        await session.send_turn(self)
+        await asyncio.sleep(CALIBRATION_WAIT)
+        if session.current is not None and session.current.done() and session.current.result()[1] == "reply":
+            return
+        printed = self.lines - before
+        if printed < 1:
+            raise RuntimeError("❌ The server neither answered nor logged a game command")
+        self.lines_per_command = printed
+        self.pending.clear()
+
+    def close(self):
+        self.out.on_line = None
+        self.source = "reply" if self.replies else "server_log"
+
+class GameSession:
+    """Two players on the game port sending turns to each other."""
+
+    def __init__(self, index, players):
+        self.index = index
+        self.players = players
+        self.turn = 0
+        self.current = None
+        self.latencies = []
+        self.sent = self.received = self.lost = 0
+        self.last_ack = 0.0
+        self.acks = None
+        for player in players:
+            player.on_frame = self._on_frame
+
+    def _on_frame(self, frame, now):
+        if self.acks:
+            self.acks.on_reply(self.current, frame, now)
+
+    async def send_turn(self, acks):
+        """Sends the next move and returns (sent_at, future of (acked_at, source))."""
+        self.acks = acks
+        player = self.players[self.turn % 2]
+        opponent = self.players[(self.turn + 1) % 2]
+        self.current = acks.expect()
+        sent_at = time.monotonic()
+        await player.send_frame("game", opponent.client_id, f"move {self.turn} {self.turn % 8} {self.turn // 8 % 8}",
+                                "READY")
+        self.turn += 1
+        self.sent += 1
+        return sent_at, self.current
+
+    async def complete(self, sent_at, future, timeout=ACK_TIMEOUT):
+        try:
+            acked_at, _ = await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            future.cancel()
+            self.lost += 1
+            return
+        self.received += 1
+        self.latencies.append(acked_at - sent_at)
+        self.last_ack = max(self.last_ack, acked_at)
+
+    async def play(self, acks, turns=None, stop_at=None):
+        """Closed loop: the next turn is sent once the previous one was acknowledged."""
+        while (turns is None or self.turn < turns) and (stop_at is None or time.monotonic() < stop_at):
+            await self.complete(*await self.send_turn(acks))
+
+    async def close(self):
+        await asyncio.gather(*(player.close() for player in self.players))
+
+async def open_sessions(port, count, concurrency=200):
+    players, failures = await connect_clients(2 * count, port=port, concurrency=concurrency)
+    await asyncio.gather(*(player.wait_started() for player in players))
+    sessions = [GameSession(i, players[2 * i:2 * i + 2]) for i in range(len(players) // 2)]
+    for orphan in players[2 * len(sessions):]:
+        await orphan.close()
+    return sessions, len(failures), [player.connect_latency for player in players]
+
+def session_metrics(sessions, elapsed, connect_latencies, failures):
+    latencies = [latency for session in sessions for latency in session.latencies]
+    received = sum(s.received for s in sessions)
+    return {
+        "sessions": len(sessions),
+        "connect_failures": failures,
+        "sent": sum(s.sent for s in sessions),
+        "received": received,
+        "lost": sum(s.lost for s in sessions),
+        "turns_per_sec": received / elapsed if elapsed > 0 else 0.0,
+        "turns_per_sec_per_session": received / elapsed / len(sessions) if elapsed > 0 and sessions else 0.0,
+        "latency_ms": percentiles(latencies),
+        "connect_ms": percentiles(connect_latencies),
+    }
+
+async def turn_scenario(port, acks, turns):
+    sessions, failures, connects = await open_sessions(port, 1)
+    try:
+        await acks.calibrate(sessions[0])
+        session = GameSession(0, sessions[0].players)  # calibration turn left out of the figures
+        start = time.monotonic()
+        await session.play(acks, turns=turns)
+        return session_metrics([session], time.monotonic() - start, connects, failures)
+    finally:
+        await sessions[0].close()
+
+async def sessions_scenario(port, acks, levels, duration):
+    results = []
+    for level in levels:
+        sessions, failures, connects = await open_sessions(port, level)
+        try:
+            start = time.monotonic()
+            await asyncio.gather(*(session.play(acks, stop_at=start + duration) for session in sessions))
+            point = session_metrics(sessions, time.monotonic() - start, connects, failures)
+        finally:
+            await asyncio.gather(*(session.close() for session in sessions))
+        results.append(point)
+        print(f"{'✅' if not point['lost'] else '⚠️'} {point['sessions']} session(s): {point['turns_per_sec']:.0f} turns/s "
+              f"({point['turns_per_sec_per_session']:.0f} per session), latency {format_latency(point['latency_ms'])}, "
+              f"{point['lost']} lost")
+    return results
+
+async def rate_scenario(port, acks, rates, sessions_count, duration):
+    sessions, failures, connects = await open_sessions(port, sessions_count)
+    steps = []
+    try:
+        for rate in rates:
+            for session in sessions:
+                session.latencies, session.sent, session.received, session.lost = [], 0, 0, 0
+            waits = []
+
+            async def offer(session):
+                interval = 1.0 / rate
+                count = 0
+                while time.monotonic() < stop_at:
+                    sent_at, future = await session.send_turn(acks)
+                    waits.append(asyncio.ensure_future(session.complete(sent_at, future)))
+                    count += 1
+                    delay = start + count * interval - time.monotonic()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+
+            start = time.monotonic()
+            stop_at = start + duration
+            await asyncio.gather(*(offer(session) for session in sessions))
+            await asyncio.gather(*waits)
+            # Commands still in flight at the end of the step count, lost ones' timeouts do not
+            elapsed = max([duration] + [s.last_ack - start for s in sessions])
+            sent = sum(s.sent for s in sessions)
+            point = session_metrics(sessions, elapsed, connects, failures)
+            point.update(rate=rate, offered_per_sec=sent / duration, processed_per_sec=point["received"] / elapsed)
+            point["saturated"] = point["processed_per_sec"] < SATURATION * rate * len(sessions) or point["lost"] > 0
+            steps.append(point)
+            print(f"{'⚠️' if point['saturated'] else '✅'} {rate:g} cmd/s x {len(sessions)} session(s): "
+                  f"{point['processed_per_sec']:.0f}/{point['offered_per_sec']:.0f} processed/offered per sec, "
+                  f"latency {format_latency(point['latency_ms'])}, {point['lost']} lost")
+            if point["saturated"]:
+                break
+    finally:
+        await asyncio.gather(*(session.close() for session in sessions))
+    sustained = [p["rate"] for p in steps if not p["saturated"]]
+    return {"sessions": len(sessions), "steps": steps, "max_sustained_rate": max(sustained, default=None)}
+
+async def game_workload(server, scenarios=SCENARIOS, turns=200, sessions=DEFAULT_SESSIONS, duration=5.0,
+                        rates=DEFAULT_RATES, rate_sessions=4, step_duration=3.0):
+    sessions = [int(n) for n in sessions.split(",")] if isinstance(sessions, str) else list(sessions)
+    rates = [float(r) for r in rates.split(",")] if isinstance(rates, str) else list(rates)
+    # An idle client keeps the accept loop awake between scenarios
+    keeper = ProtocolClient(port=server.chat_port, name="keeper")
+    await keeper.connect()
+    acks = GameAcks(server.out)
+    metrics = {}
+    try:
+        if "turn" in scenarios:
+            metrics["turn"] = await turn_scenario(server.game_port, acks, turns)
+            print(f"✅ Turn round trip: {format_latency(metrics['turn']['latency_ms'])}, "
+                  f"{metrics['turn']['turns_per_sec']:.0f} turns/s")
+        if "sessions" in scenarios:
+            metrics["sessions"] = await sessions_scenario(server.game_port, acks, sessions, duration)
+        if "rate" in scenarios:
+            metrics["rate"] = await rate_scenario(server.game_port, acks, rates, rate_sessions, step_duration)
+    finally:
+        acks.close()
+        await keeper.close()
+    metrics["ack_source"] = acks.source
+    metrics["log_lines_per_command"] = acks.lines_per_command
+    return metrics
+
+def run_benchmark(version=None, base_port=BENCH_BASE_PORT, **params):
+    """Launches a server of `version`, runs the game scenarios and returns (version, metrics)."""
+    with launch_server(version, base_port) as server:
+        metrics = asyncio.run(game_workload(server, **params))
+    return server.version, metrics
+
+def print_summary(version, metrics):
+    print(f"📊 Game channel on server {version} (acknowledged by {metrics['ack_source'].replace('_', ' ')})")
+    if "turn" in metrics:
+        turn = metrics["turn"]
+        print(f"   - Turn latency : {format_latency(turn['latency_ms'])} ({turn['lost']} lost)")
+    if metrics.get("sessions"):
+        best = max(metrics["sessions"], key=lambda p: p["turns_per_sec"])
+        print(f"   - Throughput   : up to {best['turns_per_sec']:.0f} turns/s with {best['sessions']} session(s)")
+    if "rate" in metrics:
+        sustained = metrics["rate"]["max_sustained_rate"]
+        print(f"   - Command rate : {f'{sustained:g} cmd/s per session sustained' if sustained else 'no rate sustained'}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Game channel latency and throughput scenarios.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"Comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--turns", type=int, default=200, help="Turns played in the turn scenario")
+    parser.add_argument("--sessions", default=DEFAULT_SESSIONS, help="Concurrent session counts of the sessions scenario")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per session level")
+    parser.add_argument("--rates", default=DEFAULT_RATES, help="Commands/sec per session of the rate scenario")
+    parser.add_argument("--rate-sessions", type=int, default=4, help="Sessions in the rate scenario")
+    parser.add_argument("--step-duration", type=float, default=3.0, help="Seconds per rate step")
+    add_common_args(parser)
+    args = parser.parse_args()
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    if not scenarios or set(scenarios) - set(SCENARIOS):
+        parser.error(f"--scenarios must be a subset of: {', '.join(SCENARIOS)}")
+    try:
+        sessions = [int(n) for n in args.sessions.split(",")]
+        rates = [float(r) for r in args.rates.split(",")]
+    except ValueError as e:
+        parser.error(str(e))
+    if args.turns < 1 or min(sessions) < 1 or min(rates) <= 0 or args.rate_sessions < 1:
+        parser.error("--turns, --sessions and --rate-sessions must be at least 1 and --rates positive")
+
+    raise_fd_limit()
+    params = {"scenarios": scenarios, "turns": args.turns, "sessions": sessions, "duration": args.duration,
+              "rates": rates, "rate_sessions": args.rate_sessions, "step_duration": args.step_duration}
+    version, metrics = run_benchmark(args.version, args.base_port, **params)
+    print_summary(version, metrics)
+    write_results(BENCHMARK, version, params, metrics, args.output)
+
+if __name__ == "__main__":
+    main()
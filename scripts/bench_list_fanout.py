@@ -0,0 +1,232 @@
+# /**
+#  * @file bench_list_fanout.py
+#  * @brief LIST broadcast fan-out scaling benchmark.
+#  *        The server sends the full client list ("%d,%s", one frame per client) to every
+#  *        client on each LIST tick, so a broadcast costs N x N frames. This benchmark
+#  *        ramps the number of connected clients (10 up to 5k by default) and at
+#  *        each level measures:
+#  *        - broadcast bytes and frames per tick, summed over all clients
+#  *        - server CPU time per tick (proc_monitor.cpu_time, nanosecond resolution)
+#  *        - join / leave visibility: delay from a probe client's ID_ASSIGN (or close)
+#  *          until the last client has received a LIST that includes (or omits) it
+#  *
+#  *        The ramp stops at the server's client limit ("Max clients reached"). A
+#  *        power law fitted on the measured levels projects bytes and CPU for the
+#  *        levels beyond it (marked as projected). The curve is written as CSV next
+#  *        to the JSON result.
+#  *
+#  *        Usage:
+#  *        - python scripts/bench_list_fanout.py
+#  *        - python scripts/bench_list_fanout.py --levels 5,10,20,40,60 --ticks 5
+#  *
+#  * @author Oussama Amara
+#  * @version 1.0
+#  * @date 2025-10-24
+#  */
+
+import argparse, asyncio, csv, math, os, statistics, time
+from bench_common import launch_server, write_results, add_common_args, BENCH_BASE_PORT
+from bench_connect_storm import ListWatcher, LIST_PERIOD
+from proc_monitor import cpu_time
+from protocol_client import ProtocolClient, raise_fd_limit
+
+BENCHMARK = "list_fanout"
+DEFAULT_LEVELS = "10,25,50,100,1000,5000"
+CSV_FIELDS = ["clients", "projected", "bytes_per_tick", "frames_per_tick", "cpu_ms_per_tick",
+              "join_visible_ms", "leave_visible_ms"]
+CONNECT_BATCH = 10  # Handshakes in flight while ramping up
+
+async def next_broadcast(watcher, timeout=2 * LIST_PERIOD + 1):
+    """Waits until `watcher` has received one more complete LIST broadcast."""
+    count = len(watcher.bursts)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        # A burst is complete once no frame arrived for the burst window
+        if len(watcher.bursts) > count and time.monotonic() - watcher.bursts[-1]["end"] > 0.2:
+            return watcher.bursts[-1]
+        await asyncio.sleep(0.02)
+    raise TimeoutError("❌ No LIST broadcast received")
+
+async def visibility(watchers, since, listed, cid, timeout=2 * LIST_PERIOD + 1):
+    """
+    Seconds from `since` until every watcher received a broadcast that lists
+    `cid` (listed=True) or no longer lists it (listed=False). None on timeout.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        ends = []
+        for watcher in watchers:
+            burst = next((b for b in watcher.bursts if b["at"] >= since and (cid in b["ids"]) == listed), None)
+            if burst is None:
+                break
+            ends.append(burst["end"])
+        else:
+            # Let the last burst finish before reading its end time
+            await asyncio.sleep(0.2)
+            return max(ends) - since
+        await asyncio.sleep(0.02)
+    return None
+
+async def measure_level(server, watchers, ticks):
+    """Broadcast cost over `ticks` ticks, then one join and one leave of a probe client."""
+    # The measured window runs from half a period after one tick to half a
+    # period after the last one, so it holds `ticks` complete broadcasts
+    first = await next_broadcast(watchers[0])
+    window_start = first["at"] + 0.5 * LIST_PERIOD
+    await asyncio.sleep(window_start - time.monotonic())
+    cpu_before = cpu_time(server.pid)
+    for _ in range(ticks):
+        last = await next_broadcast(watchers[0])
+    window_end = last["at"] + 0.5 * LIST_PERIOD
+    await asyncio.sleep(window_end - time.monotonic())
+    cpu_after = cpu_time(server.pid)
+    cpu_ms = (cpu_after - cpu_before) * 1000 if cpu_before is not None and cpu_after is not None else None
+    bursts = [b for w in watchers for b in w.bursts if window_start <= b["at"] <= window_end]
+
+    probe = ProtocolClient(port=server.chat_port, name="probe")
+    await probe.connect()
+    joined_at = time.monotonic() - probe.connect_latency / 2
+    join = await visibility(watchers, joined_at, True, probe.client_id)
+    left_at = time.monotonic()
+    await probe.close()
+    leave = await visibility(watchers, left_at, False, probe.client_id)
+
+    return {
+        "clients": len(watchers),
+        "projected": False,
+        "bytes_per_tick": sum(b["bytes"] for b in bursts) / ticks,
+        "frames_per_tick": sum(b["frames"] for b in bursts) / ticks,
+        "cpu_ms_per_tick": cpu_ms / ticks if cpu_ms is not None else None,
+        "join_visible_ms": join * 1000 if join is not None else None,
+        "leave_visible_ms": leave * 1000 if leave is not None else None,
+    }
+
+def format_cpu(ms):
+    return "n/a" if ms is None else f"{ms:.2f}"
+
+def fit_power_law(points, key):
+    """Fits value = a * clients^k on the measured points. Returns (a, k) or None."""
+    pairs = [(math.log(p["clients"]), math.log(p[key])) for p in points if p[key] and p["clients"] > 1]
+    if len(pairs) < 2:
+        return None
+    slope, intercept = statistics.linear_regression([x for x, _ in pairs], [y for _, y in pairs])
+    return math.exp(intercept), slope
+
+async def add_clients(port, watchers, level, timeout, batch=CONNECT_BATCH, attempts=3):
+    """
+    Connects watchers until `level` are open. Connections go out in small
+    batches and timed-out ones are retried, so a burst overflowing the accept
+    backlog is not mistaken for the server's client limit.
+    """
+    for _ in range(attempts):
+        while len(watchers) < level:
+            count = min(batch, level - len(watchers))
+            added = [ListWatcher(ProtocolClient(port=port, name=f"client_{len(watchers) + i}")) for i in range(count)]
+            results = await asyncio.gather(*(w.client.connect(timeout) for w in added), return_exceptions=True)
+            for watcher, result in zip(added, results):
+                if isinstance(result, Exception):
+                    await watcher.client.close()
+                else:
+                    watchers.append(watcher)
+            if any(isinstance(r, Exception) for r in results):
+                break
+        if len(watchers) >= level:
+            return
+
+async def fanout_workload(server, levels, ticks=3, timeout=3.0):
+    # The accept loop sleeps a few seconds after its first client, so the first
+    # two connect one by one with the default handshake timeout
+    watchers = [ListWatcher(ProtocolClient(port=server.chat_port, name=f"client_{i}")) for i in range(2)]
+    for watcher in watchers:
+        await watcher.client.connect()
+    curve = []
+    limit = None
+    try:
+        for level in sorted(levels):
+            mark = server.out.mark()
+            await add_clients(server.chat_port, watchers, level, timeout)
+            capped = len(watchers) < level and "Max clients reached" in server.out.text(mark)
+            if len(watchers) < level and not capped:
+                raise RuntimeError(f"❌ Only {len(watchers)} of {level} clients connected, server limit not reached")
+            if capped:
+                limit = len(watchers)
+                print(f"⚠️ Server accepted {limit} of {level} clients, stopping the ramp at its client limit")
+                # Free one slot so the probe client can still join
+                await watchers.pop().client.close()
+                if curve and curve[-1]["clients"] == len(watchers):
+                    break
+            point = await measure_level(server, watchers, ticks)
+            curve.append(point)
+            print(f"✅ {point['clients']} clients: {point['bytes_per_tick'] / 1024:.1f} KB/tick, "
+                  f"{point['frames_per_tick']:.0f} frames/tick, CPU {format_cpu(point['cpu_ms_per_tick'])} ms/tick, "
+                  f"join visible after {point['join_visible_ms'] or float('nan'):.0f} ms, "
+                  f"leave after {point['leave_visible_ms'] or float('nan'):.0f} ms")
+            if capped:
+                break
+    finally:
+        await asyncio.gather(*(w.client.close() for w in watchers))
+
+    fits = {key: fit_power_law(curve, key) for key in ("bytes_per_tick", "frames_per_tick", "cpu_ms_per_tick")}
+    for level in sorted(levels):
+        if level > max(p["clients"] for p in curve):
+            projected = {"clients": level, "projected": True, "join_visible_ms": None, "leave_visible_ms": None}
+            for key, fit in fits.items():
+                projected[key] = fit[0] * level ** fit[1] if fit else None
+            curve.append(projected)
+
+    # Fan-out is the bottleneck once one broadcast takes longer than the tick itself
+    bottleneck = next((p["clients"] for p in curve
+                       if p["cpu_ms_per_tick"] and p["cpu_ms_per_tick"] > LIST_PERIOD * 1000), None)
+    return {
+        "client_limit": limit,
+        "ticks_per_level": ticks,
+        "list_period_s": LIST_PERIOD,
+        "curve": curve,
+        "exponents": {key: fit[1] if fit else None for key, fit in fits.items()},
+        "cpu_bound_at_clients": bottleneck,
+    }
+
+def write_curve(curve, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, CSV_FIELDS)
+        writer.writeheader()
+        writer.writerows(curve)
+    print(f"📁 Curve written to {path}")
+
+def run_benchmark(version=None, base_port=BENCH_BASE_PORT, levels=DEFAULT_LEVELS, **params):
+    """Launches a server of `version`, ramps the client count and returns (version, metrics)."""
+    level_list = [int(n) for n in levels.split(",")] if isinstance(levels, str) else list(levels)
+    with launch_server(version, base_port) as server:
+        metrics = asyncio.run(fanout_workload(server, level_list, **params))
+    return server.version, metrics
+
+def main():
+    parser = argparse.ArgumentParser(description="LIST broadcast fan-out scaling benchmark.")
+    parser.add_argument("--levels", default=DEFAULT_LEVELS, help="Comma-separated connected-client counts")
+    parser.add_argument("--ticks", type=int, default=3, help="LIST ticks measured per level")
+    parser.add_argument("--timeout", type=float, default=3.0, help="Seconds to wait for each ID_ASSIGN")
+    add_common_args(parser)
+    args = parser.parse_args()
+    try:
+        levels = [int(n) for n in args.levels.split(",")]
+    except ValueError:
+        parser.error(f"Invalid --levels: {args.levels}")
+    if min(levels) < 2:
+        parser.error("Every level needs at least 2 clients")
+
+    raise_fd_limit()
+    params = {"levels": levels, "ticks": args.ticks, "timeout": args.timeout}
+    version, metrics = run_benchmark(args.version, args.base_port, **params)
+
+    print(f"📊 LIST fan-out on server {version}")
+    for key, exponent in metrics["exponents"].items():
+        if exponent is not None:
+            print(f"   - {key} grows as clients^{exponent:.2f}")
+    if metrics["cpu_bound_at_clients"]:
+        print(f"   - Broadcast CPU exceeds the {LIST_PERIOD:.0f}s tick at ~{metrics['cpu_bound_at_clients']} clients")
+    output = write_results(BENCHMARK, version, params, metrics, args.output)
+    write_curve(metrics["curve"], os.path.splitext(output)[0] + ".csv")
+
+if __name__ == "__main__":
+    main()
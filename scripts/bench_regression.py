@@ -0,0 +1,210 @@
+# /**
+#  * @file bench_regression.py
+#  * @brief Cross-version performance regression matrix over bins/.
+#  *        Runs the same benchmark workloads (connect, chat, file, game) against every version
+#  *        folder, or a chosen pair, stores one JSON result per version and compares each
+#  *        version with the previous one. Any tracked metric that got worse by more than
+#  *        the threshold is flagged and the script exits non-zero.
+#  *
+#  *        Usage:
+#  *        - python scripts/bench_regression.py                    # 2.4 -> 2.5 -> ... -> latest
+#  *        - python scripts/bench_regression.py --pair 2.7 2.8 --threshold 0.05
+#  *        - python scripts/bench_regression.py --load results/bench/regression_<time>
+#  *
+#  * @author Oussama Amara
+#  * @version 1.0
+#  * @date 2025-10-22
+#  */
+
+import argparse, asyncio, json, os, statistics, sys, time
+from bench_common import launch_server, percentiles, write_results, BENCH_BASE_PORT, BENCH_DIR
+from protocol_client import ProtocolClient
+from utils import list_versions
+import bench_chat, bench_file_transfer, bench_game
+
+DEFAULT_THRESHOLD = 0.10
+
+# Workload parameters shared by every version, so results stay comparable
+WORKLOAD_PARAMS = {
+    "connect": {"probes": 20},
+    "chat": {"clients": 8, "size": 64, "rate": 0, "duration": 5.0, "drain": 3.0},
+    "file": {"sizes": "64K,8M"},
+    "game": {"scenarios": ["turn", "sessions"], "turns": 200, "sessions": "4", "duration": 3.0},
+}
+
+# (metric, workload, path into the workload metrics, higher_is_better, noise floor)
+# Changes smaller than the floor (in the metric's unit) are never flagged.
+TRACKED_METRICS = [
+    ("connect_p50_ms", "connect", ("latency_ms", "p50"), False, 1.0),
+    ("connect_p95_ms", "connect", ("latency_ms", "p95"), False, 1.0),
+    ("chat_msgs_per_sec", "chat", ("msgs_per_sec",), True, 0.0),
+    ("chat_p50_ms", "chat", ("latency_ms", "p50"), False, 1.0),
+    ("chat_p99_ms", "chat", ("latency_ms", "p99"), False, 2.0),
+    ("chat_lost", "chat", ("lost",), False, 0.5),
+    ("file_mb_per_sec", "file", ("transfers", -1, "mb_per_sec"), True, 0.0),
+    ("file_first_chunk_ms", "file", ("transfers", -1, "time_to_first_chunk_ms"), False, 1.0),
+    ("game_turn_p50_ms", "game", ("turn", "latency_ms", "p50"), False, 1.0),
+    ("game_turn_p99_ms", "game", ("turn", "latency_ms", "p99"), False, 2.0),
+    ("game_turns_per_sec", "game", ("sessions", -1, "turns_per_sec"), True, 0.0),
+]
+
+async def connect_workload(port, probes=20):
+    """
+    Measures ID_ASSIGN latency of sequential connections. Two clients are
+    connected first: the server's accept loop sleeps for a few seconds right
+    after its first client, which would otherwise dominate the samples.
+    """
+    anchor = ProtocolClient(port=port, name="anchor")
+    warmup = ProtocolClient(port=port, name="warmup")
+    await anchor.connect()
+    await warmup.connect()
+    latencies = []
+    for index in range(probes):
+        probe = ProtocolClient(port=port, name=f"probe_{index}")
+        await probe.connect()
+        latencies.append(probe.connect_latency)
+        await probe.close()
+    await asyncio.gather(anchor.close(), warmup.close())
+    return {"probes": probes, "warmup_ms": warmup.connect_latency * 1000, "latency_ms": percentiles(latencies)}
+
+def run_connect(version, base_port, **params):
+    with launch_server(version, base_port) as server:
+        metrics = asyncio.run(connect_workload(server.chat_port, **params))
+    return server.version, metrics
+
+WORKLOADS = {
+    "connect": run_connect,
+    "chat": bench_chat.run_benchmark,
+    "file": bench_file_transfer.run_benchmark,
+    "game": bench_game.run_benchmark,
+}
+
+def extract(metrics, path):
+    value = metrics
+    for key in path:
+        try:
+            value = value[key]
+        except (KeyError, IndexError, TypeError):
+            return None
+    return value
+
+def summarize(workload_metrics):
+    """Flattens the workload results of one version into the tracked metrics."""
+    summary = {}
+    for name, workload, path, _, _ in TRACKED_METRICS:
+        if workload in workload_metrics:
+            summary[name] = extract(workload_metrics[workload], path)
+    return summary
+
+def run_version(version, workloads, repeat, base_port):
+    """Runs the workloads `repeat` times and keeps the median of every tracked metric."""
+    runs = []
+    raw = {}
+    for attempt in range(repeat):
+        for workload in workloads:
+            print(f"🔬 {version}: {workload} workload (run {attempt + 1}/{repeat})")
+            _, raw[workload] = WORKLOADS[workload](version, base_port, **WORKLOAD_PARAMS[workload])
+        runs.append(summarize(raw))
+    summary = {}
+    for name in runs[0]:
+        values = [run[name] for run in runs if run.get(name) is not None]
+        summary[name] = statistics.median(values) if values else None
+    return summary, raw
+
+def compare(baseline, candidate, threshold):
+    """Returns {metric: (relative_change, regressed)} for candidate vs baseline."""
+    result = {}
+    for name, _, _, higher_is_better, floor in TRACKED_METRICS:
+        old, new = baseline.get(name), candidate.get(name)
+        if old is None or new is None:
+            continue
+        delta = new - old
+        change = delta / old if old else (0.0 if delta == 0 else float("inf"))
+        worse = -change if higher_is_better else change
+        regressed = worse > threshold and abs(delta) > floor
+        result[name] = (change, regressed)
+    return result
+
+def print_table(versions, summaries, comparisons):
+    width = max(len(m[0]) for m in TRACKED_METRICS) + 2
+    print("\n📊 Regression matrix (change vs previous version)")
+    print("metric".ljust(width) + "".join(v.rjust(22) for v in versions))
+    for name, *_ in TRACKED_METRICS:
+        if not any(name in summaries[v] for v in versions):
+            continue
+        row = name.ljust(width)
+        for index, version in enumerate(versions):
+            value = summaries[version].get(name)
+            cell = "n/a" if value is None else f"{value:.2f}"
+            if index and name in comparisons.get(version, {}):
+                change, regressed = comparisons[version][name]
+                cell += f" ({change * 100:+.1f}%){'⚠️' if regressed else ''}"
+            row += cell.rjust(22)
+        print(row)
+
+def load_summaries(directory):
+    summaries = {}
+    for entry in sorted(os.listdir(directory)):
+        if entry.endswith(".json") and entry != "summary.json":
+            with open(os.path.join(directory, entry)) as f:
+                record = json.load(f)
+            summaries[record["version"]] = record["metrics"]["summary"]
+    return summaries
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare benchmark results across server versions.")
+    parser.add_argument("--versions", nargs="+", choices=list_versions(), help="Versions to run (default: all)")
+    parser.add_argument("--pair", nargs=2, metavar=("BASE", "CANDIDATE"), choices=list_versions(), help="Compare two versions only")
+    parser.add_argument("--workloads", default=",".join(WORKLOADS), help="Comma-separated subset of: " + ", ".join(WORKLOADS))
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Relative regression that fails the run (0.10 = 10%%)")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per version; the median is compared")
+    parser.add_argument("--base-port", type=int, default=BENCH_BASE_PORT)
+    parser.add_argument("--load", metavar="DIR", help="Re-compare a stored regression folder instead of running")
+    args = parser.parse_args()
+
+    workloads = [w for w in args.workloads.split(",") if w]
+    unknown = [w for w in workloads if w not in WORKLOADS]
+    if unknown:
+        parser.error(f"Unknown workload(s): {', '.join(unknown)}")
+
+    if args.load:
+        summaries = load_summaries(args.load)
+        versions = sorted(summaries, key=lambda v: [int(x) for x in v.split(".")])
+        out_dir = args.load
+    else:
+        versions = list(args.pair) if args.pair else sorted(args.versions or list_versions(), key=lambda v: [int(x) for x in v.split(".")])
+        out_dir = os.path.join(BENCH_DIR, time.strftime("regression_%Y%m%d_%H%M%S"))
+        summaries = {}
+        params = {"workloads": workloads, "repeat": args.repeat, **{w: WORKLOAD_PARAMS[w] for w in workloads}}
+        for version in versions:
+            summary, raw = run_version(version, workloads, args.repeat, args.base_port)
+            summaries[version] = summary
+            write_results("regression", version, params, {"summary": summary, "workloads": raw},
+                          os.path.join(out_dir, f"{version}.json"))
+
+    comparisons = {}
+    for previous, version in zip(versions, versions[1:]):
+        comparisons[version] = compare(summaries[previous], summaries[version], args.threshold)
+
+    print_table(versions, summaries, comparisons)
+    regressions = [(v, m) for v, metrics in comparisons.items() for m, (_, regressed) in metrics.items() if regressed]
+
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, "summary.json"), "w") as f:
+        json.dump({
+            "versions": versions,
+            "threshold": args.threshold,
+            "summaries": summaries,
+            "comparisons": {v: {m: {"change": c, "regressed": r} for m, (c, r) in metrics.items()} for v, metrics in comparisons.items()},
+            "regressions": [f"{v}:{m}" for v, m in regressions],
+        }, f, indent=2)
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) above {args.threshold * 100:.0f}%:")
+        for version, metric in regressions:
+            print(f"   - {version}: {metric}")
+        sys.exit(1)
+    print(f"\n✅ No regression above {args.threshold * 100:.0f}%.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+# /**
+#  * @file fault_proxy.py
+#  * @brief Frame-aware TCP fault-injection proxy for loopback tests and benchmarks.
+#  *        Sits between clients and the server and impairs each direction separately:
+#  *        - delay and jitter (FIFO, like a real link: jitter never reorders bytes)
+#  *        - frame drop, optionally only for frames matching a regex and up to a limit
+#  *        - stalls: the direction freezes for a while (drives TIMEOUT handling)
+#  *        - reordering of whole frames (a frame is held back behind the next one)
+#  *        - bandwidth cap (bytes/sec serialization delay)
+#  *        Streams are split into whole frames (protocol.FrameSplitter) so impairments
+#  *        never cut a frame in half, and frames are forwarded one write at a time with
+#  *        a small gap, as the binaries only parse one frame per read.
+#  *        An optional tap sees every frame before impairment (session_replay.py records
+#  *        sessions through it).
+#  *
+#  *        Usage:
+#  *        - python scripts/fault_proxy.py --route 9081:8081 --route 9082:8082 \
+#  *              --down "delay=50ms,jitter=5ms,drop=0.01" --up "delay=50ms,bandwidth=1M"
+#  *        - python scripts/fault_proxy.py --route 9082:8082 --down "drop=1,match=CHUNK\|0\|,limit=5"
+#  *
+#  *        Impairment spec keys: delay, jitter, stall_time (ms/s suffix), drop, stall, reorder
+#  *        (probability per frame), bandwidth (bytes/sec, K/M suffix), match (regex on the
+#  *        raw frame, only matching frames are dropped or start a stall), limit (max frames
+#  *        dropped), gap (ms between frames).
+#  *
+#  * @author Oussama Amara
+#  * @version 1.0
+#  * @date 2025-10-25
+#  */
+
+import argparse, asyncio, contextlib, logging, random, re, threading, time
+from protocol import FrameSplitter
+from protocol_client import FRAME_GAP
+
+REORDER_HOLD = 0.05   # Longest time a held-back frame waits for a frame to overtake it
+READ_SIZE = 65536
+
+def _parse_duration(text):
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)(ms|s)?", text)
+    if not match:
+        raise ValueError(f"Invalid duration: {text}")
+    return float(match.group(1)) / (1000 if match.group(2) == "ms" else 1)
+
+def _parse_rate(text):
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)([KMG]?)", text.upper())
+    if not match:
+        raise ValueError(f"Invalid bandwidth: {text}")
+    return float(match.group(1)) * {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30}[match.group(2)]
+
+class Shaping:
+    """Impairments applied to one direction of every proxied connection."""
+
+    def __init__(self, delay=0.0, jitter=0.0, drop=0.0, match=None, limit=None, stall=0.0,
+                 stall_time=1.0, reorder=0.0, bandwidth=None, gap=FRAME_GAP):
+        self.delay = delay
+        self.jitter = jitter
+        self.drop = drop
+        self.match = re.compile(match.encode() if isinstance(match, str) else match) if match else None
+        self.limit = limit
+        self.stall = stall
+        self.stall_time = stall_time
+        self.reorder = reorder
+        self.bandwidth = bandwidth
+        self.gap = gap
+        self.dropped = 0  # shared by all connections, so `limit` is global
+
+    @classmethod
+    def parse(cls, spec):
+        """Builds a Shaping from "delay=50ms,jitter=5ms,drop=0.01,bandwidth=1M"."""
+        kwargs = {}
+        for item in filter(None, (part.strip() for part in (spec or "").split(","))):
+            key, _, value = item.partition("=")
+            if key in ("delay", "jitter", "stall_time", "gap"):
+                kwargs[key] = _parse_duration(value)
+            elif key in ("drop", "stall", "reorder"):
+                kwargs[key] = float(value)
+            elif key == "bandwidth":
+                kwargs[key] = _parse_rate(value)
+            elif key == "limit":
+                kwargs[key] = int(value)
+            elif key == "match":
+                kwargs[key] = value
+            else:
+                raise ValueError(f"Unknown impairment: {key}")
+        return cls(**kwargs)
+
+    def matches(self, data):
+        return self.match is None or self.match.search(data) is not None
+
+    def should_stall(self, data, rng):
+        return bool(self.stall) and self.matches(data) and rng.random() < self.stall
+
+    def should_drop(self, data, rng):
+        if not self.drop or (self.limit is not None and self.dropped >= self.limit):
+            return False
+        if not self.matches(data) or rng.random() >= self.drop:
+            return False
+        self.dropped += 1
+        return True
+
+    def describe(self):
+        parts = [f"{k}={v}" for k, v in vars(self).items() if v and k not in ("dropped", "gap")]
+        return ", ".join(parts) or "none"
+
+class Pipe:
+    """One direction of a proxied connection: splits, impairs and re-sends whole frames."""
+
+    def __init__(self, name, reader, writer, shaping, stats, rng, tap=None):
+        self.name = name
+        self.tap = tap  # optional hook(frame_bytes, monotonic_ts), called for every frame read
+        self.reader = reader
+        self.writer = writer
+        self.shaping = shaping
+        self.stats = stats
+        self.rng = rng
+        self.queue = asyncio.Queue()
+        self.splitter = FrameSplitter()
+        self.last_release = 0.0
+        self.stalled_until = 0.0
+        self.link_free = 0.0
+        self.held = None
+        self._flush = None
+
+    async def run(self):
+        await asyncio.gather(self._read(), self._write())
+
+    async def _read(self):
+        try:
+            while True:
+                data = await self.reader.read(READ_SIZE)
+                if not data:
+                    break
+                now = time.monotonic()
+                for frame in self.splitter.feed(data):
+                    if self.tap:
+                        self.tap(frame.encode(), now)
+                    self._schedule(frame.encode(), now)
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.stats["decode_errors"] += self.splitter.errors
+            self._release_held()
+            self.queue.put_nowait(None)
+
+    def _schedule(self, data, now):
+        shaping = self.shaping
+        self.stats["frames_in"] += 1
+        if shaping.should_drop(data, self.rng):
+            self.stats["dropped"] += 1
+            logging.debug(f"{self.name} dropped {data[:60]!r}")
+            return
+        if shaping.should_stall(data, self.rng):
+            self.stalled_until = max(self.stalled_until, now) + shaping.stall_time
+            self.stats["stalls"] += 1
+        release = now + shaping.delay + (self.rng.uniform(-shaping.jitter, shaping.jitter) if shaping.jitter else 0)
+        release = max(release, now, self.stalled_until, self.last_release)
+        self.last_release = release
+
+        if self.held is None and shaping.reorder and self.rng.random() < shaping.reorder:
+            # Hold this frame back; the next frame overtakes it
+            self.held = data
+            self._flush = asyncio.get_running_loop().call_later(REORDER_HOLD + max(0, release - now), self._release_held)
+            return
+        self.queue.put_nowait((release, data))
+        if self.held is not None:
+            self.stats["reordered"] += 1
+            self._release_held(release)
+
+    def _release_held(self, release=None):
+        if self._flush:
+            self._flush.cancel()
+            self._flush = None
+        if self.held is not None:
+            self.queue.put_nowait((release or time.monotonic(), self.held))
+            self.held = None
+
+    async def _write(self):
+        try:
+            while True:
+                item = await self.queue.get()
+                if item is None:
+                    break
+                release, data = item
+                wait = max(release, self.link_free) - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                self.writer.write(data)
+                await self.writer.drain()
+                serialization = len(data) / self.shaping.bandwidth if self.shaping.bandwidth else 0.0
+                self.link_free = time.monotonic() + max(self.shaping.gap, serialization)
+                self.stats["frames_out"] += 1
+                self.stats["bytes_out"] += len(data)
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            # Closing this side tells the peer the other end went away
+            self.writer.close()
+
+class FaultProxy:
+    """
+    Forwards each (listen_port, target_port) route to the target host, with
+    `upstream` shaping client->server frames and `downstream` server->client.
+    `tap(connection, event, data, now)` observes the traffic before any impairment:
+    "open" (data is the target port), "up" and "down" (data is one frame) and "close".
+    """
+
+    def __init__(self, routes, target_host="127.0.0.1", listen_host="127.0.0.1",
+                 upstream=None, downstream=None, seed=None, tap=None):
+        self.routes = list(routes)
+        self.target_host = target_host
+        self.listen_host = listen_host
+        self.upstream = upstream or Shaping()
+        self.downstream = downstream or Shaping()
+        self.rng = random.Random(seed)
+        self.tap = tap
+        self.servers = []
+        self.ports = []  # bound listen ports, useful with listen port 0
+        self.handlers = set()
+        self.connections = 0
+        self.stats = {
+            direction: {"frames_in": 0, "frames_out": 0, "bytes_out": 0, "dropped": 0,
+                        "stalls": 0, "reordered": 0, "decode_errors": 0}
+            for direction in ("up", "down")
+        }
+
+    async def start(self):
+        for listen_port, target_port in self.routes:
+            server = await asyncio.start_server(
+                lambda r, w, port=target_port: self._handle(r, w, port), self.listen_host, listen_port
+            )
+            self.servers.append(server)
+            self.ports.append(server.sockets[0].getsockname()[1])
+            logging.info(f"Fault proxy {self.listen_host}:{self.ports[-1]} -> {self.target_host}:{target_port}")
+        return self
+
+    async def close(self):
+        for server in self.servers:
+            server.close()
+        # Open connections are torn down too, their pipes close both sockets
+        for task in self.handlers:
+            task.cancel()
+        await asyncio.gather(*self.handlers, return_exceptions=True)
+        for server in self.servers:
+            await server.wait_closed()
+
+    async def _handle(self, client_reader, client_writer, target_port):
+        self.connections += 1
+        task = asyncio.current_task()
+        self.handlers.add(task)
+        task.add_done_callback(self.handlers.discard)
+        try:
+            server_reader, server_writer = await asyncio.open_connection(self.target_host, target_port)
+        except OSError as e:
+            logging.warning(f"Fault proxy could not reach port {target_port}: {e}")
+            client_writer.close()
+            return
+        connection = self.connections
+        name = f"proxy#{connection}"
+        taps = {}
+        if self.tap:
+            self.tap(connection, "open", target_port, time.monotonic())
+            taps = {d: lambda data, now, d=d: self.tap(connection, d, data, now) for d in ("up", "down")}
+        up = Pipe(f"{name} up", client_reader, server_writer, self.upstream, self.stats["up"], self.rng, taps.get("up"))
+        down = Pipe(f"{name} down", server_reader, client_writer, self.downstream, self.stats["down"], self.rng,
+                    taps.get("down"))
+        try:
+            await asyncio.gather(up.run(), down.run())
+        finally:
+            if self.tap:
+                self.tap(connection, "close", None, time.monotonic())
+
+@contextlib.contextmanager
+def run_proxy(routes, **kwargs):
+    """
+    Runs a FaultProxy on a background event loop for synchronous callers
+    (tests driving the binaries). Yields the proxy; its stats stay readable.
+    """
+    loop = asyncio.new_event_loop()
+    proxy = FaultProxy(routes, **kwargs)
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        asyncio.run_coroutine_threadsafe(proxy.start(), loop).result()
+        yield proxy
+    finally:
+        asyncio.run_coroutine_threadsafe(proxy.close(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+def print_stats(proxy):
+    for direction, stats in proxy.stats.items():
+        print(f"📊 {direction:4}: {stats['frames_out']}/{stats['frames_in']} frames forwarded, "
+              f"{stats['dropped']} dropped, {stats['reordered']} reordered, {stats['stalls']} stalls, "
+              f"{stats['bytes_out']} bytes")
+
+async def _serve(args):
+    proxy = await FaultProxy(args.route, args.target, args.listen,
+                             Shaping.parse(args.up), Shaping.parse(args.down), args.seed).start()
+    for listen_port, target_port in args.route:
+        print(f"🔀 {args.listen}:{listen_port} -> {args.target}:{target_port}")
+    print(f"   - up   : {proxy.upstream.describe()}")
+    print(f"   - down : {proxy.downstream.describe()}")
+    try:
+        while True:
+            await asyncio.sleep(args.report or 3600)
+            if args.report:
+                print_stats(proxy)
+    finally:
+        await proxy.close()
+        print_stats(proxy)
+
+def main():
+    def route(text):
+        listen, _, target = text.partition(":")
+        return int(listen), int(target)
+
+    parser = argparse.ArgumentParser(description="Frame-aware fault-injection TCP proxy.")
+    parser.add_argument("--route", type=route, action="append", required=True, metavar="LISTEN:TARGET",
+                        help="Proxy LISTEN port to TARGET port (repeatable)")
+    parser.add_argument("--target", default="127.0.0.1", help="Server host")
+    parser.add_argument("--listen", default="127.0.0.1", help="Address the proxy listens on")
+    parser.add_argument("--up", default="", help="Client->server impairments, e.g. delay=20ms,drop=0.01")
+    parser.add_argument("--down", default="", help="Server->client impairments")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for reproducible runs")
+    parser.add_argument("--report", type=float, default=0, help="Print stats every N seconds")
+    args = parser.parse_args()
+    try:
+        Shaping.parse(args.up), Shaping.parse(args.down)
+    except ValueError as e:
+        parser.error(str(e))
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
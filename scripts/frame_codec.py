@@ -0,0 +1,351 @@
+# /**
+#  * @file frame_codec.py
+#  * @brief Bulk frame codec and CRC validator for captured protocol traffic.
+#  *        Where protocol.py decodes one frame at a time, this module indexes a whole
+#  *        capture (raw bytes as read from a socket, frames back to back) in one regex
+#  *        pass and validates every CRC in one batch:
+#  *        - frame boundaries, channel and status come from a single C-level regex scan
+#  *          over the buffer (no per-frame slicing or decoding); with numpy the frame
+#  *          columns are then assembled with array operations
+#  *        - CRCs are checked with numpy (bitwise_xor.reduceat over the payload spans)
+#  *          when it is installed, otherwise with a memoryview + int XOR fold per payload
+#  *        - files are memory-mapped and processed in blocks, so multi-GB captures never
+#  *          have to fit in memory
+#  *
+#  *        Functions:
+#  *        - index_frames(buffer): FrameBatch with the offsets of every frame
+#  *        - validate_buffer(buffer): CRC / structure report of an in-memory capture
+#  *        - validate_file(path): Same, streamed over a memory-mapped capture file
+#  *        - encode_frames(frames): Concatenates (channel, src, dest, payload, status) rows
+#  *
+#  *        Usage:
+#  *        - python scripts/frame_codec.py results/capture.bin
+#  *        - python scripts/frame_codec.py capture.bin --backend python --json report.json
+#  *
+#  * @author Oussama Amara
+#  * @version 1.0
+#  * @date 2025-10-25
+#  */
+
+import argparse, json, mmap, os, re, sys, time
+from array import array
+from collections import Counter
+from protocol import CHANNELS, STATUSES, decode_frame, encode_frame
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+BLOCK_SIZE = 64 << 20  # Bytes indexed per pass over a capture file
+MAX_REPORTED = 20      # Offsets of bad frames kept in a report
+
+# Headers ("|chat|1|2|") and statuses ("|CHUNK|5|0" right before the next CRC) are
+# found in a single scan. Each channel and status has its own group, so
+# match.lastindex identifies the token without building strings: 1..len(CHANNELS) is
+# a header, above that a status. The pattern starts with a literal '|', which lets
+# the regex engine skip ahead with a fast search; the two CRC digits in front of a
+# header are checked together with the CRC.
+_TOKENS = re.compile(
+    rb"\|(?:(?=[a-z])(?:" + b"|".join(b"(" + c.encode() + b")" for c in CHANNELS) + rb")\|-?\d+\|-?\d+\|"
+    rb"|(?=[A-Z])(?:" + b"|".join(b"(" + s.encode() + b")" for s in STATUSES) + rb")(?:\|-?\d+)*"
+    rb"(?=[0-9A-F]{2}\|[a-z]|\Z))"  # status fields must not run into the next CRC ("CHUNK|5|0" + "12|")
+)
+_STATUS_BASE = len(CHANNELS) + 1
+_BAD_HEX = 0x100  # never equal to a byte XOR
+_HEX = {ord(c): int(c, 16) for c in "0123456789ABCDEF"}
+
+def _xor_fold(data):
+    """XOR of all bytes of `data`: folds the little-endian integer in halves down to one byte."""
+    value = int.from_bytes(data, "little")
+    width = 1 << max(0, len(data) - 1).bit_length()
+    while width > 1:
+        width //= 2
+        value = (value >> (8 * width)) ^ (value & ((1 << (8 * width)) - 1))
+    return value
+
+class FrameBatch:
+    """
+    Column-oriented index of the frames in one buffer: parallel arrays of
+    frame start, payload start/end and frame end offsets, plus channel and
+    status indices into protocol.CHANNELS / STATUSES. `malformed` lists
+    (offset, length) of byte ranges that are not a well-formed frame.
+    """
+
+    def __init__(self, buffer, base=0):
+        self.buffer = buffer
+        self.base = base
+        self.starts = array("q")
+        self.payload_starts = array("q")
+        self.payload_ends = array("q")
+        self.ends = array("q")
+        self.channels = array("b")
+        self.statuses = array("b")
+        self.malformed = []
+        self._crc_ok = None
+
+    def __len__(self):
+        return len(self.starts)
+
+    def frame(self, index):
+        """Fully decodes one indexed frame (protocol.Frame)."""
+        return decode_frame(bytes(self.buffer[self.starts[index]:self.ends[index]]))
+
+    def __iter__(self):
+        return (self.frame(i) for i in range(len(self)))
+
+    @property
+    def crc_ok(self):
+        """Per-frame CRC validity, computed in one batch on first access."""
+        if self._crc_ok is None:
+            self._crc_ok = check_crcs(self.buffer, self.starts, self.payload_starts, self.payload_ends)
+        return self._crc_ok
+
+    def bad_crc(self):
+        """Indices of the frames whose CRC does not match their payload."""
+        if np is not None and isinstance(self.crc_ok, np.ndarray):
+            return np.flatnonzero(~self.crc_ok).tolist()
+        return [i for i, ok in enumerate(self.crc_ok) if not ok]
+
+def index_frames(buffer, pos=0, endpos=None, final=True):
+    """
+    Indexes every frame in buffer[pos:endpos]. A frame runs from one header to
+    the next; the last status before the next header must end exactly where
+    that header (or the data) starts. With final=False the last segment is left
+    out, since it may be cut by the block boundary; `FrameBatch.base` then
+    tells where indexing stopped.
+    """
+    endpos = len(buffer) if endpos is None else endpos
+    # (start, end, lastindex) of every header and status token
+    tokens = [(m.start(), m.end(), m.lastindex) for m in _TOKENS.finditer(buffer, pos, endpos)]
+    if np is not None and tokens:
+        return _index_numpy(FrameBatch(buffer), tokens, pos, endpos, final)
+    return _index_python(FrameBatch(buffer), tokens, pos, endpos, final)
+
+def _index_numpy(batch, tokens, pos, endpos, final):
+    tok = np.array(tokens, dtype=np.int64)
+    heads = np.flatnonzero((tok[:, 2] < _STATUS_BASE) & (tok[:, 0] - 2 >= pos))
+    if not len(heads):
+        return _no_frames(batch, pos, endpos, final)
+    first = int(tok[heads[0], 0]) - 2
+    if first > pos:
+        batch.malformed.append((pos, first - pos))
+
+    starts = tok[heads, 0] - 2
+    bounds = np.append(starts[1:], endpos)
+    last = np.append(heads[1:], len(tok)) - 1  # last token before the next header
+    if not final:
+        heads, starts, bounds, last = heads[:-1], starts[:-1], bounds[:-1], last[:-1]
+
+    header_ends = tok[heads, 1]
+    trailer = tok[last]
+    valid = (last > heads) & (trailer[:, 2] >= _STATUS_BASE) & (trailer[:, 1] == bounds)
+    batch.malformed.extend(zip(starts[~valid].tolist(), (bounds - starts)[~valid].tolist()))
+    batch.starts = starts[valid]
+    batch.payload_starts = header_ends[valid]
+    batch.payload_ends = trailer[valid, 0]
+    batch.ends = bounds[valid]
+    batch.channels = (tok[heads, 2] - 1)[valid].astype(np.int8)
+    batch.statuses = (trailer[:, 2] - _STATUS_BASE)[valid].astype(np.int8)
+    batch.base = int(bounds[-1]) if bounds.size else first
+    return batch
+
+def _index_python(batch, tokens, pos, endpos, final):
+    heads = [i for i, t in enumerate(tokens) if t[2] < _STATUS_BASE and t[0] - 2 >= pos]
+    if not heads:
+        return _no_frames(batch, pos, endpos, final)
+    first = tokens[heads[0]][0] - 2
+    if first > pos:
+        batch.malformed.append((pos, first - pos))
+
+    bounds = [tokens[i][0] - 2 for i in heads[1:]] + [endpos]
+    lasts = [i - 1 for i in heads[1:]] + [len(tokens) - 1]
+    if not final:
+        heads, bounds, lasts = heads[:-1], bounds[:-1], lasts[:-1]
+    for head, bound, last in zip(heads, bounds, lasts):
+        start, header_end, channel = tokens[head]
+        trailer = tokens[last]
+        if last == head or trailer[2] < _STATUS_BASE or trailer[1] != bound:
+            batch.malformed.append((start - 2, bound - start + 2))
+            continue
+        batch.starts.append(start - 2)
+        batch.payload_starts.append(header_end)
+        batch.payload_ends.append(trailer[0])
+        batch.ends.append(bound)
+        batch.channels.append(channel - 1)
+        batch.statuses.append(trailer[2] - _STATUS_BASE)
+    batch.base = bounds[-1] if bounds else first
+    return batch
+
+def _no_frames(batch, pos, endpos, final):
+    batch.base = endpos if final else pos
+    if final and endpos > pos:
+        batch.malformed.append((pos, endpos - pos))
+    return batch
+
+def check_crcs(buffer, starts, payload_starts, payload_ends):
+    """Compares the header CRC of each frame with the XOR of its payload bytes."""
+    if not len(starts):
+        return []
+    if np is not None:
+        data = np.frombuffer(buffer, dtype=np.uint8)
+        starts = np.asarray(starts, dtype=np.int64)
+        lo = np.asarray(payload_starts, dtype=np.int64)
+        hi = np.asarray(payload_ends, dtype=np.int64)
+        hexval = np.full(256, _BAD_HEX, dtype=np.int32)
+        hexval[np.frombuffer(b"0123456789", dtype=np.uint8)] = np.arange(10)
+        hexval[np.frombuffer(b"ABCDEF", dtype=np.uint8)] = np.arange(10, 16)
+        expected = hexval[data[starts]] * 16 + hexval[data[starts + 1]]
+        # reduceat over [lo0, hi0, lo1, hi1, ...]: even slots hold XOR(data[lo:hi]),
+        # except for empty payloads (lo == hi) which yield data[lo] and are zeroed
+        spans = np.empty(2 * len(lo), dtype=np.int64)
+        spans[0::2], spans[1::2] = lo, hi
+        computed = np.bitwise_xor.reduceat(data, spans)[0::2]
+        computed[lo == hi] = 0
+        return computed == expected
+    view = memoryview(buffer)
+    return [
+        _HEX.get(view[s], _BAD_HEX) * 16 + _HEX.get(view[s + 1], _BAD_HEX) == _xor_fold(view[lo:hi])
+        for s, lo, hi in zip(starts, payload_starts, payload_ends)
+    ]
+
+def _counts(values):
+    """(value, occurrences) pairs of a column."""
+    if np is not None and isinstance(values, np.ndarray):
+        counts = np.bincount(values)
+        return [(i, int(c)) for i, c in enumerate(counts) if c]
+    return Counter(values).items()
+
+class ValidationReport:
+    """Running totals over one or more FrameBatch blocks."""
+
+    def __init__(self):
+        self.frames = 0
+        self.bytes = 0
+        self.crc_errors = 0
+        self.malformed = 0
+        self.malformed_bytes = 0
+        self.channels = dict.fromkeys(CHANNELS, 0)
+        self.statuses = dict.fromkeys(STATUSES, 0)
+        self.bad_crc_offsets = []
+        self.malformed_offsets = []
+        self.elapsed = 0.0
+
+    def add(self, batch):
+        self.frames += len(batch)
+        for index in batch.bad_crc():
+            self.crc_errors += 1
+            if len(self.bad_crc_offsets) < MAX_REPORTED:
+                self.bad_crc_offsets.append(int(batch.starts[index]))
+        for offset, length in batch.malformed:
+            self.malformed += 1
+            self.malformed_bytes += length
+            if len(self.malformed_offsets) < MAX_REPORTED:
+                self.malformed_offsets.append(offset)
+        for index, count in _counts(batch.channels):
+            self.channels[CHANNELS[index]] += count
+        for index, count in _counts(batch.statuses):
+            self.statuses[STATUSES[index]] += count
+
+    @property
+    def ok(self):
+        return self.crc_errors == 0 and self.malformed == 0
+
+    def as_dict(self):
+        return {
+            "backend": "numpy" if np is not None else "python",
+            "bytes": self.bytes,
+            "frames": self.frames,
+            "crc_errors": self.crc_errors,
+            "malformed": self.malformed,
+            "malformed_bytes": self.malformed_bytes,
+            "channels": {k: v for k, v in self.channels.items() if v},
+            "statuses": {k: v for k, v in self.statuses.items() if v},
+            "bad_crc_offsets": self.bad_crc_offsets,
+            "malformed_offsets": self.malformed_offsets,
+            "elapsed_s": self.elapsed,
+            "mb_per_sec": self.bytes / self.elapsed / (1 << 20) if self.elapsed > 0 else None,
+        }
+
+def validate_buffer(buffer):
+    """Validates an in-memory capture (bytes, bytearray, memoryview or mmap)."""
+    start = time.monotonic()
+    report = ValidationReport()
+    report.add(index_frames(buffer))
+    report.bytes = len(buffer)
+    report.elapsed = time.monotonic() - start
+    return report
+
+def validate_file(path, block_size=BLOCK_SIZE):
+    """
+    Validates a capture file block by block over a read-only memory map.
+    Each block stops before its last (possibly cut) frame, which is picked
+    up again by the next block.
+    """
+    start = time.monotonic()
+    report = ValidationReport()
+    size = os.path.getsize(path)
+    if size == 0:
+        return report
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        pos = 0
+        while pos < size:
+            endpos = min(size, pos + block_size)
+            final = endpos == size
+            batch = index_frames(mm, pos, endpos, final)
+            if not final and batch.base <= pos:
+                # No complete frame in a whole block: index the rest at once
+                batch = index_frames(mm, pos, size, True)
+            report.add(batch)
+            pos = size if batch.base <= pos else batch.base
+    report.bytes = size
+    report.elapsed = time.monotonic() - start
+    return report
+
+def encode_frames(frames):
+    """Concatenates (channel, src, dest, payload, status) rows into one capture buffer."""
+    return b"".join(encode_frame(*row) for row in frames)
+
+def print_report(report, path):
+    summary = report.as_dict()
+    rate = f"{summary['mb_per_sec']:.1f} MB/s" if summary["mb_per_sec"] else "n/a"
+    print(f"🔍 {path}: {summary['frames']} frame(s), {summary['bytes']} bytes in "
+          f"{summary['elapsed_s']:.2f}s ({rate}, {summary['backend']} backend)")
+    print(f"   - Channels : {summary['channels']}")
+    print(f"   - Statuses : {summary['statuses']}")
+    if report.crc_errors:
+        print(f"❌ {report.crc_errors} CRC mismatch(es), first at offset(s) {summary['bad_crc_offsets'][:5]}")
+    if report.malformed:
+        print(f"❌ {report.malformed} malformed segment(s) ({report.malformed_bytes} bytes), "
+              f"first at offset(s) {summary['malformed_offsets'][:5]}")
+    if report.ok:
+        print("✅ All frames well-formed with valid CRCs.")
+
+def main():
+    global np
+    parser = argparse.ArgumentParser(description="Validate frame structure and CRCs of a captured byte stream.")
+    parser.add_argument("captures", nargs="+", help="Capture files (raw frames back to back)")
+    parser.add_argument("--backend", choices=("auto", "numpy", "python"), default="auto",
+                        help="CRC backend (auto = numpy when installed)")
+    parser.add_argument("--block-size", type=int, default=BLOCK_SIZE, help="Bytes indexed per pass")
+    parser.add_argument("--json", metavar="FILE", help="Write the reports as JSON")
+    args = parser.parse_args()
+    if args.backend == "numpy" and np is None:
+        parser.error("numpy is not installed")
+    if args.backend == "python":
+        np = None
+
+    reports = {}
+    for path in args.captures:
+        report = validate_file(path, args.block_size)
+        print_report(report, path)
+        reports[path] = report
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({path: r.as_dict() for path, r in reports.items()}, f, indent=2)
+        print(f"📁 Report written to {args.json}")
+    if not all(r.ok for r in reports.values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
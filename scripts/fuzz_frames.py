@@ -0,0 +1,579 @@
+# /**
+#  * @file fuzz_frames.py
+#  * @brief Frame parser fuzzer: mutated CRC|channel|src|dest|payload|status frames under load.
+#  *        Valid seed frames (chat, file, system, ack, game) are mutated field by field
+#  *        and byte by byte:
+#  *        - bad CRCs (wrong, non-hex, wrong length); otherwise the CRC is recomputed so
+#  *          the frame gets past the checksum into the deeper parsing paths
+#  *        - oversized fields (payloads across the 256/511-byte limits up to 64K, long
+#  *          IDs and channels), empty fields, unknown channels and statuses
+#  *        - embedded pipes, NUL and non-ASCII bytes, truncation, bit flips, frames
+#  *          glued together in one write
+#  *        - invalid dest/src IDs (negative, overflowing, unknown, non-numeric, spoofed)
+#  *        - CHUNK sequences that never end, skip, repeat or mix indices and senders
+#  *
+#  *        Cases are fired over many parallel connections (chat and file ports), each
+#  *        frame in its own write. Two watchdogs run alongside: the process watchdog
+#  *        notices a server exit (crash, with its signal) and the latency watchdog
+#  *        round-trips a chat message between two clean clients and reports a hang
+#  *        when it takes longer than --hang-timeout. The cases sent just before a crash
+#  *        or hang are replayed on a fresh server and minimized (delta debugging over
+#  *        cases, frames, then bytes) into results/fuzz/corpus/.
+#  *
+#  *        Reported: executions/sec, frames and bytes sent, server warning paths hit
+#  *        (e.g. "CRC mismatch.", "Failed to parse frame from client N"), watchdog
+#  *        latency, crashes and hangs.
+#  *
+#  *        Usage:
+#  *        - python scripts/fuzz_frames.py --duration 60 --connections 64
+#  *        - python scripts/fuzz_frames.py --seed 1 --mutators bad_crc,chunk_sequence
+#  *        - python scripts/fuzz_frames.py --reproduce results/fuzz/corpus/crash_<hash>.json
+#  *
+#  * @author Oussama Amara
+#  * @version 1.0
+#  * @date 2025-10-27
+#  */
+
+import argparse, asyncio, collections, contextlib, hashlib, json, math, os, random, re, time
+from bench_common import launch_server, percentiles, write_results, add_common_args, format_latency, ROOT_DIR, \
+    BENCH_BASE_PORT
+from protocol import CHANNELS, STATUSES, ENCODING, FrameSplitter, compute_crc
+from protocol_client import ProtocolClient, FRAME_GAP, raise_fd_limit
+from utils import HANDSHAKE_TIMEOUT
+
+BENCHMARK = "fuzz_frames"
+CORPUS_DIR = os.path.join(ROOT_DIR, "results", "fuzz", "corpus")
+HANG_TIMEOUT = 5.0      # Watchdog round trip that counts as a hang
+PROBE_INTERVAL = 0.5    # Seconds between watchdog round trips
+RECENT_WINDOW = 2.0     # Seconds of cases (per connection) kept as crash suspects
+MAX_SUSPECTS = 200      # Cases replayed when minimizing
+MINIMIZE_RUNS = 60      # Reproduction attempts spent on minimizing one finding
+WARN_RE = re.compile(r"\[(?:WARN|ERROR)\] (.*)")
+
+# (channel, payload, status); src and dest are filled in per connection
+SEEDS = [
+    ("chat", "chat hello", "CHUNK|0|1"),
+    ("chat", "chat hello", "READY"),
+    ("file", "test_file.txt", "REQUEST"),
+    ("file", "test_file.txt", "READY"),
+    ("file", "0123456789abcdef", "CHUNK|0|0"),
+    ("file", "", "DONE"),
+    ("ack", "", "ACK"),
+    ("ack", "3", "RETRY|3"),
+    ("file", "", "TIMEOUT"),
+    ("system", "", "LIST"),
+    ("system", "ID_ASSIGN", "READY"),
+    ("game", "move 1 1", "READY"),
+    ("alert", "hello", "ALERT"),
+]
+MUTATORS = ["bad_crc", "oversized", "embedded_pipe", "invalid_dest", "invalid_src", "empty_field", "unknown_token",
+            "chunk_fields", "truncate", "bit_flip", "nul_bytes", "glued", "chunk_sequence"]
+BAD_IDS = ["-1", "0", "99999", "2147483647", "2147483648", "-2147483649", "99999999999999999999", "", "abc", "1.5",
+           " 1", "0x10"]
+
+class Case:
+    """Frames sent back to back on one connection (one write each) and the mutators that built them."""
+    __slots__ = ("frames", "mutators", "sent_at")
+
+    def __init__(self, frames, mutators):
+        self.frames = frames
+        self.mutators = mutators
+        self.sent_at = None
+
+class Mutator:
+    """
+    Builds cases from seed frames. Field mutators edit [crc, channel, src, dest,
+    payload, status] before encoding, byte mutators edit the encoded frame.
+    """
+
+    def __init__(self, rng, enabled=None):
+        self.rng = rng
+        self.field = {
+            "bad_crc": self.bad_crc, "oversized": self.oversized, "embedded_pipe": self.embedded_pipe,
+            "invalid_dest": self.invalid_dest, "invalid_src": self.invalid_src, "empty_field": self.empty_field,
+            "unknown_token": self.unknown_token, "chunk_fields": self.chunk_fields,
+        }
+        self.byte = {
+            "truncate": self.truncate, "bit_flip": self.bit_flip, "nul_bytes": self.nul_bytes,
+            "glued": self.glued,
+        }
+        self.names = [name for name in MUTATORS if not enabled or name in enabled]
+        if not self.names:
+            raise ValueError(f"No mutator enabled (available: {', '.join(MUTATORS)})")
+
+    def case(self, own_id, ids):
+        rng = self.rng
+        chosen = rng.sample(self.names, rng.choice((1, 1, 2, 3)) if len(self.names) > 1 else 1)
+        dest = rng.choice(ids) if ids else 0
+        if "chunk_sequence" in chosen:
+            return Case(self.chunk_sequence(own_id, dest), chosen)
+        channel, payload, status = rng.choice(SEEDS)
+        fields = [None, channel, str(own_id), str(dest), payload, status]
+        for name in chosen:
+            if name in self.field and name != "bad_crc":
+                self.field[name](fields)
+        fields[0] = compute_crc(fields[4])
+        if "bad_crc" in chosen:
+            self.bad_crc(fields)
+        frame = "|".join(fields).encode(ENCODING)
+        for name in chosen:
+            if name in self.byte:
+                frame = self.byte[name](frame, own_id, dest)
+        return Case([frame], chosen)
+
+    # Field mutators
+
+    def bad_crc(self, fields):
+        good = fields[0]
+        fields[0] = self.rng.choice([f"{(int(good, 16) ^ self.rng.randint(1, 255)):02X}", "ZZ", "0", "000",
+                                     good.lower() if good.lower() != good else "G0", ""])
+
+    def oversized(self, fields):
+        size = self.rng.choice((255, 256, 257, 510, 511, 512, 1024, 4096, 65536))
+        index = self.rng.choice((1, 2, 3, 4, 4, 4, 5))
+        filler = "9" if index in (2, 3) else "A"
+        fields[index] = filler * (size if index in (4, 5) else self.rng.choice((11, 20, 64, size)))
+
+    def embedded_pipe(self, fields):
+        payload = fields[4] or "x"
+        at = self.rng.randint(0, len(payload))
+        fields[4] = payload[:at] + self.rng.choice(("|", "||", "|READY|", "|chat|1|2|", "|CHUNK|0|1")) + payload[at:]
+
+    def invalid_dest(self, fields):
+        fields[3] = self.rng.choice(BAD_IDS + [fields[2]])  # including itself
+
+    def invalid_src(self, fields):
+        fields[2] = self.rng.choice(BAD_IDS + [str(self.rng.randint(1, 64))])  # spoofed sender
+
+    def empty_field(self, fields):
+        fields[self.rng.randint(1, 5)] = ""
+
+    def unknown_token(self, fields):
+        if self.rng.random() < 0.5:
+            fields[1] = self.rng.choice(("CHAT", "chatx", "sys", "x" * 40, "chat ", "files"))
+        else:
+            fields[5] = self.rng.choice(("ready", "READY ", "READYY", "CHUNKS", "OK", "ACK|1|2|3", "START|") +
+                                        tuple(s + "|" for s in STATUSES[:3]))
+
+    def chunk_fields(self, fields):
+        fields[5] = self.rng.choice(("CHUNK", "CHUNK|", "CHUNK|0", "CHUNK|-1|0", "CHUNK|999999|1", "CHUNK|0|2",
+                                     "CHUNK|a|b", "CHUNK|4294967296|1", "CHUNK|0|1|1", "RETRY", "RETRY|-5"))
+
+    # Byte mutators
+
+    def truncate(self, frame, own_id, dest):
+        return frame[:self.rng.randint(0, max(0, len(frame) - 1))]
+
+    def bit_flip(self, frame, own_id, dest):
+        data = bytearray(frame)
+        for _ in range(self.rng.randint(1, 4)):
+            if data:
+                data[self.rng.randrange(len(data))] ^= 1 << self.rng.randrange(8)
+        return bytes(data)
+
+    def nul_bytes(self, frame, own_id, dest):
+        at = self.rng.randint(0, len(frame))
+        return frame[:at] + self.rng.choice((b"\x00", b"\x00" * 8, b"\xff\xfe", b"\r\n", "é".encode())) + frame[at:]
+
+    def glued(self, frame, own_id, dest):
+        other = "|".join(("00", self.rng.choice(CHANNELS), str(own_id), str(dest), "", "READY"))
+        return frame + other.encode(ENCODING) if self.rng.random() < 0.5 else frame * self.rng.randint(2, 5)
+
+    # Multi-frame mutator
+
+    def chunk_sequence(self, own_id, dest):
+        """A chunked chat message that never ends, skips, repeats or mixes indices and senders."""
+        count = self.rng.randint(2, 6)
+        pieces = [f"chat {'x' * 250}" if i == 0 else "y" * 256 for i in range(count)]
+        flags = [0] * (count - 1) + [1]
+        indices = list(range(count))
+        shape = self.rng.choice(("no_last", "skip", "repeat", "reverse", "two_last", "mixed_src", "mixed_dest"))
+        srcs, dests = [own_id] * count, [dest] * count
+        if shape == "no_last":
+            flags[-1] = 0
+        elif shape == "skip":
+            drop = self.rng.randrange(count - 1)
+            del pieces[drop], flags[drop], indices[drop], srcs[drop], dests[drop]
+        elif shape == "repeat":
+            i = self.rng.randrange(count)
+            for seq in (pieces, flags, indices, srcs, dests):
+                seq.insert(i, seq[i])
+        elif shape == "reverse":
+            indices.reverse()
+        elif shape == "two_last":
+            flags[0] = 1
+        elif shape == "mixed_src":
+            srcs[-1] = self.rng.choice((own_id + 1, 0, -1))
+        else:
+            dests[-1] = self.rng.choice((0, -1, 99999))
+        return ["|".join((compute_crc(p), "chat", str(s), str(d), p, f"CHUNK|{i}|{f}")).encode(ENCODING)
+                for p, s, d, i, f in zip(pieces, srcs, dests, indices, flags)]
+
+class FuzzConnection:
+    """A raw connection firing cases; reads are drained so the server never blocks on it."""
+
+    def __init__(self, host, port, role):
+        self.host = host
+        self.port = port
+        self.role = role
+        self.client_id = None
+        self.reader = self.writer = None
+        self.recent = collections.deque()
+        self.reconnects = 0
+
+    async def connect(self, known_ids):
+        self.reader, self.writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port),
+                                                          HANDSHAKE_TIMEOUT)
+        return asyncio.create_task(self._drain(known_ids))
+
+    async def _drain(self, known_ids):
+        splitter = FrameSplitter()
+        try:
+            while data := await self.reader.read(65536):
+                if self.client_id is None:
+                    for frame in splitter.feed(data):
+                        if frame.channel == "system" and frame.payload == "ID_ASSIGN":
+                            self.client_id = frame.dest
+                            known_ids.add(frame.dest)
+        except (ConnectionError, OSError):
+            pass
+
+    async def send(self, case, gap):
+        case.sent_at = time.monotonic()
+        self.recent.append(case)
+        while self.recent and self.recent[0].sent_at < case.sent_at - RECENT_WINDOW:
+            self.recent.popleft()
+        for frame in case.frames:
+            self.writer.write(frame)
+            await self.writer.drain()
+            if gap:
+                await asyncio.sleep(gap)
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+
+class Watchdog:
+    """Two clean clients exchanging chat messages; the round trip is the server's pulse."""
+
+    def __init__(self, port, hang_timeout=HANG_TIMEOUT):
+        self.port = port
+        self.hang_timeout = hang_timeout
+        self.latencies = []
+        self.sender = ProtocolClient(port=port, name="watchdog-a")
+        self.receiver = ProtocolClient(port=port, name="watchdog-b")
+        self.probes = 0
+
+    async def connect(self):
+        await self.sender.connect()
+        await self.receiver.connect()
+        await asyncio.gather(self.sender.wait_started(), self.receiver.wait_started())
+        return [self.sender.client_id, self.receiver.client_id]
+
+    async def probe(self):
+        """Round trip in seconds, or None when the message took longer than hang_timeout."""
+        self.probes += 1
+        token = f"watchdog {self.probes}"
+        start = time.monotonic()
+        try:
+            await self.sender.send_chat(self.receiver.client_id, token)
+            await self.receiver.wait_for(lambda f: f.channel == "chat" and token in f.payload, self.hang_timeout)
+        except (asyncio.TimeoutError, ConnectionError, OSError):
+            return None
+        latency = time.monotonic() - start
+        self.latencies.append(latency)
+        return latency
+
+    async def close(self):
+        await asyncio.gather(self.sender.close(), self.receiver.close())
+
+def server_paths(log_path):
+    """Warning/error lines the server printed, with numbers folded ("client N")."""
+    counts = collections.Counter()
+    if os.path.exists(log_path):
+        with open(log_path, errors="replace") as f:
+            for line in f:
+                if match := WARN_RE.search(line):
+                    counts[re.sub(r"\d+", "N", match.group(1).strip())] += 1
+    return dict(counts.most_common())
+
+def describe_exit(code):
+    return f"killed by signal {-code}" if code < 0 else f"exited with code {code}"
+
+async def fuzz_campaign(server, duration, connections, rng, mutators=None, gap=FRAME_GAP, hang_timeout=HANG_TIMEOUT,
+                        roles=("chat", "file")):
+    mutator = Mutator(rng, mutators)
+    watchdog = Watchdog(server.chat_port, hang_timeout)
+    known_ids = set(await watchdog.connect())
+    ports = {"chat": server.chat_port, "file": server.file_port}
+    conns = [FuzzConnection("127.0.0.1", ports[roles[i % len(roles)]], roles[i % len(roles)]) for i in range(connections)]
+    drains = [await conn.connect(known_ids) for conn in conns]
+    stats = collections.Counter()
+    used = collections.Counter()
+    finding = None
+    stop = asyncio.Event()
+
+    async def fire(conn, index):
+        while not stop.is_set():
+            case = mutator.case(conn.client_id or 0, sorted(known_ids) + [rng.randint(-2, 70)])
+            try:
+                await conn.send(case, gap)
+            except (ConnectionError, OSError):
+                if server.proc.poll() is not None:
+                    return
+                conn.close()
+                conn.reconnects += 1
+                try:
+                    drains[index] = await conn.connect(known_ids)
+                except (ConnectionError, OSError, asyncio.TimeoutError):
+                    await asyncio.sleep(PROBE_INTERVAL)
+                continue
+            stats["execs"] += 1
+            stats["frames"] += len(case.frames)
+            stats["bytes"] += sum(len(f) for f in case.frames)
+            used.update(case.mutators)
+            if not gap:
+                await asyncio.sleep(0)  # writes rarely block on loopback: let the watchdog run
+
+    async def watch():
+        nonlocal finding
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline and finding is None:
+            await asyncio.sleep(PROBE_INTERVAL)
+            if server.proc.poll() is not None:
+                finding = {"kind": "crash", "detail": describe_exit(server.proc.returncode)}
+            elif await watchdog.probe() is None:
+                finding = {"kind": "crash" if server.proc.poll() is not None else "hang",
+                           "detail": describe_exit(server.proc.returncode) if server.proc.poll() is not None
+                           else f"watchdog round trip above {hang_timeout:.1f}s"}
+        stop.set()
+
+    print(f"🧨 Fuzzing {len(conns)} connection(s) for {duration:.0f}s with {', '.join(mutator.names)}")
+    started = time.monotonic()
+    await asyncio.gather(watch(), *(fire(conn, i) for i, conn in enumerate(conns)))
+    elapsed = time.monotonic() - started
+
+    suspects = sorted((case for conn in conns for case in conn.recent), key=lambda c: c.sent_at)[-MAX_SUSPECTS:]
+    for conn in conns:
+        conn.close()
+    for task in drains:
+        task.cancel()
+    await asyncio.gather(*drains, return_exceptions=True)
+    with contextlib.suppress(Exception):
+        await watchdog.close()
+    return {
+        "elapsed_s": elapsed,
+        "execs": stats["execs"],
+        "execs_per_sec": stats["execs"] / elapsed if elapsed > 0 else 0.0,
+        "frames_sent": stats["frames"],
+        "bytes_sent": stats["bytes"],
+        "connections": len(conns),
+        "reconnects": sum(conn.reconnects for conn in conns),
+        "mutators": dict(used.most_common()),
+        "watchdog_ms": percentiles(watchdog.latencies),
+        "finding": finding,
+    }, suspects
+
+class Reproducer:
+    """
+    Replays frames on a server of `version` and tells whether it crashed or hung.
+    The server is kept between attempts that did not reproduce the failure.
+    """
+
+    def __init__(self, version, base_port, hang_timeout, gap=FRAME_GAP):
+        self.version = version
+        self.base_port = base_port
+        self.hang_timeout = hang_timeout
+        self.gap = gap
+        self.stack = None
+        self.server = None
+        self.watchdog = None
+        self.runs = 0
+        self.detail = None
+
+    async def _start(self):
+        self.stack = contextlib.ExitStack()
+        with open(os.devnull, "w") as quiet, contextlib.redirect_stdout(quiet):
+            self.server = self.stack.enter_context(launch_server(self.version, self.base_port))
+        self.watchdog = Watchdog(self.server.chat_port, self.hang_timeout)
+        await self.watchdog.connect()
+
+    async def stop(self):
+        if self.watchdog:
+            with contextlib.suppress(Exception):
+                await self.watchdog.close()
+        if self.stack:
+            self.stack.close()
+        self.stack = self.server = self.watchdog = None
+
+    async def fails(self, frames):
+        """True when sending `frames` on one connection crashes or hangs the server."""
+        self.runs += 1
+        if self.server is None or self.server.proc.poll() is not None:
+            await self.stop()
+            await self._start()
+        conn = FuzzConnection("127.0.0.1", self.server.chat_port, "chat")
+        drain = None
+        try:
+            drain = await conn.connect(set())
+            await conn.send(Case(list(frames), []), self.gap)
+        except (ConnectionError, OSError):
+            pass
+        await asyncio.sleep(0.2)
+        failed = self.server.proc.poll() is not None or await self.watchdog.probe() is None
+        conn.close()
+        if drain:
+            drain.cancel()
+            await asyncio.gather(drain, return_exceptions=True)
+        if failed:
+            self.detail = describe_exit(self.server.proc.returncode) if self.server.proc.poll() is not None else "hang"
+            await self.stop()
+        return failed
+
+async def ddmin(items, fails, budget):
+    """
+    Delta debugging: a smaller list of items that still fails. `budget` is a
+    one-element list of remaining attempts, shared across passes.
+    """
+    granularity = 2
+    while len(items) >= 2 and budget[0] > 0:
+        size = math.ceil(len(items) / granularity)
+        subsets = [items[i:i + size] for i in range(0, len(items), size)]
+        reduced = False
+        for i, subset in enumerate(subsets):
+            complement = [x for j, s in enumerate(subsets) if j != i for x in s]
+            for candidate in (subset, complement):
+                if budget[0] <= 0 or not candidate:
+                    continue
+                budget[0] -= 1
+                if await fails(candidate):
+                    items, reduced = candidate, True
+                    granularity = 2 if candidate is subset else max(granularity - 1, 2)
+                    break
+            if reduced:
+                break
+        if not reduced:
+            if granularity >= len(items):
+                break
+            granularity = min(len(items), granularity * 2)
+    return items
+
+async def minimize(suspects, version, base_port, hang_timeout, runs=MINIMIZE_RUNS):
+    """
+    Smallest frame list (from the cases sent before a finding) that still reproduces
+    it and the mutators of the cases it came from; frames is None when not reproducible.
+    """
+    reproducer = Reproducer(version, base_port, hang_timeout)
+    try:
+        frames = [frame for case in suspects for frame in case.frames]
+        if not frames or not await reproducer.fails(frames):
+            return None, reproducer.runs, set()
+        budget = [runs]
+        cases = await ddmin(suspects, lambda c: reproducer.fails([f for case in c for f in case.frames]), budget)
+        frames = await ddmin([f for case in cases for f in case.frames], reproducer.fails, budget)
+        # Bytes of each remaining frame, while the budget lasts
+        for index in range(len(frames)):
+            rest = lambda data, i=index: reproducer.fails(frames[:i] + [bytes(data)] + frames[i + 1:])
+            frames[index] = bytes(await ddmin(list(frames[index]), rest, budget))
+        return frames, reproducer.runs, {m for case in cases for m in case.mutators}
+    finally:
+        await reproducer.stop()
+
+def save_finding(finding, frames, mutators, version, minimized, corpus_dir=CORPUS_DIR):
+    os.makedirs(corpus_dir, exist_ok=True)
+    digest = hashlib.sha1(b"\n".join(frames)).hexdigest()[:12]
+    path = os.path.join(corpus_dir, f"{finding['kind']}_{digest}.json")
+    with open(path, "w") as f:
+        json.dump({
+            "kind": finding["kind"],
+            "detail": finding["detail"],
+            "version": version,
+            "found_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "minimized": minimized,
+            "mutators": sorted(mutators),
+            "frames": [frame.decode(ENCODING) for frame in frames],
+        }, f, indent=2)
+    return path
+
+def run_benchmark(version=None, base_port=BENCH_BASE_PORT, duration=30.0, connections=32, seed=None, mutators=None,
+                  gap=FRAME_GAP, hang_timeout=HANG_TIMEOUT, minimize_runs=MINIMIZE_RUNS):
+    """Launches a server of `version`, fuzzes it and returns (version, metrics)."""
+    raise_fd_limit()
+    rng = random.Random(seed)
+    with launch_server(version, base_port) as server:
+        metrics, suspects = asyncio.run(fuzz_campaign(server, duration, connections, rng, mutators, gap, hang_timeout))
+        log_path = os.path.join(server.workspace, "server.log")
+    version = server.version
+    metrics["server_paths"] = server_paths(log_path)
+    metrics["seed"] = seed
+    finding = metrics["finding"]
+    if finding:
+        print(f"💥 Server {finding['kind']}: {finding['detail']}; minimizing {len(suspects)} suspect case(s)...")
+        frames, runs, mutators_used = asyncio.run(minimize(suspects, version, base_port + 100, hang_timeout,
+                                                           minimize_runs))
+        minimized = frames is not None
+        if not minimized:
+            print(f"⚠️ Not reproducible on a fresh server ({runs} run(s)); saving the suspects as they were")
+            frames = [frame for case in suspects for frame in case.frames]
+            mutators_used = {m for case in suspects for m in case.mutators}
+        else:
+            print(f"🔎 Minimized to {len(frames)} frame(s), {sum(map(len, frames))} bytes in {runs} run(s)")
+        finding["corpus"] = save_finding(finding, frames, mutators_used, version, minimized)
+        finding["frames"] = len(frames)
+        finding["minimize_runs"] = runs
+    return version, metrics
+
+def reproduce(path, version=None, base_port=BENCH_BASE_PORT, hang_timeout=HANG_TIMEOUT):
+    """Replays one corpus entry; returns True when the server still crashes or hangs."""
+    with open(path) as f:
+        entry = json.load(f)
+    frames = [frame.encode(ENCODING) for frame in entry["frames"]]
+
+    async def attempt():
+        reproducer = Reproducer(version, base_port, hang_timeout)
+        try:
+            return await reproducer.fails(frames)
+        finally:
+            await reproducer.stop()
+
+    return asyncio.run(attempt())
+
+def main():
+    parser = argparse.ArgumentParser(description="Fuzz the server's frame parser under load.")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of fuzzing")
+    parser.add_argument("--connections", type=int, default=32, help="Parallel fuzzing connections")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for reproducible campaigns")
+    parser.add_argument("--mutators", default=None, help=f"Comma-separated subset of: {', '.join(MUTATORS)}")
+    parser.add_argument("--gap", type=float, default=FRAME_GAP, help="Seconds between two writes on a connection")
+    parser.add_argument("--hang-timeout", type=float, default=HANG_TIMEOUT, help="Watchdog round trip counted as a hang")
+    parser.add_argument("--minimize-runs", type=int, default=MINIMIZE_RUNS, help="Server runs spent minimizing a finding")
+    parser.add_argument("--reproduce", default=None, metavar="CORPUS_FILE", help="Replay one corpus entry and exit")
+    add_common_args(parser)
+    args = parser.parse_args()
+    mutators = args.mutators.split(",") if args.mutators else None
+    if mutators and set(mutators) - set(MUTATORS):
+        parser.error(f"Unknown mutator(s): {', '.join(sorted(set(mutators) - set(MUTATORS)))}")
+    if args.connections < 1 or args.duration <= 0:
+        parser.error("--connections must be at least 1 and --duration positive")
+
+    if args.reproduce:
+        failed = reproduce(args.reproduce, args.version, args.base_port, args.hang_timeout)
+        print(f"{'💥 Still fails' if failed else '✅ No longer fails'}: {args.reproduce}")
+        raise SystemExit(1 if failed else 0)
+
+    params = {"duration": args.duration, "connections": args.connections, "seed": args.seed, "mutators": mutators,
+              "gap": args.gap, "hang_timeout": args.hang_timeout, "minimize_runs": args.minimize_runs}
+    version, metrics = run_benchmark(args.version, args.base_port, **params)
+    print(f"📊 Fuzzed server {version}: {metrics['execs']} executions in {metrics['elapsed_s']:.1f}s "
+          f"({metrics['execs_per_sec']:.0f}/s), {metrics['frames_sent']} frames, {metrics['reconnects']} reconnect(s)")
+    print(f"   - Watchdog round trip: {format_latency(metrics['watchdog_ms'])}")
+    for path, count in list(metrics["server_paths"].items())[:10]:
+        print(f"   - {count:>8}x {path}")
+    write_results(BENCHMARK, version, params, metrics, args.output)
+    finding = metrics["finding"]
+    if finding:
+        raise SystemExit(f"💥 Server {finding['kind']} ({finding['detail']}), input saved to {finding['corpus']}")
+    print("✅ No crash or hang")
+
+if __name__ == "__main__":
+    main()
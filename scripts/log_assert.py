@@ -0,0 +1,220 @@
+# /**
+#  * @file log_assert.py
+#  * @brief Streaming, incremental assertions over logs/*.log files.
+#  *        Each LogAssert remembers the byte offset it has read up to, so repeated
+#  *        checks only scan newly appended data and long soak logs never get re-read.
+#  *        All expectations registered on a file are combined into a single regex
+#  *        pass over the new data; only the lines that hit the combined pattern are
+#  *        tested against the individual expectations. Scanning works on raw bytes
+#  *        (patterns are encoded as UTF-8), only matched lines are decoded.
+#  *
+#  *        Every match is recorded with its line number, byte offset and the time the
+#  *        line was first seen, and report() lists met and unmet expectations.
+#  *
+#  *        Usage:
+#  *        - log = LogAssert("logs/server.log")
+#  *        - log.expect("forward", r"\[CHAT\] Forwarding from 1 to 2")
+#  *        - log.wait(timeout=15)          # or log.check() for a one-shot assertion
+#  *
+#  * @author Oussama Amara
+#  * @version 1.0
+#  * @date 2025-10-23
+#  */
+
+import logging, os, re, time
+
+POLL_INTERVAL = 0.05
+READ_BLOCK = 1 << 20    # Bytes read from the end of a log for tail()
+SCAN_BLOCK = 16 << 20   # Bytes read per pass, bounds memory when catching up on huge logs
+
+class Expectation:
+    def __init__(self, name, regex, count=1, message=None):
+        self.name = name
+        self.regex = regex
+        self.message = message
+        self.pattern = re.compile(regex.encode())
+        self.count = count
+        self.matches = []  # (line_no, byte_offset, seen_at, line)
+
+    @property
+    def met(self):
+        return len(self.matches) >= self.count
+
+    @property
+    def first_seen(self):
+        return self.matches[0][2] if self.matches else None
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "regex": self.regex,
+            "count": self.count,
+            "matched": len(self.matches),
+            "met": self.met,
+            "first_seen": self.first_seen,
+            "first_line": self.matches[0][0] if self.matches else None,
+        }
+
+class LogAssert:
+    """
+    Incremental matcher for one log file. With `from_end=True`, content already
+    in the file is skipped, so only output of the current session is checked.
+    """
+
+    def __init__(self, path, from_end=False):
+        self.path = path
+        self.offset = os.path.getsize(path) if from_end and os.path.exists(path) else 0
+        self.line_no = 0
+        self.expectations = []
+        self._pending = b""
+        self._combined = None
+
+    def expect(self, name, regex, count=1, message=None):
+        """
+        Registers an expectation; `count` is the number of matching lines required
+        and `message` the AssertionError raised when it is not met.
+        """
+        expectation = Expectation(name, regex, count, message)
+        self.expectations.append(expectation)
+        self._combined = re.compile("|".join(f"(?:{e.regex})" for e in self.expectations).encode(), re.MULTILINE)
+        return expectation
+
+    def __getitem__(self, name):
+        for expectation in self.expectations:
+            if expectation.name == name:
+                return expectation
+        raise KeyError(name)
+
+    def _read_new(self):
+        """
+        Returns (complete lines appended since the last call, more_available).
+        A partial last line is kept until its newline arrives.
+        """
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            return b"", False
+        if size < self.offset:
+            # File was truncated or recreated (clear_logs between sessions)
+            logging.info(f"{self.path} shrank from {self.offset} to {size} bytes, rescanning")
+            self.offset, self.line_no, self._pending = 0, 0, b""
+        if size == self.offset:
+            return b"", False
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read(min(size - self.offset, SCAN_BLOCK))
+        self.offset += len(data)
+        data = self._pending + data
+        cut = data.rfind(b"\n") + 1
+        self._pending = data[cut:]
+        return data[:cut], self.offset < size
+
+    def scan(self, final=False):
+        """
+        Scans newly appended lines. Returns the number of new matches.
+        With `final`, a last line still waiting for its newline is scanned too (for a
+        one-shot check right after a wait: the line a test just waited for on the
+        child's output may not be terminated yet).
+        """
+        found = 0
+        more = True
+        while more:
+            data, more = self._read_new()
+            found += self._scan_block(data)
+        if final and self._pending:
+            data, self._pending = self._pending, b""
+            found += self._scan_block(data + b"\n", self.offset - len(data))
+        return found
+
+    def _scan_block(self, data, base_offset=None):
+        base_line = self.line_no
+        self.line_no += data.count(b"\n")
+        if not data or not self._combined:
+            return 0
+        seen_at = time.time()
+        if base_offset is None:
+            base_offset = self.offset - len(self._pending) - len(data)
+
+        # Line numbers advance incrementally from hit to hit, so the cost
+        # stays linear in the size of the new data.
+        found = 0
+        cursor = 0
+        line_no = base_line + 1
+        done = -1
+        for hit in self._combined.finditer(data):
+            start = data.rfind(b"\n", 0, hit.start()) + 1
+            if start == done:
+                continue  # several hits on one line
+            line_no += data.count(b"\n", cursor, start)
+            cursor = done = start
+            raw = data[start:data.find(b"\n", start)]
+            line = None
+            for expectation in self.expectations:
+                if expectation.pattern.search(raw):
+                    line = line or raw.decode(errors="replace")
+                    expectation.matches.append((line_no, base_offset + start, seen_at, line))
+                    found += 1
+        return found
+
+    @property
+    def unmet(self):
+        return [e for e in self.expectations if not e.met]
+
+    def check(self):
+        """One-shot assertion: scans new data and raises AssertionError if anything is unmet."""
+        self.scan(final=True)
+        self._raise_if_unmet()
+        return self
+
+    def wait(self, timeout, poll=POLL_INTERVAL):
+        """Polls new data until every expectation is met or `timeout` expires."""
+        deadline = time.monotonic() + timeout
+        while True:
+            self.scan()
+            if not self.unmet or time.monotonic() >= deadline:
+                break
+            time.sleep(poll)
+        self._raise_if_unmet()
+        return self
+
+    def _raise_if_unmet(self):
+        unmet = self.unmet
+        if unmet:
+            details = ", ".join(f"{e.name} ({len(e.matches)}/{e.count})" for e in unmet)
+            logging.error(f"Unmet log expectations in {self.path}: {details}")
+            raise AssertionError(unmet[0].message or f"❌ {self.path}: unmet expectation(s): {details}")
+
+    def report(self):
+        return [e.as_dict() for e in self.expectations]
+
+    def print_report(self):
+        for e in self.expectations:
+            if e.met:
+                line_no, _, seen_at, line = e.matches[0]
+                print(f"🔍 {os.path.basename(self.path)}:{line_no} {e.name} @ {time.strftime('%H:%M:%S', time.localtime(seen_at))}: {line.strip()[:120]}")
+            else:
+                print(f"❌ {os.path.basename(self.path)}: {e.name} not found ({len(e.matches)}/{e.count})")
+
+def assert_log(path, expectations, from_end=False):
+    """
+    One-shot helper: `expectations` maps a name to a regex, or to a
+    (regex, failure message) tuple. Returns the LogAssert so callers can
+    inspect the matched lines.
+    """
+    log = LogAssert(path, from_end)
+    for name, spec in expectations.items():
+        regex, message = spec if isinstance(spec, tuple) else (spec, None)
+        log.expect(name, regex, message=message)
+    return log.check()
+
+def tail(path, lines=20):
+    """Last lines of a log, read from the end of the file (for failure previews)."""
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            f.seek(max(0, size - READ_BLOCK))
+            data = f.read().decode(errors="replace")
+    except FileNotFoundError:
+        return ""
+    return "\n".join(data.splitlines()[-lines:])
@@ -0,0 +1,282 @@
+# /**
+#  * @file msg_tracer.py
+#  * @brief Cross-process chat message tracing with a per-hop latency breakdown.
+#  *        Every traced message carries a unique tag ("tr<run>x<seq>") in its text, so
+#  *        the sender, server and receiver events of one message are correlated from
+#  *        the child output streams, each line timestamped as it is read:
+#  *        - submitted : the message line written to the sender's stdin
+#  *        - sent      : sender "Chat message sent in N chunk(s)" (in order per sender)
+#  *        - forwarded : server "[CHAT] Forwarding from X to Y: ... <tag>"
+#  *        - received  : receiver "Received frame: ...|chat|X|Y|... <tag>...|READY"
+#  *        Clients reach the server through fault_proxy.py (no impairment) whose tap adds
+#  *        the wire events, as the server logs a single line per message:
+#  *        - server_in  : the tagged frame going from the sender into the server
+#  *        - server_out : the tagged frame leaving the server towards the receiver
+#  *
+#  *        Hops reported (latency distributions in ms):
+#  *        - client_to_server  : submitted -> server_in (sending client + wire)
+#  *        - server_processing : server_in -> server_out
+#  *        - server_to_client  : server_out -> received (wire + receiving client)
+#  *        - end_to_end        : submitted -> received
+#  *        With --no-proxy the server's "Forwarding" line splits the path instead and
+#  *        server_processing is not available.
+#  *
+#  *        Usage:
+#  *        - python scripts/msg_tracer.py
+#  *        - python scripts/msg_tracer.py --clients 6 --messages 100 --interval 0.02
+#  *        - python scripts/msg_tracer.py --version 2.4 --no-proxy
+#  *
+#  *        In a test: tracer.watch_server(server_out), tracer.watch_client(out, id),
+#  *        tracer.send(proc, out, own_id, target_id, "Hello"), then tracer.report().
+#  *
+#  * @author Oussama Amara
+#  * @version 1.0
+#  * @date 2025-10-27
+#  */
+
+import argparse, itertools, os, random, re, threading, time
+from bench_common import launch_server, percentiles, write_results, format_latency, BENCH_BASE_PORT
+from fault_proxy import run_proxy
+from protocol import decode_frame, FrameError
+from utils import list_versions, spawn, wait_for_pattern, HANDSHAKE_TIMEOUT, EVENT_TIMEOUT
+
+BENCHMARK = "msg_trace"
+TAG_RE = re.compile(r"\btr([0-9a-f]{4})x(\d+)\b")
+SENT_RE = re.compile(r"Chat message sent in \d+ chunk")
+FORWARD_RE = re.compile(r"\[CHAT\] \s*Forwarding from (\d+) to (\d+): ")
+RECEIVED_RE = re.compile(r"Received frame: \w+\|chat\|(\d+)\|(\d+)\|([^|]*)")
+
+EVENTS = ("submitted", "sent", "server_in", "forwarded", "server_out", "received")
+
+# (hop, start events, end events): the first event present in each tuple is used
+HOPS = (
+    ("client_to_server", ("submitted",), ("server_in", "forwarded")),
+    ("server_processing", ("server_in",), ("server_out",)),
+    ("server_to_client", ("server_out", "forwarded"), ("received",)),
+    ("end_to_end", ("submitted",), ("received",)),
+)
+
+class Trace:
+    """One tagged message and the monotonic time of each event seen for it."""
+
+    def __init__(self, tag, sender, target, text):
+        self.tag = tag
+        self.sender = sender
+        self.target = target
+        self.text = text
+        self.events = {}
+
+    def hop(self, starts, ends):
+        start = next((self.events[e] for e in starts if e in self.events), None)
+        end = next((self.events[e] for e in ends if e in self.events), None)
+        return None if start is None or end is None else end - start
+
+    def as_dict(self, origin):
+        return {"tag": self.tag, "sender": self.sender, "target": self.target,
+                "events_ms": {e: (self.events[e] - origin) * 1000 for e in EVENTS if e in self.events}}
+
+class MessageTracer:
+    """
+    Tags chat messages and collects their events from the server and client
+    output streams (OutputTail.on_line) and, optionally, from a fault proxy tap.
+    Events arrive on reader threads and the proxy's loop; a lock guards the traces.
+    """
+
+    def __init__(self):
+        self.run = f"{random.getrandbits(16):04x}"
+        self.seq = itertools.count(1)
+        self.traces = {}
+        self.pending_sent = {}  # sender stream -> traces waiting for "Chat message sent"
+        self.lock = threading.Lock()
+
+    def tag(self, sender, target, text):
+        """Registers a new message and returns (trace, tagged text)."""
+        tag = f"tr{self.run}x{next(self.seq)}"
+        trace = Trace(tag, sender, target, text)
+        with self.lock:
+            self.traces[tag] = trace
+        return trace, f"{tag} {text}"
+
+    def _event(self, tag, event, now):
+        with self.lock:
+            trace = self.traces.get(tag)
+            if trace is not None and event not in trace.events:
+                trace.events[event] = now
+
+    def _tags(self, text):
+        return [f"tr{run}x{seq}" for run, seq in TAG_RE.findall(text) if run == self.run]
+
+    def watch_server(self, out):
+        def on_line(line, now):
+            for match in FORWARD_RE.finditer(line):
+                for tag in self._tags(line[match.end():]):
+                    self._event(tag, "forwarded", now)
+        out.on_line = on_line
+
+    def watch_client(self, out, client_id):
+        """Follows one client's output: its sent confirmations and the tagged chats it receives."""
+        self.pending_sent.setdefault(out, [])
+
+        def on_line(line, now):
+            if SENT_RE.search(line):
+                with self.lock:
+                    queue = self.pending_sent[out]
+                    trace = queue.pop(0) if queue else None
+                    if trace is not None:
+                        trace.events.setdefault("sent", now)
+            for sender, dest, payload in RECEIVED_RE.findall(line):
+                if dest == str(client_id):
+                    for tag in self._tags(payload):
+                        self._event(tag, "received", now)
+        out.on_line = on_line
+
+    def tap(self, connection, event, data, now):
+        """fault_proxy tap: tagged chat frames going into and out of the server."""
+        if event not in ("up", "down") or b"|chat|" not in data:
+            return
+        try:
+            frame = decode_frame(data)
+        except (FrameError, UnicodeDecodeError):
+            return
+        if frame.channel != "chat":
+            return
+        for tag in self._tags(frame.payload):
+            self._event(tag, "server_in" if event == "up" else "server_out", now)
+
+    def send(self, proc, out, sender, target, text, timeout=EVENT_TIMEOUT):
+        """Sends `text` from a client binary to `target` through its prompts; returns the Trace."""
+        trace, tagged = self.tag(sender, target, text)
+        mark = out.mark()
+        proc.stdin.write(f"{target}\n".encode())
+        proc.stdin.flush()
+        wait_for_pattern(out, r"Enter message:", timeout, start=mark)
+        with self.lock:
+            self.pending_sent[out].append(trace)
+            trace.events["submitted"] = time.monotonic()
+        proc.stdin.write(f"chat {tagged}\n".encode())
+        proc.stdin.flush()
+        return trace
+
+    def wait(self, timeout=EVENT_TIMEOUT):
+        """Waits until every traced message was received or `timeout` passed."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self.lock:
+                if all("received" in t.events for t in self.traces.values()):
+                    return True
+            time.sleep(0.05)
+        return False
+
+    def report(self):
+        """Per-hop latency distributions, delivery counts and the slowest hop."""
+        with self.lock:
+            traces = list(self.traces.values())
+        hops = {}
+        for name, starts, ends in HOPS:
+            samples = [d for d in (t.hop(starts, ends) for t in traces) if d is not None]
+            hops[name] = percentiles(samples)
+        parts = [name for name, *_ in HOPS[:3] if hops[name].get("count")]
+        total = sum(hops[name]["mean"] for name in parts)
+        origin = min((t.events["submitted"] for t in traces if "submitted" in t.events), default=0.0)
+        return {
+            "messages": len(traces),
+            "events_seen": {e: sum(1 for t in traces if e in t.events) for e in EVENTS},
+            "delivered": sum(1 for t in traces if "received" in t.events),
+            "lost": [t.tag for t in traces if "received" not in t.events],
+            "hops_ms": hops,
+            "share_of_mean": {name: hops[name]["mean"] / total for name in parts} if total > 0 else {},
+            "slowest_hop": max(parts, key=lambda name: hops[name]["mean"]) if parts else None,
+            "traces": [t.as_dict(origin) for t in traces],
+        }
+
+def print_report(report):
+    print(f"📊 {report['delivered']}/{report['messages']} traced message(s) delivered")
+    for name, stats in report["hops_ms"].items():
+        share = report["share_of_mean"].get(name)
+        print(f"   - {name:18}: {format_latency(stats)}" + (f" ({share:.0%} of the path)" if share is not None else ""))
+    if report["slowest_hop"]:
+        print(f"🔍 Slowest hop: {report['slowest_hop']}")
+    if report["lost"]:
+        print(f"⚠️ Not received: {', '.join(report['lost'][:10])}{' ...' if len(report['lost']) > 10 else ''}")
+
+def start_clients(server, count, port):
+    """Starts `count` client binaries on `port` and waits for their IDs and START."""
+    env = os.environ.copy()
+    env["CONFIG_PORT"] = str(port)
+    clients = []
+    for index in range(count):
+        proc, out = spawn([server.environment.binary("client"), server.environment.config("client_local")],
+                          os.path.join(server.workspace, "logs", f"client_{index}.log"),
+                          stdin=True, env=env, cwd=server.workspace)
+        clients.append((proc, out))
+    ready = []
+    for proc, out in clients:
+        client_id = wait_for_pattern(out, r"Assigned client ID: (\d+)", HANDSHAKE_TIMEOUT).group(1)
+        ready.append((proc, out, client_id))
+    for _, out, _ in ready:
+        wait_for_pattern(out, r"You may begin\|START", HANDSHAKE_TIMEOUT)
+    return ready
+
+def trace_session(server, tracer, clients, messages, interval):
+    """Every client sends `messages` tagged chats to random peers, concurrently."""
+    def sender(proc, out, client_id, peers):
+        for index in range(messages):
+            tracer.send(proc, out, client_id, random.choice(peers), f"trace message {index} from {client_id}")
+            time.sleep(interval)
+
+    threads = []
+    for proc, out, client_id in clients:
+        peers = [other for _, _, other in clients if other != client_id]
+        threads.append(threading.Thread(target=sender, args=(proc, out, client_id, peers), daemon=True))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    tracer.wait(EVENT_TIMEOUT)
+
+def run_trace(version=None, base_port=BENCH_BASE_PORT, clients=3, messages=20, interval=0.05, proxy=True):
+    """Launches a server and `clients` client binaries, traces their chats and returns (version, report)."""
+    tracer = MessageTracer()
+    with launch_server(version, base_port) as server:
+        tracer.watch_server(server.out)
+        procs = []
+        try:
+            if proxy:
+                with run_proxy([(0, server.chat_port)], tap=tracer.tap) as fault_proxy:
+                    procs = start_clients(server, clients, fault_proxy.ports[0])
+                    for _, out, client_id in procs:
+                        tracer.watch_client(out, client_id)
+                    trace_session(server, tracer, procs, messages, interval)
+            else:
+                procs = start_clients(server, clients, server.chat_port)
+                for _, out, client_id in procs:
+                    tracer.watch_client(out, client_id)
+                trace_session(server, tracer, procs, messages, interval)
+        finally:
+            for proc, _, _ in procs:
+                proc.terminate()
+                proc.wait()
+    return server.version, tracer.report()
+
+def main():
+    parser = argparse.ArgumentParser(description="Trace chat messages across the client and server processes.")
+    parser.add_argument("--clients", type=int, default=3, help="Client binaries started (at least 2)")
+    parser.add_argument("--messages", type=int, default=20, help="Messages sent by each client")
+    parser.add_argument("--interval", type=float, default=0.05, help="Seconds between two messages of a client")
+    parser.add_argument("--no-proxy", action="store_true", help="Connect the clients directly (no wire events)")
+    parser.add_argument("--version", choices=list_versions(), default=None, help="bins/ version to trace (default: latest)")
+    parser.add_argument("--base-port", type=int, default=BENCH_BASE_PORT, help="First port tried for the server")
+    parser.add_argument("--output", default=None, help="JSON result file (default: results/bench/msg_trace_<version>_<time>.json)")
+    args = parser.parse_args()
+    if args.clients < 2 or args.messages < 1:
+        parser.error("--clients must be at least 2 and --messages at least 1")
+
+    version, report = run_trace(args.version, args.base_port, args.clients, args.messages, args.interval,
+                                not args.no_proxy)
+    print_report(report)
+    params = {"clients": args.clients, "messages": args.messages, "interval": args.interval, "proxy": not args.no_proxy}
+    write_results(BENCHMARK, version, params, report, args.output)
+    raise SystemExit(0 if not report["lost"] else 1)
+
+if __name__ == "__main__":
+    main()
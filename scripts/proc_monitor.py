@@ -0,0 +1,151 @@
+# /**
+#  * @file proc_monitor.py
+#  * @brief Resource sampling of a running process from /proc/<pid> (Linux).
+#  *        Records RSS, open file descriptors, thread count and CPU usage at a fixed
+#  *        interval on a background thread and appends each sample to a CSV time series.
+#  *        detect_growth() tells a plateau from a leak by fitting a trend line over the
+#  *        samples taken after warm-up.
+#  *
+#  *        Functions:
+#  *        - sample(pid): One snapshot of rss_kb / fds / threads / cpu_s
+#  *        - cpu_time(pid): CPU time in seconds at nanosecond resolution (schedstat)
+#  *        - ProcMonitor(pid, interval, csv_path): Background sampler (start/stop)
+#  *        - detect_growth(samples, key, limit): Flags unbounded growth of one metric
+#  *
+#  * @author Oussama Amara
+#  * @version 1.0
+#  * @date 2025-10-23
+#  */
+
+import csv, logging, os, statistics, threading, time
+
+FIELDS = ["elapsed_s", "rss_kb", "fds", "threads", "cpu_s", "cpu_percent"]
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+def sample(pid):
+    """Reads one snapshot of the process. Raises ProcessLookupError once it has exited."""
+    proc = f"/proc/{pid}"
+    try:
+        with open(f"{proc}/status") as f:
+            status = dict(line.split(":", 1) for line in f if ":" in line)
+        with open(f"{proc}/stat") as f:
+            # Fields after the command name, which may itself contain spaces
+            stat = f.read().rsplit(")", 1)[1].split()
+        fds = len(os.listdir(f"{proc}/fd"))
+    except FileNotFoundError:
+        raise ProcessLookupError(f"Process {pid} is gone")
+    return {
+        "rss_kb": int(status.get("VmRSS", "0 kB").split()[0]),
+        "fds": fds,
+        "threads": int(status["Threads"]),
+        "cpu_s": (int(stat[11]) + int(stat[12])) / CLOCK_TICKS,  # utime + stime
+    }
+
+def cpu_time(pid):
+    """
+    CPU time of all live threads of the process, from /proc/<pid>/task/*/schedstat
+    (nanoseconds, unlike the clock ticks of /proc/<pid>/stat). Returns None when the
+    kernel does not provide schedstat. Raises ProcessLookupError once it has exited.
+    """
+    total = 0
+    try:
+        tasks = os.listdir(f"/proc/{pid}/task")
+    except FileNotFoundError:
+        raise ProcessLookupError(f"Process {pid} is gone")
+    for task in tasks:
+        try:
+            with open(f"/proc/{pid}/task/{task}/schedstat") as f:
+                total += int(f.read().split()[0])
+        except FileNotFoundError:
+            if not os.path.exists(f"/proc/{pid}/task/{task}"):
+                continue  # thread exited while listing
+            return None
+    return total / 1e9
+
+class ProcMonitor:
+    """
+    Samples a process every `interval` seconds until stop() or until the
+    process exits (`exited` is then set). Samples are kept in `samples` and
+    streamed to `csv_path` so a crashed soak run still leaves its time series.
+    """
+
+    def __init__(self, pid, interval=5.0, csv_path=None):
+        if not os.path.isdir("/proc"):
+            raise RuntimeError("❌ Process monitoring requires /proc (Linux)")
+        self.pid = pid
+        self.interval = interval
+        self.csv_path = csv_path
+        self.samples = []
+        self.exited = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        out = open(self.csv_path, "w", newline="") if self.csv_path else None
+        writer = csv.DictWriter(out, FIELDS) if out else None
+        if writer:
+            writer.writeheader()
+        start = time.monotonic()
+        previous = None
+        try:
+            while True:
+                try:
+                    snapshot = sample(self.pid)
+                except ProcessLookupError:
+                    logging.warning(f"Monitored process {self.pid} exited")
+                    self.exited.set()
+                    break
+                now = time.monotonic()
+                snapshot["elapsed_s"] = round(now - start, 3)
+                if previous:
+                    wall = now - previous[0]
+                    snapshot["cpu_percent"] = round((snapshot["cpu_s"] - previous[1]) / wall * 100, 2) if wall > 0 else 0.0
+                else:
+                    snapshot["cpu_percent"] = 0.0
+                previous = (now, snapshot["cpu_s"])
+                self.samples.append(snapshot)
+                if writer:
+                    writer.writerow(snapshot)
+                    out.flush()
+                if self._stop.wait(self.interval):
+                    break
+        finally:
+            if out:
+                out.close()
+
+def detect_growth(samples, key, limit, warmup=0.2):
+    """
+    Flags `key` as growing without bound when, after the first `warmup`
+    fraction of the run, both hold:
+    - the fitted trend adds more than `limit` over the observed window, and
+    - the lowest value of the last quarter is above the highest of the first
+      quarter (a steady climb, not one spike or a plateau reached early).
+    Returns (leaking, details).
+    """
+    window = samples[int(len(samples) * warmup):]
+    if len(window) < 8:
+        return False, {"reason": "not enough samples", "samples": len(window)}
+    xs = [s["elapsed_s"] for s in window]
+    ys = [s[key] for s in window]
+    slope = statistics.linear_regression(xs, ys).slope
+    trend = slope * (xs[-1] - xs[0])
+    quarter = len(window) // 4
+    climbing = min(ys[-quarter:]) > max(ys[:quarter])
+    details = {
+        "start": ys[0],
+        "end": ys[-1],
+        "peak": max(ys),
+        "slope_per_hour": slope * 3600,
+        "trend_growth": trend,
+        "limit": limit,
+        "climbing": climbing,
+    }
+    return trend > limit and climbing, details
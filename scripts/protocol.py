@@ -0,0 +1,149 @@
+# /**
+#  * @file protocol.py
+#  * @brief Wire format of the client-server protocol, shared by the native Python tooling.
+#  *        Frames are plain text: CRC|channel|src|dest|payload|status, where CRC is the
+#  *        XOR of the payload bytes printed as two hex digits (%02X) and status may carry
+#  *        trailing integers (CHUNK|index|n, RETRY|index).
+#  *
+#  *        Frames are not delimited on the wire; the server often coalesces several
+#  *        frames in one send (e.g. "...|LIST51|system|0|1|You may begin|START").
+#  *        FrameSplitter recovers frame boundaries from the CRC|channel|src|dest| header.
+#  *        Payloads are handled as C strings by the binaries: they must not contain
+#  *        NUL bytes, and should avoid '|' so other tools can split frames reliably.
+#  *
+#  *        Functions:
+#  *        - compute_crc(payload): XOR checksum as sent by the binaries
+#  *        - encode_frame(channel, src, dest, payload, status): Builds one frame
+#  *        - decode_frame(data): Parses one frame into a Frame
+#  *        - FrameSplitter.feed(data): Splits a TCP byte stream into frames
+#  *
+#  * @author Oussama Amara
+#  * @version 1.0
+#  * @date 2025-10-21
+#  */
+
+import re
+from collections import namedtuple
+from functools import reduce
+
+CHANNELS = ("system", "chat", "file", "game", "ack", "alert")
+STATUSES = (
+    "READY", "WAIT", "START", "LIST", "ALERT",
+    "CHUNK", "RETRY", "DONE", "ACK", "ERR", "TIMEOUT",
+    "INCOMING", "REQUEST",
+)
+
+# Integer fields that follow a status: CHUNK|index|flag (flag is 0 or 1), RETRY|index
+STATUS_FIELDS = {"CHUNK": rb"\|\d+\|[01]", "RETRY": rb"\|\d+"}
+
+SERVER_ID = 0        # src of frames emitted by the server itself
+CHUNK_SIZE = 256     # payload bytes per CHUNK frame (chat and file)
+MAX_CHAT_LINE = 511  # longest stdin line the binary client accepts (fgets buffer)
+ENCODING = "latin-1" # one char per byte, so payload bytes round-trip unchanged
+
+_HEADER = re.compile(
+    rb"([0-9A-F]{2})\|(" + b"|".join(c.encode() for c in CHANNELS) + rb")\|(-?\d+)\|(-?\d+)\|"
+)
+_TRAILER = re.compile(
+    rb"\|((?:" + b"|".join(s.encode() for s in STATUSES) + rb")(?:\|-?\d+)*)$"
+)
+
+_COMPLETE = re.compile(
+    rb"\|(?:" + b"|".join(re.escape(s.encode()) + STATUS_FIELDS.get(s, b"") for s in STATUSES) + rb")$"
+)
+
+class FrameError(ValueError):
+    """Raised when bytes cannot be parsed as a protocol frame."""
+
+class Frame(namedtuple("Frame", "crc channel src dest payload status")):
+    """
+    One decoded frame. `status` keeps its trailing fields ("CHUNK|0|1");
+    use `kind` and `args` to split them.
+    """
+    __slots__ = ()
+
+    @property
+    def kind(self):
+        return self.status.split("|", 1)[0]
+
+    @property
+    def args(self):
+        return tuple(int(x) for x in self.status.split("|")[1:])
+
+    @property
+    def crc_valid(self):
+        return self.crc == compute_crc(self.payload)
+
+    def encode(self):
+        return "|".join((self.crc, self.channel, str(self.src), str(self.dest), self.payload, self.status)).encode(ENCODING)
+
+def compute_crc(payload):
+    """XOR of all payload bytes, formatted like the binaries' "%02X"."""
+    if isinstance(payload, str):
+        payload = payload.encode(ENCODING)
+    return "%02X" % reduce(lambda acc, byte: acc ^ byte, payload, 0)
+
+def encode_frame(channel, src, dest, payload, status):
+    return Frame(compute_crc(payload), channel, src, dest, payload, status).encode()
+
+def decode_frame(data):
+    """
+    Parses exactly one frame. The payload is everything between the header
+    and the last status token, so payloads may themselves contain pipes.
+    """
+    if isinstance(data, str):
+        data = data.encode(ENCODING)
+    header = _HEADER.match(data)
+    trailer = _TRAILER.search(data)
+    if not header or not trailer or trailer.start() < header.end() - 1:
+        raise FrameError(f"Malformed frame: {data[:80]!r}")
+    crc, channel, src, dest = (g.decode(ENCODING) for g in header.groups())
+    payload = data[header.end():trailer.start()].decode(ENCODING)
+    return Frame(crc, channel, int(src), int(dest), payload, trailer.group(1).decode(ENCODING))
+
+class FrameSplitter:
+    """
+    Incremental decoder for a TCP stream. feed() returns every complete frame
+    seen so far; a trailing segment without a recognizable status is kept
+    until more bytes arrive. Unparseable segments are counted in `errors`.
+    """
+
+    def __init__(self):
+        self.buffer = b""
+        self.errors = 0
+
+    def feed(self, data):
+        self.buffer += data
+        starts = [m.start() for m in _HEADER.finditer(self.buffer)]
+        if not starts:
+            return []
+        if starts[0] > 0:
+            # Garbage before the first header (truncated frame)
+            self.errors += 1
+        frames = []
+        bounds = starts + [len(self.buffer)]
+        consumed = starts[0]
+        for begin, end in zip(bounds, bounds[1:]):
+            segment = self.buffer[begin:end]
+            last = end == len(self.buffer)
+            if last and not _is_complete(segment):
+                break
+            try:
+                frames.append(decode_frame(segment))
+            except FrameError:
+                self.errors += 1
+            consumed = end
+        self.buffer = self.buffer[consumed:]
+        return frames
+
+def _is_complete(segment):
+    """
+    A read may stop inside a status or right after it with the first digit
+    of the next CRC ("...|CHUNK|5|0" + "3"), so a trailing segment only counts
+    once its status has exactly the expected fields.
+    """
+    return _COMPLETE.search(segment) is not None
+
+def chunk_payload(text, size=CHUNK_SIZE):
+    """Splits a payload into CHUNK-sized pieces (at least one, even if empty)."""
+    return [text[i:i + size] for i in range(0, len(text), size)] or [""]
@@ -0,0 +1,343 @@
+# /**
+#  * @file protocol_client.py
+#  * @brief Native asyncio client for load generation without spawning client binaries.
+#  *        Speaks the wire protocol directly (see protocol.py): ID_ASSIGN handshake,
+#  *        LIST / START / WAIT gating, chunked chat, and the file flow
+#  *        (REQUEST -> INCOMING -> READY -> CHUNK/RETRY -> DONE -> ACK).
+#  *        A single Python process can hold thousands of connections against the
+#  *        real server binary.
+#  *
+#  *        Usage (against a running server):
+#  *        - python scripts/protocol_client.py --clients 2000 --port 8081 --hold 30
+#  *
+#  * @author Oussama Amara
+#  * @version 1.0
+#  * @date 2025-10-21
+#  */
+
+import argparse, asyncio, logging, os, re, time
+from collections import namedtuple
+from protocol import FrameSplitter, encode_frame, chunk_payload, SERVER_ID, ENCODING
+from utils import HANDSHAKE_TIMEOUT, EVENT_TIMEOUT
+
+# The server reads one frame per recv() and discards whatever else was
+# coalesced into the same read, so consecutive frames of one connection
+# are spaced slightly.
+FRAME_GAP = 0.002
+
+ChatMessage = namedtuple("ChatMessage", "src dest text received_at")
+
+class FileTransfer:
+    """
+    Receiver-side state of one incoming file. Chunks are streamed to disk in
+    order; chunks arriving ahead of a gap are held until the gap is filled.
+    """
+
+    def __init__(self, name, path=None):
+        self.name = name
+        self.path = path
+        self.total = None
+        self.next_index = 0
+        self.pending = {}
+        self.chunks = 0
+        self.bytes = 0
+        self.retries = 0
+        self.retry_wait = 0.0      # seconds spent between a RETRY and the next chunk
+        self.retry_sent_at = None
+        self.status = "INCOMING"
+        self.started_at = time.monotonic()
+        self.first_chunk_at = None
+        self.finished_at = None
+        self.done = asyncio.Event()
+        self._fh = open(path, "wb") if path else None
+
+    def add_chunk(self, index, total, data, now):
+        if self.first_chunk_at is None:
+            self.first_chunk_at = now
+        if self.retry_sent_at is not None:
+            self.retry_wait += now - self.retry_sent_at
+            self.retry_sent_at = None
+        if total is not None:
+            self.total = total
+        if index < self.next_index or index in self.pending:
+            return
+        self.pending[index] = data
+        while self.next_index in self.pending:
+            piece = self.pending.pop(self.next_index)
+            if self._fh:
+                self._fh.write(piece)
+            self.bytes += len(piece)
+            self.chunks += 1
+            self.next_index += 1
+
+    @property
+    def complete(self):
+        return not self.pending and (self.total is None or self.next_index >= self.total)
+
+    def finish(self, status, now):
+        if self.retry_sent_at is not None:
+            self.retry_wait += now - self.retry_sent_at
+            self.retry_sent_at = None
+        self.status = status
+        self.finished_at = now
+        if self._fh:
+            self._fh.close()
+            self._fh = None
+        self.done.set()
+
+class ProtocolClient:
+    """
+    One protocol connection. Frames are decoded on a reader task and routed
+    to events (assigned, started), the chat inbox (`messages`), file transfers
+    (`transfers`) and any pending wait_for() predicates.
+    """
+
+    def __init__(self, host="127.0.0.1", port=8081, received_dir=None, auto_accept=True, name=None,
+                 frame_gap=FRAME_GAP):
+        self.host = host
+        self.port = port
+        self.name = name or f"client@{port}"
+        self.received_dir = received_dir
+        self.auto_accept = auto_accept
+        self.frame_gap = frame_gap
+        self.client_id = None
+        self.peers = []
+        self.assigned = asyncio.Event()
+        self.started = asyncio.Event()
+        self.closed = asyncio.Event()
+        self.messages = asyncio.Queue()
+        self.transfers = {}
+        self.current_transfer = None
+        self.connect_latency = None
+        self.on_frame = None  # optional hook(frame, monotonic_ts)
+        self.stats = {"frames_in": 0, "frames_out": 0, "bytes_in": 0, "bytes_out": 0, "crc_errors": 0}
+        self._splitter = FrameSplitter()
+        self._chat_parts = {}
+        self._waiters = []
+        self._reader_task = None
+        self._send_lock = asyncio.Lock()
+        self._last_send = 0.0
+        self.reader = self.writer = None
+
+    async def connect(self, timeout=HANDSHAKE_TIMEOUT):
+        """Opens the socket and waits for ID_ASSIGN. Returns the assigned client ID."""
+        start = time.monotonic()
+        self.reader, self.writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), timeout)
+        self._reader_task = asyncio.create_task(self._read_loop())
+        await asyncio.wait_for(self.assigned.wait(), max(0, timeout - (time.monotonic() - start)))
+        self.connect_latency = time.monotonic() - start
+        logging.debug(f"{self.name} assigned ID {self.client_id} in {self.connect_latency * 1000:.1f} ms")
+        return self.client_id
+
+    async def close(self):
+        if self.writer:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+        if self._reader_task:
+            self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except (asyncio.CancelledError, ConnectionError, OSError):
+                pass
+
+    async def wait_started(self, timeout=HANDSHAKE_TIMEOUT):
+        await asyncio.wait_for(self.started.wait(), timeout)
+
+    async def send_frame(self, channel, dest, payload, status):
+        """Writes one frame, at least `frame_gap` seconds after the previous one."""
+        data = encode_frame(channel, self.client_id, dest, payload, status)
+        async with self._send_lock:
+            delay = self._last_send + self.frame_gap - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.writer.write(data)
+            await self.writer.drain()
+            self._last_send = time.monotonic()
+        self.stats["frames_out"] += 1
+        self.stats["bytes_out"] += len(data)
+
+    async def send_chat(self, dest, text):
+        """
+        Sends "chat <text>" the way the binary client does: 256-byte CHUNK
+        frames with status CHUNK|index|last. Returns the number of chunks.
+        """
+        pieces = chunk_payload(f"chat {text}")
+        for index, piece in enumerate(pieces):
+            await self.send_frame("chat", dest, piece, f"CHUNK|{index}|{int(index == len(pieces) - 1)}")
+        return len(pieces)
+
+    async def request_file(self, dest, filename):
+        """Asks the server to send assets/to_send/<filename> (server side) to `dest`."""
+        await self.send_frame("file", dest, filename, "REQUEST")
+
+    async def next_message(self, timeout=EVENT_TIMEOUT):
+        return await asyncio.wait_for(self.messages.get(), timeout)
+
+    async def wait_for(self, predicate, timeout=EVENT_TIMEOUT):
+        """Returns the next frame for which predicate(frame) is true."""
+        future = asyncio.get_running_loop().create_future()
+        entry = (predicate, future)
+        self._waiters.append(entry)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+
+    async def expect(self, kind, channel=None, timeout=EVENT_TIMEOUT):
+        return await self.wait_for(lambda f: f.kind == kind and (channel is None or f.channel == channel), timeout)
+
+    async def _read_loop(self):
+        try:
+            while True:
+                data = await self.reader.read(65536)
+                if not data:
+                    break
+                now = time.monotonic()
+                self.stats["bytes_in"] += len(data)
+                for frame in self._splitter.feed(data):
+                    self._dispatch(frame, now)
+        except (ConnectionError, OSError) as e:
+            logging.debug(f"{self.name} connection lost: {e}")
+        finally:
+            self.closed.set()
+            for _, future in self._waiters:
+                if not future.done():
+                    future.set_exception(ConnectionError(f"{self.name} disconnected"))
+
+    def _dispatch(self, frame, now):
+        self.stats["frames_in"] += 1
+        if not frame.crc_valid:
+            self.stats["crc_errors"] += 1
+            logging.warning(f"{self.name} dropped frame with bad CRC: {frame}")
+            return
+
+        kind = frame.kind
+        if frame.channel == "system":
+            if frame.payload == "ID_ASSIGN":
+                self.client_id = frame.dest
+                self.assigned.set()
+            elif kind == "LIST":
+                self.peers = [(int(cid), name) for cid, name in re.findall(r"(\d+),([^;,\n]+)", frame.payload)]
+            elif kind == "START":
+                self.started.set()
+            elif kind == "WAIT":
+                self.started.clear()
+        elif frame.channel == "chat":
+            self._on_chat(frame, now)
+        elif frame.channel == "file":
+            self._on_file(frame, now)
+
+        if self.on_frame:
+            self.on_frame(frame, now)
+        for predicate, future in list(self._waiters):
+            if not future.done() and predicate(frame):
+                future.set_result(frame)
+
+    def _on_chat(self, frame, now):
+        if frame.kind == "CHUNK":
+            parts = self._chat_parts.setdefault(frame.src, [])
+            parts.append(frame.payload)
+            if frame.args and frame.args[-1] != 1:
+                return
+            text = "".join(self._chat_parts.pop(frame.src))
+        else:
+            text = frame.payload
+        self.messages.put_nowait(ChatMessage(frame.src, frame.dest, text, now))
+
+    def _on_file(self, frame, now):
+        kind = frame.kind
+        if kind == "INCOMING":
+            name = os.path.basename(frame.payload)
+            path = os.path.join(self.received_dir, name) if self.received_dir else None
+            if path:
+                os.makedirs(self.received_dir, exist_ok=True)
+            self.current_transfer = self.transfers[name] = FileTransfer(name, path)
+            if self.auto_accept:
+                asyncio.ensure_future(self.send_frame("file", SERVER_ID, name, "READY"))
+        elif kind == "CHUNK" and self.current_transfer:
+            # CHUNK|index|last: the total is only known once the last flag is set
+            args = frame.args
+            index = args[0] if args else self.current_transfer.next_index
+            total = index + 1 if len(args) > 1 and args[1] == 1 else None
+            self.current_transfer.add_chunk(index, total, frame.payload.encode(ENCODING), now)
+        elif kind == "DONE" and self.current_transfer:
+            transfer = self.current_transfer
+            if not transfer.complete:
+                transfer.retries += 1
+                transfer.retry_sent_at = now
+                asyncio.ensure_future(self.send_frame("file", SERVER_ID, transfer.name, f"RETRY|{transfer.next_index}"))
+                return
+            transfer.finish("DONE", now)
+            self.current_transfer = None
+            asyncio.ensure_future(self.send_frame("file", SERVER_ID, transfer.name, "ACK"))
+        elif kind in ("ERR", "TIMEOUT") and self.current_transfer:
+            self.current_transfer.finish(kind, now)
+            self.current_transfer = None
+
+def raise_fd_limit():
+    """Lifts the soft open-files limit to the hard limit (one fd per connection)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return hard
+
+async def connect_clients(count, host="127.0.0.1", port=8081, concurrency=200, timeout=HANDSHAKE_TIMEOUT, **kwargs):
+    """
+    Opens `count` clients with at most `concurrency` handshakes in flight.
+    Returns (connected_clients, failures) where failures lists the exceptions.
+    """
+    gate = asyncio.Semaphore(concurrency)
+
+    async def open_one(index):
+        client = ProtocolClient(host, port, name=f"client_{index}", **kwargs)
+        async with gate:
+            try:
+                await client.connect(timeout)
+                return client
+            except (OSError, asyncio.TimeoutError, ConnectionError) as e:
+                await client.close()
+                return e
+
+    results = await asyncio.gather(*(open_one(i) for i in range(count)))
+    clients = [r for r in results if isinstance(r, ProtocolClient)]
+    failures = [r for r in results if not isinstance(r, ProtocolClient)]
+    return clients, failures
+
+async def _hold(args):
+    print(f"🚀 Opening {args.clients} connection(s) to {args.host}:{args.port}...")
+    start = time.monotonic()
+    clients, failures = await connect_clients(args.clients, args.host, args.port, args.concurrency)
+    elapsed = time.monotonic() - start
+    latencies = sorted(c.connect_latency for c in clients)
+    print(f"✅ {len(clients)} connected, ❌ {len(failures)} failed in {elapsed:.2f}s")
+    if latencies:
+        print(f"⏱️ ID_ASSIGN latency p50={latencies[len(latencies) // 2] * 1000:.1f} ms "
+              f"max={latencies[-1] * 1000:.1f} ms")
+    if args.hold:
+        print(f"⏳ Holding connections for {args.hold}s...")
+        await asyncio.sleep(args.hold)
+    alive = sum(1 for c in clients if not c.closed.is_set())
+    print(f"🔍 {alive}/{len(clients)} connection(s) still open.")
+    await asyncio.gather(*(c.close() for c in clients))
+
+def main():
+    parser = argparse.ArgumentParser(description="Hold many native protocol connections against a running server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=200, help="Handshakes in flight at once")
+    parser.add_argument("--hold", type=float, default=0, help="Seconds to keep the connections open")
+    args = parser.parse_args()
+    raise_fd_limit()
+    asyncio.run(_hold(args))
+
+if __name__ == "__main__":
+    main()
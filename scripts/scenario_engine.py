@@ -0,0 +1,587 @@
+# /**
+#  * @file scenario_engine.py
+#  * @brief Declarative protocol scenarios run concurrently on one asyncio event loop.
+#  *        A scenario lists its processes (a server and client binaries) and the steps
+#  *        to play: inputs written to a client's stdin and the events expected in the
+#  *        processes' output. The engine runs many scenarios at once in one process;
+#  *        every child's output is read on the event loop (no thread per test or per
+#  *        pipe), each scenario gets its own port triple and workspace, and the results
+#  *        are written like the test runner's (results.json, junit.xml).
+#  *
+#  *        Python DSL (see scenarios.py for the built-in library):
+#  *            Scenario("chat_basic",
+#  *                     [Server(), Client("a"), Client("b")],
+#  *                     [handshake("a", "b"),
+#  *                      Phase("action"),
+#  *                      chat("a", "b", "Hello from A"),
+#  *                      Expect("server", r"\[CHAT\] Forwarding from ${a_id} to ${b_id}"),
+#  *                      Expect("b", r"Received frame: \w+\|chat\|${a_id}\|${b_id}\|chat Hello from A\|READY")])
+#  *
+#  *        Steps:
+#  *        - Expect(process, regex): waits for a matching line since the process's last Send
+#  *          (since="start" for the whole output); named groups become ${variables}
+#  *        - Absent(process, regex, within): fails if a matching line shows up in time
+#  *        - Send(process, text): writes one line to the process's stdin
+#  *        - Sleep, Start / Stop (late or stopped clients), Phase (result phases),
+#  *          Parallel(*steps), CopyAsset (assets/<name> to assets/to_send/), ExpectFile
+#  *        - handshake(*clients) and chat(sender, target, text) expand to the usual steps
+#  *        ${name} in any text or regex is replaced by a captured variable (escaped in regexes).
+#  *
+#  *        YAML/JSON files hold the same structure (YAML needs PyYAML):
+#  *            - name: chat_basic
+#  *              processes: [{server: server}, {client: a}, {client: b}]
+#  *              steps:
+#  *                - handshake: [a, b]
+#  *                - chat: [a, b, Hello from A]
+#  *                - expect: {process: b, pattern: "chat Hello from A\\|READY"}
+#  *
+#  *        Usage:
+#  *        - python scripts/scenario_engine.py                        # built-in scenarios
+#  *        - python scripts/scenario_engine.py chat_basic file_transfer --version 2.6
+#  *        - python scripts/scenario_engine.py --variants 200 -j 64   # generated variants
+#  *        - python scripts/scenario_engine.py --file my_scenarios.yaml
+#  *
+#  * @author Oussama Amara
+#  * @version 1.0
+#  * @date 2025-10-27
+#  */
+
+import argparse, asyncio, filecmp, json, os, re, runpy, shutil, sys, time
+from protocol_client import raise_fd_limit
+from test_result import TestResult, OK_STATUSES
+from test_runner import port_is_free, prepare_workspace, write_json_report, write_junit, RESULTS_DIR, PORT_STRIDE
+from utils import resolve_environment, list_versions, CONFIG_CHANNELS, PORT_ENV_VARS, STARTUP_TIMEOUT, \
+    HANDSHAKE_TIMEOUT, EVENT_TIMEOUT
+
+SCENARIO_BASE_PORT = 24000  # Above the test runner's ports, below the benchmarks' and the ephemeral range
+SCENARIO_PORT_SPAN = 6000   # Port triples are reused within this span as scenarios finish
+DEFAULT_JOBS = 32           # Scenarios in flight; they mostly wait on their children
+STOP_TIMEOUT = 5
+VARIABLE_RE = re.compile(r"\$\{(\w+)\}")
+
+class ScenarioError(ValueError):
+    """Raised for a malformed scenario (unknown process, step or variable)."""
+
+# ---------------------------------------------------------------- processes
+
+class Server:
+    kind = "server"
+
+    def __init__(self, name="server", config="server", ready=r"Server listening", ready_count=3):
+        self.name = name
+        self.config = config
+        self.ready = ready
+        self.ready_count = ready_count
+        self.start = True
+
+class Client:
+    kind = "client"
+
+    def __init__(self, name, config="client_local", start=True):
+        if config not in CONFIG_CHANNELS:
+            raise ScenarioError(f"Unknown client config: {config}")
+        self.name = name
+        self.config = config
+        self.start = start
+
+class ChildOutput:
+    """Output of one child, read on the event loop and mirrored to its log file."""
+
+    def __init__(self, name, log_path):
+        self.name = name
+        self.lines = []
+        self.partial = ""
+        self.closed = False
+        self._changed = asyncio.Condition()
+        self._log = open(log_path, "w")
+
+    async def pump(self, stream):
+        while True:
+            data = await stream.read(65536)
+            if not data:
+                break
+            text = data.decode(errors="replace")
+            self._log.write(text)
+            self._log.flush()
+            pieces = (self.partial + text).split("\n")
+            self.partial = pieces.pop()
+            self.lines.extend(pieces)
+            async with self._changed:
+                self._changed.notify_all()
+        self.closed = True
+        self._log.close()
+        async with self._changed:
+            self._changed.notify_all()
+
+    def mark(self):
+        return len(self.lines)
+
+    async def wait_for(self, pattern, timeout, start=0, count=1):
+        deadline = time.monotonic() + timeout
+        found = 0
+        index = start
+        async with self._changed:
+            while True:
+                while index < len(self.lines):
+                    match = pattern.search(self.lines[index])
+                    index += 1
+                    if match:
+                        found += 1
+                        if found >= count:
+                            return match
+                match = pattern.search(self.partial)
+                if match and found + 1 >= count:
+                    return match
+                remaining = deadline - time.monotonic()
+                if self.closed or remaining <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(self._changed.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+        reason = "process exited" if self.closed else f"timed out after {timeout}s"
+        raise TimeoutError(f"❌ '{pattern.pattern}' not seen in {self.name} ({reason})")
+
+    def tail(self, count=10):
+        return "\n".join(self.lines[-count:] + ([self.partial] if self.partial else []))
+
+class Child:
+    def __init__(self, spec, proc, output, pump):
+        self.spec = spec
+        self.proc = proc
+        self.output = output
+        self.pump = pump
+        self.cursor = 0  # Expect looks at output printed since the last Send
+
+# ---------------------------------------------------------------- steps
+
+class Step:
+    async def run(self, run):
+        raise NotImplementedError
+
+class Expect(Step):
+    def __init__(self, process, pattern, timeout=EVENT_TIMEOUT, count=1, since="cursor"):
+        self.process = process
+        self.pattern = pattern
+        self.timeout = timeout
+        self.count = count
+        self.since = since
+
+    async def run(self, run):
+        child = run.child(self.process)
+        pattern = re.compile(run.substitute(self.pattern, regex=True))
+        start = 0 if self.since == "start" else child.cursor
+        match = await child.output.wait_for(pattern, self.timeout, start, self.count)
+        run.variables.update({k: v for k, v in match.groupdict().items() if v is not None})
+
+    def __repr__(self):
+        return f"expect {self.process}: {self.pattern}"
+
+class Absent(Step):
+    def __init__(self, process, pattern, within=1.0, since="cursor"):
+        self.process = process
+        self.pattern = pattern
+        self.within = within
+        self.since = since
+
+    async def run(self, run):
+        child = run.child(self.process)
+        pattern = re.compile(run.substitute(self.pattern, regex=True))
+        start = 0 if self.since == "start" else child.cursor
+        try:
+            match = await child.output.wait_for(pattern, self.within, start)
+        except TimeoutError:
+            return
+        raise AssertionError(f"❌ Unexpected line in {self.process}: {match.string.strip()}")
+
+    def __repr__(self):
+        return f"absent {self.process}: {self.pattern}"
+
+class Send(Step):
+    def __init__(self, process, text):
+        self.process = process
+        self.text = text
+
+    async def run(self, run):
+        child = run.child(self.process)
+        if child.proc.stdin is None:
+            raise ScenarioError(f"Process '{self.process}' takes no input")
+        child.cursor = child.output.mark()
+        child.proc.stdin.write((run.substitute(self.text) + "\n").encode())
+        await child.proc.stdin.drain()
+
+    def __repr__(self):
+        return f"send {self.process}: {self.text[:60]}"
+
+class Sleep(Step):
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    async def run(self, run):
+        await asyncio.sleep(self.seconds)
+
+    def __repr__(self):
+        return f"sleep {self.seconds}s"
+
+class Start(Step):
+    def __init__(self, process):
+        self.process = process
+
+    async def run(self, run):
+        await run.start(run.spec(self.process))
+
+    def __repr__(self):
+        return f"start {self.process}"
+
+class Stop(Step):
+    def __init__(self, process):
+        self.process = process
+
+    async def run(self, run):
+        await run.stop(run.child(self.process))
+
+    def __repr__(self):
+        return f"stop {self.process}"
+
+class Phase(Step):
+    def __init__(self, name):
+        self.name = name
+
+    async def run(self, run):
+        run.result.phase(self.name)
+
+    def __repr__(self):
+        return f"phase {self.name}"
+
+class Parallel(Step):
+    def __init__(self, *steps):
+        self.steps = flatten(steps)
+
+    async def run(self, run):
+        await asyncio.gather(*(run.step(step) for step in self.steps))
+
+    def __repr__(self):
+        return f"parallel ({len(self.steps)} steps)"
+
+class CopyAsset(Step):
+    def __init__(self, name, to="to_send"):
+        self.name = name
+        self.to = to
+
+    async def run(self, run):
+        target = os.path.join(run.workspace, "assets", self.to)
+        os.makedirs(target, exist_ok=True)
+        os.makedirs(os.path.join(run.workspace, "assets", "received"), exist_ok=True)
+        shutil.copy(os.path.join(run.workspace, "assets", self.name), os.path.join(target, self.name))
+
+    def __repr__(self):
+        return f"copy asset {self.name}"
+
+class ExpectFile(Step):
+    """Waits for a workspace file; with `same_as`, its content must equal that asset."""
+
+    def __init__(self, path, same_as=None, timeout=EVENT_TIMEOUT):
+        self.path = path
+        self.same_as = same_as
+        self.timeout = timeout
+
+    async def run(self, run):
+        path = os.path.join(run.workspace, run.substitute(self.path))
+        deadline = time.monotonic() + self.timeout
+        while not os.path.exists(path):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"❌ {self.path} not created in {self.timeout}s")
+            await asyncio.sleep(0.1)
+        if self.same_as:
+            expected = os.path.join(run.workspace, "assets", self.same_as)
+            while not filecmp.cmp(path, expected, shallow=False):
+                if time.monotonic() > deadline:
+                    raise AssertionError(f"❌ {self.path} differs from {self.same_as}")
+                await asyncio.sleep(0.1)
+
+    def __repr__(self):
+        return f"expect file {self.path}"
+
+def handshake(*clients):
+    """ID assignment (captured as ${<client>_id}) and START for each client."""
+    steps = [Phase("handshake")]
+    steps += [Expect(c, fr"Assigned client ID: (?P<{c}_id>\d+)", HANDSHAKE_TIMEOUT) for c in clients]
+    steps += [Expect(c, r"You may begin\|START", HANDSHAKE_TIMEOUT) for c in clients]
+    return steps
+
+def chat(sender, target, text):
+    """`sender` sends a chat message to `target` through the client prompts."""
+    return [Send(sender, f"${{{target}_id}}"), Expect(sender, r"Enter message:"), Send(sender, f"chat {text}")]
+
+def flatten(steps):
+    flat = []
+    for step in steps:
+        if isinstance(step, (list, tuple)):
+            flat += flatten(step)
+        else:
+            flat.append(step)
+    return flat
+
+class Scenario:
+    def __init__(self, name, processes, steps):
+        self.name = name
+        self.processes = {p.name: p for p in processes}
+        if len(self.processes) != len(processes):
+            raise ScenarioError(f"{name}: duplicate process names")
+        self.steps = flatten(steps)
+
+# ---------------------------------------------------------------- execution
+
+class ScenarioRun:
+    """One scenario on its port triple and in its workspace."""
+
+    def __init__(self, scenario, env, ports, workspace):
+        self.scenario = scenario
+        self.env = env
+        self.ports = dict(zip(("chat", "file", "game"), ports))
+        self.workspace = workspace
+        self.children = {}
+        self.variables = {}
+        self.result = TestResult(scenario.name)
+        self.transcript = []
+        self.started = time.monotonic()
+
+    def spec(self, name):
+        try:
+            return self.scenario.processes[name]
+        except KeyError:
+            raise ScenarioError(f"{self.scenario.name}: unknown process '{name}'") from None
+
+    def child(self, name):
+        if name not in self.children:
+            self.spec(name)
+            raise ScenarioError(f"{self.scenario.name}: process '{name}' was not started")
+        return self.children[name]
+
+    def substitute(self, text, regex=False):
+        def value(match):
+            if match.group(1) not in self.variables:
+                raise ScenarioError(f"{self.scenario.name}: variable '{match.group(1)}' not captured yet")
+            found = self.variables[match.group(1)]
+            return re.escape(found) if regex else found
+        return VARIABLE_RE.sub(value, text)
+
+    def child_env(self, spec):
+        env = os.environ.copy()
+        for channel, port in self.ports.items():
+            env[PORT_ENV_VARS[channel]] = str(port)
+        if spec.kind == "client":
+            env["CONFIG_PORT"] = str(self.ports[CONFIG_CHANNELS[spec.config]])
+        return env
+
+    async def start(self, spec):
+        binary = self.env.binary(spec.kind)
+        proc = await asyncio.create_subprocess_exec(
+            binary, self.env.config(spec.config),
+            stdin=asyncio.subprocess.PIPE if spec.kind == "client" else None,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+            cwd=self.workspace, env=self.child_env(spec)
+        )
+        output = ChildOutput(spec.name, os.path.join(self.workspace, "logs", f"{spec.name}.log"))
+        child = Child(spec, proc, output, asyncio.ensure_future(output.pump(proc.stdout)))
+        self.children[spec.name] = child
+        self.log(f"started {spec.name} (pid {proc.pid})")
+        if spec.kind == "server":
+            await output.wait_for(re.compile(spec.ready), STARTUP_TIMEOUT, count=spec.ready_count)
+        return child
+
+    async def stop(self, child):
+        if child.proc.returncode is None:
+            child.proc.terminate()
+            try:
+                await asyncio.wait_for(child.proc.wait(), STOP_TIMEOUT)
+            except asyncio.TimeoutError:
+                child.proc.kill()
+                await child.proc.wait()
+        await child.pump
+
+    async def step(self, step):
+        self.log(repr(step))
+        await step.run(self)
+
+    def log(self, message):
+        self.transcript.append(f"[{time.monotonic() - self.started:8.3f}] {message}")
+
+    async def run(self):
+        """Plays the scenario and returns its TestResult (never raises)."""
+        result = self.result
+        try:
+            result.phase("launch")
+            specs = [s for s in self.scenario.processes.values() if s.start]
+            for spec in (s for s in specs if s.kind == "server"):
+                await self.start(spec)
+            await asyncio.gather(*(self.start(s) for s in specs if s.kind == "client"))
+            for step in self.scenario.steps:
+                await self.step(step)
+            result.metric("steps", len(self.scenario.steps))
+        except Exception as e:
+            result.fail(e)
+            self.log(f"❌ {e}")
+            for name, child in self.children.items():
+                self.log(f"last output of {name}:\n{child.output.tail()}")
+        finally:
+            await asyncio.gather(*(self.stop(child) for child in self.children.values()), return_exceptions=True)
+            with open(os.path.join(self.workspace, "output.log"), "w") as f:
+                f.write("\n".join(self.transcript) + "\n")
+        return result.finish()
+
+async def run_scenarios(scenarios, env, jobs=DEFAULT_JOBS, base_port=SCENARIO_BASE_PORT, run_dir=None):
+    """Runs `scenarios` with at most `jobs` in flight; returns their result dicts in order."""
+    names = [s.name for s in scenarios]
+    duplicates = sorted({n for n in names if names.count(n) > 1})
+    if duplicates:
+        raise ScenarioError(f"Duplicate scenario names: {', '.join(duplicates)}")
+    gate = asyncio.Semaphore(jobs)
+    in_use = set()
+    cursor = [base_port]
+
+    def take_ports():
+        # Triples are handed out as scenarios start (not all up front), so that a long
+        # run stays within the span and clear of the clients' ephemeral source ports
+        for _ in range(SCENARIO_PORT_SPAN // PORT_STRIDE):
+            port = cursor[0]
+            cursor[0] = port + PORT_STRIDE if port + PORT_STRIDE < base_port + SCENARIO_PORT_SPAN else base_port
+            triple = (port, port + 1, port + 2)
+            if port not in in_use and all(port_is_free(p) for p in triple):
+                in_use.add(port)
+                return triple
+        raise RuntimeError("❌ No free port triple left for scenarios")
+
+    async def play(scenario):
+        async with gate:
+            workspace = prepare_workspace(run_dir, scenario.name)
+            ports = take_ports()
+            try:
+                result = await ScenarioRun(scenario, env, ports, workspace).run()
+            finally:
+                in_use.discard(ports[0])
+        if result.passed:
+            print(f"✅ {scenario.name} passed in {result.duration:.1f}s.")
+        elif result.ok:
+            print(f"⚠️ {scenario.name} xfailed after {result.duration:.1f}s, known defect: {result.xfail_reason}")
+        else:
+            phase = f" during {result.failed_phase}" if result.failed_phase else ""
+            print(f"❌ {scenario.name} {result.status} after {result.duration:.1f}s{phase}: {result.error}")
+        return dict(result.as_dict(), workspace=workspace)
+
+    return await asyncio.gather(*(play(s) for s in scenarios))
+
+def run_all(scenarios, version=None, jobs=DEFAULT_JOBS, base_port=SCENARIO_BASE_PORT, results_dir=RESULTS_DIR,
+            json_path=None, junit_path=None):
+    env = resolve_environment(version)
+    run_dir = os.path.join(results_dir, time.strftime("scenarios_%Y%m%d_%H%M%S"))
+    raise_fd_limit()
+    print(f"🚀 Running {len(scenarios)} scenario(s) against version {env.version}, {jobs} at a time")
+    print(f"📁 Workspaces: {run_dir}")
+    started_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+    start = time.monotonic()
+    results = asyncio.run(run_scenarios(scenarios, env, jobs, base_port, run_dir))
+    wall = time.monotonic() - start
+    failures = sum(r["status"] not in OK_STATUSES for r in results)
+    busy = sum(r["duration_s"] or 0 for r in results)
+    suite = {
+        "started_at": started_at,
+        "version": env.version,
+        "run_dir": run_dir,
+        "jobs": jobs,
+        "tests": len(results),
+        "failures": failures,
+        "wall_s": wall,
+        "test_time_s": busy,
+        "parallel_speedup": busy / wall if wall > 0 else None,
+        "scenarios_per_sec": len(results) / wall if wall > 0 else None,
+    }
+    json_path = json_path or os.path.join(run_dir, "results.json")
+    junit_path = junit_path or os.path.join(run_dir, "junit.xml")
+    write_json_report(results, suite, json_path)
+    write_junit(results, suite, junit_path)
+    print(f"\n⏱️ {len(results)} scenario(s) in {wall:.1f}s ({busy:.1f}s of scenario time, "
+          f"x{suite['parallel_speedup'] or 0:.1f} from concurrency), {failures} failure(s).")
+    print(f"📁 Results: {json_path}, {junit_path}")
+    return failures
+
+# ---------------------------------------------------------------- files
+
+STEP_TYPES = {
+    "expect": Expect, "absent": Absent, "send": Send, "sleep": Sleep, "start": Start, "stop": Stop,
+    "phase": Phase, "copy_asset": CopyAsset, "expect_file": ExpectFile, "handshake": handshake, "chat": chat,
+}
+
+def build_step(entry):
+    if not isinstance(entry, dict) or len(entry) != 1:
+        raise ScenarioError(f"A step is a mapping with one key: {entry!r}")
+    (kind, args), = entry.items()
+    if kind == "parallel":
+        return Parallel(*(build_step(e) for e in args))
+    if kind not in STEP_TYPES:
+        raise ScenarioError(f"Unknown step '{kind}' (known: parallel, {', '.join(STEP_TYPES)})")
+    if isinstance(args, dict):
+        return STEP_TYPES[kind](**args)
+    return STEP_TYPES[kind](*args) if isinstance(args, list) else STEP_TYPES[kind](args)
+
+def build_process(entry):
+    entry = dict(entry)
+    if "server" in entry:
+        return Server(entry.pop("server"), **entry)
+    if "client" in entry:
+        return Client(entry.pop("client"), **entry)
+    raise ScenarioError(f"A process needs a 'server' or 'client' name: {entry!r}")
+
+def load_scenarios(path):
+    """Scenarios from a YAML/JSON file or a Python file defining SCENARIOS."""
+    if path.endswith(".py"):
+        return list(runpy.run_path(path)["SCENARIOS"])
+    with open(path) as f:
+        if path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise SystemExit("❌ YAML scenarios need PyYAML (pip install pyyaml); JSON works without it")
+            data = yaml.safe_load(f)
+        else:
+            data = json.load(f)
+    try:
+        return [Scenario(d["name"], [build_process(p) for p in d["processes"]], [build_step(s) for s in d["steps"]])
+                for d in (data if isinstance(data, list) else [data])]
+    except (KeyError, TypeError) as e:
+        raise ScenarioError(f"{path}: malformed scenario ({e})") from None
+
+def main():
+    import scenarios as library
+
+    parser = argparse.ArgumentParser(description="Run declarative protocol scenarios concurrently.")
+    parser.add_argument("names", nargs="*", help=f"Built-in scenarios (default: all): {', '.join(library.BUILTIN)}")
+    parser.add_argument("--file", action="append", default=[], help="YAML/JSON/Python scenario file (repeatable)")
+    parser.add_argument("--variants", type=int, default=0, help="Add this many generated chat variants")
+    parser.add_argument("-j", "--jobs", type=int, default=DEFAULT_JOBS, help="Scenarios in flight at once")
+    parser.add_argument("--base-port", type=int, default=SCENARIO_BASE_PORT, help="First port of the per-scenario blocks")
+    parser.add_argument("--results-dir", default=RESULTS_DIR, help="Folder receiving the run folder")
+    parser.add_argument("--json", default=None, help="JSON results file (default: <run_dir>/results.json)")
+    parser.add_argument("--junit", default=None, help="JUnit XML file (default: <run_dir>/junit.xml)")
+    parser.add_argument("--version", choices=list_versions(), default=None, help="bins/ version to test (default: latest)")
+    args = parser.parse_args()
+
+    unknown = [n for n in args.names if n not in library.BUILTIN]
+    if unknown:
+        parser.error(f"Unknown scenario(s): {', '.join(unknown)}")
+    if args.jobs < 1 or args.variants < 0:
+        parser.error("--jobs must be at least 1 and --variants not negative")
+    try:
+        selected = [library.BUILTIN[n]() for n in args.names]
+        for path in args.file:
+            selected += load_scenarios(path)
+        selected += library.variants(args.variants)
+        if not selected:
+            selected = [build() for build in library.BUILTIN.values()]
+        failures = run_all(selected, args.version, args.jobs, args.base_port, args.results_dir, args.json, args.junit)
+    except (ScenarioError, OSError, RuntimeError) as e:
+        raise SystemExit(f"❌ {e}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# /**
+#  * @file scenarios.py
+#  * @brief Built-in scenarios for scenario_engine.py, written with its Python DSL.
+#  *        The protocol tests re-expressed as scenarios, plus a generator of chat
+#  *        variants (client count, message size, routing) for large concurrent runs.
+#  *
+#  *        Functions:
+#  *        - chat_basic, chunked_chat_message, profanity_filter, interaction_gating,
+#  *          client_list_broadcast, file_transfer, multi_client_chat(clients)
+#  *        - BUILTIN: name -> scenario factory, used by the engine's CLI
+#  *        - variants(count): `count` distinct generated chat scenarios
+#  *
+#  * @author Oussama Amara
+#  * @version 1.0
+#  * @date 2025-10-27
+#  */
+
+import itertools, re
+from scenario_engine import Scenario, Server, Client, Expect, Absent, Send, Stop, Start, Phase, Parallel, \
+    CopyAsset, ExpectFile, handshake, chat
+
+RECEIVED = r"Received frame: \w+\|chat\|${%s_id}\|${%s_id}\|chat %s"
+FORWARDED = r"\[CHAT\] \s*Forwarding from ${%s_id} to ${%s_id}: chat .*?%s"
+
+def delivered(sender, target, text, ready=True):
+    """Server forwarding and receiver delivery of one chat message (`text` is a regex)."""
+    return [Expect("server", FORWARDED % (sender, target, text), since="start"),
+            Expect(target, RECEIVED % (sender, target, text) + (r"\|READY" if ready else ""), since="start")]
+
+def chat_basic(text="Hello from A", name="chat_basic", expect=None):
+    """`expect` is the regex checked on delivery (default: the whole text, then READY)."""
+    return Scenario(name, [Server(), Client("a"), Client("b")], [
+        handshake("a", "b"),
+        Phase("action"),
+        chat("a", "b", text),
+        Expect("a", r"Chat message sent in \d+ chunk\(s\)"),
+        Phase("validation"),
+        delivered("a", "b", expect or re.escape(text), ready=expect is None),
+    ])
+
+def chunked_chat_message(repeat=50, name="chunked_chat_message"):
+    return Scenario(name, [Server(), Client("a"), Client("b")], [
+        handshake("a", "b"),
+        Phase("action"),
+        chat("a", "b", "This is a long message. " * repeat),
+        Expect("a", r"Chat message sent in (?P<chunks>\d+) chunk\(s\)"),
+        Phase("validation"),
+        delivered("a", "b", "This is a long message", ready=False),
+    ])
+
+def profanity_filter(word="fuck"):
+    return Scenario("profanity_filter", [Server(), Client("a"), Client("b")], [
+        handshake("a", "b"),
+        Phase("action"),
+        chat("a", "a", f"This is {word} bad"),  # targets itself: the client's own filter answers
+        Phase("validation"),
+        Expect("a", r"Received frame: \w+\|system\|0\|${a_id}\|Inappropriate language detected\|ALERT"),
+        Absent("server", r"\[CHAT\] \s*Forwarding from ${a_id}", within=1.0),
+    ])
+
+def interaction_gating():
+    return Scenario("interaction_gating", [Server(), Client("alone")], [
+        Phase("handshake"),
+        Expect("alone", r"Assigned client ID: \d+"),
+        Expect("alone", r"Waiting for another client...\|WAIT"),
+        Phase("action"),
+        Send("alone", "chat Should be blocked"),
+        Phase("validation"),
+        Absent("server", r"\[CHAT\] \s*Forwarding", within=1.0),
+    ])
+
+def client_list_broadcast():
+    return Scenario("client_list_broadcast", [Server(), Client("a"), Client("b", start=False)], [
+        Phase("handshake"),
+        Expect("a", r"Assigned client ID: \d+"),
+        Start("b"),
+        Expect("b", r"Assigned client ID: (?P<b_id>\d+)"),
+        Expect("a", r"Received frame: \w+\|system\|0\|\d+\|.*${b_id},Client\|LIST"),
+        Phase("action"),
+        Stop("b"),
+        Expect("server", r"Client ${b_id} disconnected"),
+        Phase("validation"),
+        Expect("a", r"Received frame: \w+\|system\|0\|\d+\|\d+,Client\|LIST", since="start"),
+    ])
+
+def file_transfer(asset="test_file.txt"):
+    clients = [Client("a", "client_local_file"), Client("b", "client_local_file")]
+    return Scenario("file_transfer", [Server()] + clients, [
+        CopyAsset(asset),
+        handshake("a", "b"),
+        Phase("action"),
+        Send("a", "${b_id}"),
+        Expect("a", r"Enter filename"),
+        Send("a", asset),
+        Expect("b", r"Received frame: \w+\|file\|0\|${b_id}\|.*\|DONE"),
+        Phase("validation"),
+        Expect("server", r"\[FILE\] \s*Preparing to send '%s'" % asset, since="start"),
+        Expect("b", r"Received frame: \w+\|file\|0\|${b_id}\|.*%s.*\|INCOMING" % asset, since="start"),
+        ExpectFile(f"assets/received/{asset}", same_as=asset),
+    ])
+
+def multi_client_chat(clients=5, name=None, text="Hello from {sender}", expect=None):
+    """Every client sends `text` to the next client, all at once."""
+    names = [f"c{i}" for i in range(clients)]
+    pairs = [(sender, names[(i + 1) % clients]) for i, sender in enumerate(names)]
+    return Scenario(name or f"multi_client_chat_{clients}", [Server()] + [Client(n) for n in names], [
+        handshake(*names),
+        Phase("action"),
+        Parallel(*(chat(sender, target, text.format(sender=sender)) for sender, target in pairs)),
+        Phase("validation"),
+        [delivered(sender, target, expect.format(sender=sender) if expect else re.escape(text.format(sender=sender)),
+                   ready=expect is None) for sender, target in pairs],
+    ])
+
+BUILTIN = {
+    "chat_basic": chat_basic,
+    "chunked_chat_message": chunked_chat_message,
+    "profanity_filter": profanity_filter,
+    "interaction_gating": interaction_gating,
+    "client_list_broadcast": client_list_broadcast,
+    "file_transfer": file_transfer,
+    "multi_client_chat": multi_client_chat,
+}
+
+def variants(count):
+    """`count` chat scenarios over client counts, message sizes and senders."""
+    grid = itertools.cycle(itertools.product((2, 3, 4), (1, 8, 40)))
+    scenarios = []
+    for index in range(count):
+        clients, words = next(grid)
+        # Long messages are chunked: only their first word is checked on delivery
+        text = " ".join(f"v{index}w{w}" for w in range(words))
+        expect = None if words == 1 else f"v{index}w0 "
+        if clients == 2:
+            scenarios.append(chat_basic(text, f"variant_{index:04d}_chat_{words}w", expect))
+        else:
+            scenarios.append(multi_client_chat(clients, f"variant_{index:04d}_multi_{clients}c_{words}w",
+                                               f"{{sender}} {text}", expect and f"{{sender}} {expect}"))
+    return scenarios
@@ -0,0 +1,190 @@
+# /**
+#  * @file server_pool.py
+#  * @brief Warm server reuse across test cases.
+#  *        Keeps one running server per (version, port set) and hands it to compatible
+#  *        tests in turn instead of spawning and killing a server for every test.
+#  *        Each pooled server also holds an idle "keeper" connection, so the server never
+#  *        drops into its accept-loop sleep (up to 5 s per connection when no client is
+#  *        active), which is what dominated the handshake of short scenarios.
+#  *
+#  *        Between uses the server is reset: the test terminates its clients and
+#  *        release_server() waits until the server's own client table (ID_ASSIGN and
+#  *        "disconnected" lines) is back to the keeper alone. A server that died or does
+#  *        not drain in time is terminated and a fresh one is spawned for the next test.
+#  *
+#  *        Tests that need a pristine server (fixed client IDs, a lone client, exact LIST
+#  *        contents, files relative to the server's folder) set REQUIRES_PRISTINE_SERVER = True
+#  *        at module level and spawn their own; the runner keeps them out of pooled lanes.
+#  *
+#  *        Functions:
+#  *        - acquire_server(env, log_path): Warm server for the current ports, output mirrored to log_path
+#  *        - release_server(proc): Resets the server for the next test (or discards it)
+#  *        - close_pool(): Terminates every pooled server (also run at exit)
+#  *
+#  * @author Oussama Amara
+#  * @version 1.0
+#  * @date 2025-10-27
+#  */
+
+import atexit, logging, os, re, socket, threading, time
+from utils import PORT_ENV_VARS, STARTUP_TIMEOUT, HANDSHAKE_TIMEOUT, get_timeline, spawn, wait_for_pattern
+
+RESET_TIMEOUT = 5  # Seconds for the previous test's clients to disconnect
+PORT_FREE_TIMEOUT = 70  # A server that died leaves its port in TIME_WAIT for up to 60 s
+LISTEN_RE = re.compile(r"Listening on ([\d.]+):(\d+)")
+ASSIGN_RE = re.compile(r"Sent ID_ASSIGN to client (\d+)")
+DISCONNECT_RE = re.compile(r"Client (\d+) disconnected")
+
+class PooledServer:
+    """A running server, its output tail and the keeper connection holding it awake."""
+
+    def __init__(self, key, proc, out):
+        self.key = key
+        self.proc = proc
+        self.out = out
+        self.uses = 0
+        self.keeper = None
+        self.keeper_id = None
+
+    def connect_keeper(self):
+        host, port = LISTEN_RE.search(self.out.text(0)).groups()
+        mark = self.out.mark()
+        self.keeper = socket.create_connection((host, int(port)), timeout=HANDSHAKE_TIMEOUT)
+        self.keeper_id = wait_for_pattern(self.out, ASSIGN_RE.pattern, HANDSHAKE_TIMEOUT, start=mark).group(1)
+        threading.Thread(target=self._drain, daemon=True).start()
+
+    def _drain(self):
+        # The server keeps sending WAIT/LIST/START frames; read them so its sends never block
+        self.keeper.settimeout(None)
+        try:
+            while self.keeper.recv(65536):
+                pass
+        except OSError:
+            pass
+
+    def clients(self):
+        """IDs the server currently considers connected, from its own log."""
+        active = set()
+        for line in self.out.text(0).splitlines():
+            if match := ASSIGN_RE.search(line):
+                active.add(match.group(1))
+            elif match := DISCONNECT_RE.search(line):
+                active.discard(match.group(1))
+        return active
+
+    def wait_idle(self, timeout=RESET_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        while self.clients() != {self.keeper_id}:
+            remaining = deadline - time.monotonic()
+            if self.proc.poll() is not None or remaining <= 0:
+                raise TimeoutError(f"❌ Server still has clients {sorted(self.clients() - {self.keeper_id})}")
+            try:
+                self.out.wait_for(DISCONNECT_RE.pattern, min(remaining, 0.5), start=self.out.mark())
+            except TimeoutError:
+                pass
+
+    def stop(self):
+        # The keeper hangs up first: the server then closes passively and leaves no
+        # TIME_WAIT behind on its port, so the next server can bind it right away
+        if self.keeper:
+            mark = self.out.mark()
+            try:
+                self.keeper.shutdown(socket.SHUT_RDWR)  # close() alone waits for the drain thread's recv
+            except OSError:
+                pass
+            self.keeper.close()
+            try:
+                self.out.wait_for(DISCONNECT_RE.pattern, 1.0, start=mark)
+            except TimeoutError:
+                pass
+        self.proc.terminate()
+        try:
+            self.proc.wait(timeout=5)
+        except Exception:
+            self.proc.kill()
+
+def wait_ports_free(ports, timeout=PORT_FREE_TIMEOUT):
+    """Waits until every port can be bound again (the server does not set SO_REUSEADDR)."""
+    deadline = time.monotonic() + timeout
+    for port in ports:
+        while True:
+            with socket.socket() as probe:
+                try:
+                    probe.bind(("", int(port)))
+                    break
+                except OSError:
+                    if time.monotonic() >= deadline:
+                        return False
+            time.sleep(0.5)
+    return True
+
+class ServerPool:
+    def __init__(self):
+        self.idle = {}    # key -> PooledServer ready for the next test
+        self.in_use = {}  # pid -> PooledServer
+        self.dirty = set()  # keys whose last server died or was discarded
+
+    def acquire(self, env, log_path="logs/server.log", mode="a"):
+        key = (env.version,) + tuple(os.environ.get(var) for var in PORT_ENV_VARS.values())
+        for pid, leaked in list(self.in_use.items()):
+            if leaked.key == key:  # a failed test never released it
+                self.in_use.pop(pid).stop()
+                self.dirty.add(key)
+        server = self.idle.pop(key, None)
+        if server is not None and server.proc.poll() is not None:
+            logging.warning(f"⚠️ Pooled server (pid {server.proc.pid}) exited, starting a new one")
+            self.dirty.add(key)
+            server = None
+        if server is None:
+            if key in self.dirty:
+                print("⏳ Waiting for the previous server's ports to be released...")
+                wait_ports_free([port for port in key[1:] if port])
+                self.dirty.discard(key)
+            proc, out = spawn([env.binary("server"), env.config("server")], log_path, mode=mode)
+            server = PooledServer(key, proc, out)
+            wait_for_pattern(out, r"Server listening", STARTUP_TIMEOUT, count=3)
+            server.connect_keeper()
+            print(f"🚀 Warm server started (pid {proc.pid}, keeper client {server.keeper_id})")
+        else:
+            server.out.redirect(log_path, mode)
+            timeline = get_timeline()
+            if timeline is not None:
+                timeline.add_process(server.proc.pid, f"server (pooled) {log_path}")
+            print(f"♻️ Reusing warm server (pid {server.proc.pid}, use #{server.uses + 1})")
+        server.uses += 1
+        self.in_use[server.proc.pid] = server
+        return server.proc, server.out
+
+    def release(self, proc):
+        server = self.in_use.pop(proc.pid, None)
+        if server is None:
+            proc.terminate()
+            return
+        try:
+            server.wait_idle()
+        except TimeoutError as e:
+            logging.warning(f"⚠️ Discarding pooled server (pid {proc.pid}): {e}")
+            server.stop()
+            self.dirty.add(server.key)
+            return
+        self.idle[server.key] = server
+
+    def close(self):
+        for server in list(self.idle.values()) + list(self.in_use.values()):
+            server.stop()
+        self.idle.clear()
+        self.in_use.clear()
+
+_pool = ServerPool()
+atexit.register(_pool.close)
+
+def acquire_server(env, log_path="logs/server.log", mode="a"):
+    """Returns (process, output tail) of a warm server; use it like the result of spawn()."""
+    return _pool.acquire(env, log_path, mode)
+
+def release_server(proc):
+    """Hands the server back once the test's clients are gone (call after terminating them)."""
+    _pool.release(proc)
+
+def close_pool():
+    _pool.close()
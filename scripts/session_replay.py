@@ -0,0 +1,496 @@
+# /**
+#  * @file session_replay.py
+#  * @brief Session recording and time-scaled deterministic replay of protocol traffic.
+#  *        record: a fault_proxy (no impairment) sits in front of a running server and
+#  *        writes every frame of every connection, timestamped, to a compact binary
+#  *        session file. Clients only have to connect to the proxy ports instead of the
+#  *        server ports.
+#  *        replay: launches any bins/<version> server and drives the recorded client
+#  *        frames back at 1x, Nx or max speed, one connection per recorded connection,
+#  *        then compares the server's responses with the recorded ones.
+#  *
+#  *        Determinism: before sending a client frame, the replayer waits (up to
+#  *        --response-timeout) until its connection received as many server frames as
+#  *        had been recorded before it, so a fast replay never runs ahead of the server
+#  *        (no chat before START). Client IDs assigned by the new server are mapped to
+#  *        the recorded ones (from the ID_ASSIGN frames): outgoing src/dest fields are
+#  *        rewritten and responses are compared in recorded IDs.
+#  *
+#  *        Session file: "PSES", format byte, u32 length + JSON metadata, then a zlib
+#  *        stream (sync-flushed every second, so a killed recorder leaves a readable
+#  *        file) of records: kind byte (open/up/down/close), varint connection, varint
+#  *        microseconds since the previous record, then the role index (open) or a
+#  *        varint length and the raw frame (up/down).
+#  *
+#  *        Usage:
+#  *        - python scripts/session_replay.py record incident.pses --route chat=9081:8081 --route file=9082:8082
+#  *        - python scripts/session_replay.py info incident.pses
+#  *        - python scripts/session_replay.py replay incident.pses --version 2.6 --speed 10
+#  *        - python scripts/session_replay.py replay incident.pses --speed max --output replay.json
+#  *
+#  * @author Oussama Amara
+#  * @version 1.0
+#  * @date 2025-10-27
+#  */
+
+import argparse, asyncio, json, logging, os, platform, shutil, struct, sys, time, zlib
+from collections import Counter, namedtuple
+from bench_common import launch_server, write_results, add_common_args, BENCH_BASE_PORT
+from fault_proxy import FaultProxy
+from protocol import FrameSplitter, FrameError, decode_frame
+from protocol_client import FRAME_GAP
+from utils import HANDSHAKE_TIMEOUT
+
+BENCHMARK = "session_replay"
+MAGIC = b"PSES"
+FORMAT_VERSION = 1
+ROLES = ("chat", "file", "game")
+OPEN, UP, DOWN, CLOSE = range(4)
+KINDS = {"open": OPEN, "up": UP, "down": DOWN, "close": CLOSE}
+FLUSH_INTERVAL = 1.0       # Seconds between sync flushes of the compressed stream
+RESPONSE_TIMEOUT = 5.0     # Longest wait for the recorded responses before sending the next frame
+DEFAULT_ROUTES = "chat=9081:8081,file=9082:8082,game=9083:8083"
+MAX_SHOWN = 160            # Characters of a diverging frame shown in reports
+
+Event = namedtuple("Event", "t kind conn data")  # t: seconds since the first record
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        out.append(byte | (0x80 if value else 0))
+        if not value:
+            return bytes(out)
+
+def _read_varint(data, pos):
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+class SessionWriter:
+    """Appends records to a session file; `meta` is stored as JSON in the header."""
+
+    def __init__(self, path, meta):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.file = open(path, "wb")
+        header = json.dumps(meta).encode()
+        self.file.write(MAGIC + bytes([FORMAT_VERSION]) + struct.pack("<I", len(header)) + header)
+        self.zlib = zlib.compressobj(9)
+        self.last_us = None
+        self.last_flush = time.monotonic()
+        self.records = 0
+        self.frames = 0
+        self.raw_bytes = 0
+
+    def write(self, kind, conn, now, payload=b""):
+        now_us = int(now * 1e6)
+        delta = 0 if self.last_us is None else max(0, now_us - self.last_us)
+        self.last_us = now_us if self.last_us is None else max(self.last_us, now_us)
+        record = bytes([kind]) + _varint(conn) + _varint(delta)
+        if kind == OPEN:
+            record += _varint(payload)
+        elif kind in (UP, DOWN):
+            record += _varint(len(payload)) + payload
+            self.frames += 1
+            self.raw_bytes += len(payload)
+        self.file.write(self.zlib.compress(record))
+        self.records += 1
+        if now - self.last_flush >= FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        self.file.write(self.zlib.flush(zlib.Z_SYNC_FLUSH))
+        self.file.flush()
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        self.file.write(self.zlib.flush())
+        self.file.close()
+
+def read_session(path):
+    """Returns (metadata, [Event]); a truncated stream yields the records written so far."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:4] != MAGIC or len(data) < 9:
+        raise ValueError(f"❌ {path} is not a session file")
+    if data[4] != FORMAT_VERSION:
+        raise ValueError(f"❌ {path} uses session format {data[4]}, expected {FORMAT_VERSION}")
+    (length,) = struct.unpack_from("<I", data, 5)
+    meta = json.loads(data[9:9 + length])
+    body = zlib.decompressobj().decompress(data[9 + length:])
+    events, pos, t_us = [], 0, 0
+    try:
+        while pos < len(body):
+            kind = body[pos]
+            conn, pos = _read_varint(body, pos + 1)
+            delta, pos = _read_varint(body, pos)
+            t_us += delta
+            if kind == OPEN:
+                payload, pos = _read_varint(body, pos)
+            elif kind in (UP, DOWN):
+                size, pos = _read_varint(body, pos)
+                payload = body[pos:pos + size]
+                if len(payload) < size:
+                    break
+                pos += size
+            else:
+                payload = None
+            events.append(Event(t_us / 1e6, kind, conn, payload))
+    except IndexError:
+        pass  # last record cut off
+    return meta, events
+
+class SessionRecorder:
+    """FaultProxy tap writing every connection of `routes` {role: (listen_port, target_port)}."""
+
+    def __init__(self, path, routes, target_host="127.0.0.1", listen_host="127.0.0.1", label=None):
+        self.routes = routes
+        self.roles = {target: ROLES.index(role) for role, (_, target) in routes.items()}
+        meta = {
+            "format": FORMAT_VERSION,
+            "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "host": platform.node(),
+            "target": target_host,
+            "routes": {role: target for role, (_, target) in routes.items()},
+            "label": label,
+        }
+        self.writer = SessionWriter(path, meta)
+        self.proxy = FaultProxy([ports for ports in routes.values()], target_host, listen_host, tap=self.tap)
+        self.connections = 0
+
+    def tap(self, conn, event, data, now):
+        if event == "open":
+            self.connections += 1
+            data = self.roles[data]
+        self.writer.write(KINDS[event], conn, now, data if data is not None else b"")
+
+    async def start(self):
+        await self.proxy.start()
+        return self
+
+    async def close(self):
+        await self.proxy.close()
+        self.writer.close()
+
+class ConnectionReplay:
+    """One recorded connection replayed against the new server."""
+
+    def __init__(self, conn, role, events):
+        self.conn = conn
+        self.role = role
+        self.events = events
+        self.expected = [e.data for e in events if e.kind == DOWN]
+        self.received = []
+        self.arrived = asyncio.Event()
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.gate_timeouts = 0
+
+class SessionReplay:
+    """
+    Replays `events` against the server at `ports` {role: port}. speed is a time
+    scale (2.0 = twice as fast) or None for max speed (only the response gating
+    paces the frames).
+    """
+
+    def __init__(self, events, ports, host="127.0.0.1", speed=1.0, response_timeout=RESPONSE_TIMEOUT):
+        self.ports = ports
+        self.host = host
+        self.speed = speed
+        self.response_timeout = response_timeout
+        self.ids = {}  # recorded client ID -> ID assigned by the new server
+        by_conn = {}
+        for event in events:
+            by_conn.setdefault(event.conn, []).append(event)
+        self.connections = [ConnectionReplay(conn, ROLES[evs[0].data], evs)
+                            for conn, evs in sorted(by_conn.items()) if evs[0].kind == OPEN]
+        self.recorded_s = events[-1].t if events else 0.0
+        self.max_lag = 0.0
+        self.start = None
+
+    async def run(self):
+        self.start = time.monotonic()
+        await asyncio.gather(*(self._replay(c) for c in self.connections))
+        return time.monotonic() - self.start
+
+    async def _at(self, t):
+        if self.speed:
+            delay = self.start + t / self.speed - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                self.max_lag = max(self.max_lag, -delay)
+
+    async def _gate(self, replay, count, recorded_wait):
+        """
+        Waits until `count` server frames arrived on the connection. The recorded
+        server took up to `recorded_wait` seconds to send them (e.g. its accept-loop
+        sleep), which is allowed on top of response_timeout at any replay speed.
+        """
+        deadline = time.monotonic() + self.response_timeout + recorded_wait
+        while len(replay.received) < count:
+            replay.arrived.clear()
+            try:
+                await asyncio.wait_for(replay.arrived.wait(), deadline - time.monotonic())
+            except (asyncio.TimeoutError, ValueError):
+                replay.gate_timeouts += 1
+                return
+
+    def _rewrite(self, data):
+        """Recorded client frame with its client IDs translated to the new server's."""
+        try:
+            frame = decode_frame(data)
+        except FrameError:
+            return data
+        return frame._replace(src=self.ids.get(frame.src, frame.src), dest=self.ids.get(frame.dest, frame.dest)).encode()
+
+    def _on_frame(self, replay, frame):
+        data = frame.encode()
+        index = len(replay.received)
+        replay.received.append(data)
+        replay.bytes_received += len(data)
+        if frame.channel == "system" and frame.payload == "ID_ASSIGN" and index < len(replay.expected):
+            try:
+                recorded = decode_frame(replay.expected[index])
+            except FrameError:
+                recorded = None
+            if recorded is not None and recorded.payload == "ID_ASSIGN":
+                self.ids[recorded.dest] = frame.dest
+        replay.arrived.set()
+
+    async def _read(self, replay, reader):
+        splitter = FrameSplitter()
+        try:
+            while data := await reader.read(65536):
+                for frame in splitter.feed(data):
+                    self._on_frame(replay, frame)
+        except (ConnectionError, OSError):
+            pass
+
+    async def _replay(self, replay):
+        open_event, *events = replay.events
+        await self._at(open_event.t)
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.ports[replay.role]), HANDSHAKE_TIMEOUT
+            )
+        except (OSError, asyncio.TimeoutError) as e:
+            logging.warning(f"Connection {replay.conn} ({replay.role}) could not connect: {e}")
+            return
+        reading = asyncio.create_task(self._read(replay, reader))
+        downs = last_send = 0
+        previous_t = open_event.t
+        try:
+            for event in events:
+                if event.kind == DOWN:
+                    downs += 1
+                    continue
+                await self._at(event.t)
+                await self._gate(replay, downs, event.t - previous_t)
+                previous_t = event.t
+                if event.kind == CLOSE:
+                    break
+                # The binaries parse one frame per read: keep the frames apart
+                gap = last_send + FRAME_GAP - time.monotonic()
+                if gap > 0:
+                    await asyncio.sleep(gap)
+                data = self._rewrite(event.data)
+                writer.write(data)
+                await writer.drain()
+                last_send = time.monotonic()
+                replay.frames_sent += 1
+                replay.bytes_sent += len(data)
+            else:
+                await self._gate(replay, downs, 0.0)
+        except (ConnectionError, OSError) as e:
+            logging.warning(f"Connection {replay.conn} ({replay.role}) lost: {e}")
+        finally:
+            writer.close()
+            reading.cancel()
+            await asyncio.gather(reading, return_exceptions=True)
+
+    def _normalize(self, data, ids):
+        try:
+            frame = decode_frame(data)
+        except FrameError:
+            return data
+        return (frame.channel, ids.get(frame.src, frame.src), ids.get(frame.dest, frame.dest), frame.payload, frame.status)
+
+    def compare(self):
+        """Per-connection comparison of the recorded and replayed server frames (in recorded IDs)."""
+        back = {new: old for old, new in self.ids.items()}
+        totals = Counter()
+        divergent = []
+        for replay in self.connections:
+            expected = [self._normalize(d, {}) for d in replay.expected]
+            actual = [self._normalize(d, back) for d in replay.received]
+            matched = sum(a == b for a, b in zip(expected, actual))
+            totals.update(expected=len(expected), received=len(actual), matched=matched)
+            if expected != actual:
+                first = next((i for i, (a, b) in enumerate(zip(expected, actual)) if a != b), min(len(expected), len(actual)))
+                divergent.append({
+                    "connection": replay.conn,
+                    "role": replay.role,
+                    "expected_frames": len(expected),
+                    "received_frames": len(actual),
+                    "first_mismatch": first,
+                    "expected": _show(replay.expected[first]) if first < len(expected) else None,
+                    "actual": _show(replay.received[first]) if first < len(actual) else None,
+                    "reordered_only": Counter(expected) == Counter(actual),
+                })
+        return totals, divergent
+
+def _show(data):
+    return data.decode("latin-1")[:MAX_SHOWN]
+
+def summarize(meta, events):
+    connections = {e.conn for e in events if e.kind == OPEN}
+    ups = [e for e in events if e.kind == UP]
+    downs = [e for e in events if e.kind == DOWN]
+    roles = Counter(ROLES[e.data] for e in events if e.kind == OPEN)
+    return {
+        "recorded_at": meta.get("recorded_at"),
+        "label": meta.get("label"),
+        "duration_s": events[-1].t if events else 0.0,
+        "connections": len(connections),
+        "connections_per_role": dict(roles),
+        "client_frames": len(ups),
+        "server_frames": len(downs),
+        "bytes": sum(len(e.data) for e in ups + downs),
+    }
+
+def run_replay(path, version=None, base_port=BENCH_BASE_PORT, speed=1.0, response_timeout=RESPONSE_TIMEOUT, to_send=None):
+    """Launches a server of `version`, replays the session and returns (version, metrics)."""
+    meta, events = read_session(path)
+    if not events:
+        raise ValueError(f"❌ {path} holds no records")
+    with launch_server(version, base_port) as server:
+        if to_send:
+            shutil.copytree(to_send, server.to_send_dir, dirs_exist_ok=True)
+        ports = {"chat": server.chat_port, "file": server.file_port, "game": server.game_port}
+        replay = SessionReplay(events, ports, speed=speed, response_timeout=response_timeout)
+        wall = asyncio.run(replay.run())
+    totals, divergent = replay.compare()
+    sent = sum(c.frames_sent for c in replay.connections)
+    exchanged = sent + totals["received"]
+    metrics = {
+        "session": summarize(meta, events),
+        "speed": speed or "max",
+        "replay_s": wall,
+        "recorded_s": replay.recorded_s,
+        "speedup": replay.recorded_s / wall if wall > 0 else None,
+        "frames_sent": sent,
+        "frames_received": totals["received"],
+        "frames_per_sec": exchanged / wall if wall > 0 else None,
+        "mb_per_sec": sum(c.bytes_sent + c.bytes_received for c in replay.connections) / wall / (1 << 20) if wall > 0 else None,
+        "max_schedule_lag_ms": replay.max_lag * 1000,
+        "gate_timeouts": sum(c.gate_timeouts for c in replay.connections),
+        "responses_expected": totals["expected"],
+        "responses_matched": totals["matched"],
+        "divergent_connections": divergent,
+        "identical": not divergent,
+    }
+    return server.version, metrics
+
+def parse_routes(specs):
+    """["chat=9081:8081", ...] -> {"chat": (9081, 8081)}"""
+    routes = {}
+    for spec in specs:
+        for part in spec.split(","):
+            role, _, ports = part.partition("=")
+            listen, _, target = ports.partition(":")
+            if role not in ROLES or not listen.isdigit() or not target.isdigit():
+                raise ValueError(f"Invalid route: {part} (expected role=LISTEN:TARGET, role in {', '.join(ROLES)})")
+            routes[role] = (int(listen), int(target))
+    return routes
+
+async def _record(args, routes):
+    recorder = await SessionRecorder(args.session, routes, args.target, args.listen, args.label).start()
+    for role, (listen, target) in routes.items():
+        print(f"🔴 Recording {role}: {args.listen}:{listen} -> {args.target}:{target}")
+    try:
+        await asyncio.sleep(args.duration or 1e9)
+    finally:
+        await recorder.close()
+        writer = recorder.writer
+        size = os.path.getsize(args.session)
+        print(f"📁 {args.session}: {recorder.connections} connection(s), {writer.frames} frames, "
+              f"{writer.raw_bytes} bytes of frames in {size} bytes")
+
+def _print_replay(version, metrics):
+    print(f"📊 Replay on server {version} at {metrics['speed']}{'x' if metrics['speed'] != 'max' else ''}: "
+          f"{metrics['replay_s']:.2f}s for {metrics['recorded_s']:.2f}s recorded "
+          f"(x{metrics['speedup'] or 0:.1f}), {metrics['frames_per_sec'] or 0:.0f} frames/s")
+    print(f"   - Responses matched : {metrics['responses_matched']}/{metrics['responses_expected']}")
+    print(f"   - Gate timeouts     : {metrics['gate_timeouts']}")
+    for d in metrics["divergent_connections"]:
+        kind = "reordered" if d["reordered_only"] else f"frame {d['first_mismatch']}"
+        print(f"   ❌ connection {d['connection']} ({d['role']}): {d['received_frames']}/{d['expected_frames']} frames, "
+              f"diverges at {kind}: expected {d['expected']!r}, got {d['actual']!r}")
+    if metrics["identical"]:
+        print("✅ Server responses identical to the recording")
+
+def main():
+    parser = argparse.ArgumentParser(description="Record protocol sessions and replay them against a server.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record = commands.add_parser("record", help="Record traffic through a proxy in front of a running server")
+    record.add_argument("session", help="Session file to write")
+    record.add_argument("--route", action="append", default=None, metavar="ROLE=LISTEN:TARGET",
+                        help=f"Proxied port per role (repeatable, default {DEFAULT_ROUTES})")
+    record.add_argument("--target", default="127.0.0.1", help="Server host")
+    record.add_argument("--listen", default="127.0.0.1", help="Address the recorder listens on")
+    record.add_argument("--duration", type=float, default=None, help="Stop after N seconds (default: Ctrl-C)")
+    record.add_argument("--label", default=None, help="Free text stored in the session header")
+    info = commands.add_parser("info", help="Summarize a session file")
+    info.add_argument("session")
+    replay = commands.add_parser("replay", help="Replay a session against a bins/ server")
+    replay.add_argument("session")
+    replay.add_argument("--speed", default="1", help="Time scale (1, 10, 0.5...) or 'max'")
+    replay.add_argument("--response-timeout", type=float, default=RESPONSE_TIMEOUT,
+                        help="Seconds to wait for the recorded responses before each client frame")
+    replay.add_argument("--to-send", default=None, help="Folder copied to the server's assets/to_send")
+    add_common_args(replay)
+    args = parser.parse_args()
+
+    if args.command == "record":
+        try:
+            routes = parse_routes(args.route or [DEFAULT_ROUTES])
+        except ValueError as e:
+            parser.error(str(e))
+        try:
+            asyncio.run(_record(args, routes))
+        except KeyboardInterrupt:
+            pass
+    elif args.command == "info":
+        try:
+            meta, events = read_session(args.session)
+        except (OSError, ValueError) as e:
+            raise SystemExit(str(e))
+        print(json.dumps(summarize(meta, events), indent=2))
+    else:
+        try:
+            speed = None if args.speed == "max" else float(args.speed)
+        except ValueError:
+            parser.error(f"Invalid --speed: {args.speed}")
+        if speed is not None and speed <= 0:
+            parser.error("--speed must be positive or 'max'")
+        params = {"session": os.path.abspath(args.session), "speed": args.speed,
+                  "response_timeout": args.response_timeout}
+        try:
+            version, metrics = run_replay(args.session, args.version, args.base_port, speed, args.response_timeout,
+                                          args.to_send)
+        except (OSError, ValueError) as e:
+            raise SystemExit(str(e))
+        _print_replay(version, metrics)
+        write_results(BENCHMARK, version, params, metrics, args.output)
+        sys.exit(0 if metrics["identical"] else 1)
+
+if __name__ == "__main__":
+    main()
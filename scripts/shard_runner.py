@@ -0,0 +1,323 @@
+# /**
+#  * @file shard_runner.py
+#  * @brief Sharded execution of the test suite and benchmarks over several local nodes.
+#  *        The units (test modules from test_runner.TESTS and, on request, bench_*.py
+#  *        benchmarks) are split into shards from their historical durations, each shard
+#  *        runs in its own worker process ("node"), and the shard reports are merged into
+#  *        one results.json, junit.xml and trace.json.
+#  *
+#  *        Planning: units are placed longest first, each on the shard whose predicted
+#  *        duration grows least. A shard runs its tests like test_runner does (pristine
+#  *        tests in parallel lanes, the others one after another on a warm server), then
+#  *        its benchmarks one at a time, so its predicted duration is its longest test
+#  *        lane plus its benchmarks. Durations come from results/shards/durations.json
+#  *        (updated after every sharded run) and, for tests never run sharded, from the
+#  *        latest test_runner results; unknown units get the median of the known ones.
+#  *
+#  *        Isolation: by default every node uses the host loopback with its own port
+#  *        range (SHARD_PORT_SPAN apart). With --netns every node runs in its own network
+#  *        namespace (ip netns, needs root): a private loopback, so all nodes use the same
+#  *        ports exactly as separate machines would.
+#  *
+#  *        Usage:
+#  *        - python scripts/shard_runner.py --shards 3
+#  *        - python scripts/shard_runner.py --shards 2 --bench bench_chat,bench_file_transfer
+#  *        - python scripts/shard_runner.py --shards 4 --netns
+#  *        - python scripts/shard_runner.py --shards 3 --plan   # print the plan only
+#  *
+#  * @author Oussama Amara
+#  * @version 1.0
+#  * @date 2025-10-27
+#  */
+
+import argparse, contextlib, glob, importlib, json, os, shutil, statistics, subprocess, sys, time
+from bench_common import write_results, BENCH_BASE_PORT
+from test_result import TestResult, OK_STATUSES
+from test_runner import (TESTS, BASE_PORT, RESULTS_DIR, SCRIPT_DIR, plan_lanes, run_all, write_json_report,
+                         write_junit, merge_traces)
+from utils import resolve_environment, set_environment, list_versions, spawn, start_timeline, stop_timeline, Timeline
+
+SHARDS_DIR = os.path.join(RESULTS_DIR, "shards")
+HISTORY_FILE = os.path.join(SHARDS_DIR, "durations.json")
+HISTORY_WEIGHT = 0.5     # Weight of the latest run in the stored moving average
+DEFAULT_DURATION = 10.0  # Seconds assumed for a unit when nothing is known at all
+NODE_OVERHEAD = 2.0     # Seconds a node spends starting up (interpreter, imports, workspaces)
+SHARD_PORT_SPAN = 1000   # Port range of one loopback node (tests and benchmarks alike)
+NETNS_PREFIX = "protocol-shard-"
+
+def is_benchmark(unit):
+    return unit.startswith("bench_")
+
+def available_benchmarks():
+    """bench_*.py modules exposing run_benchmark() (the shared helpers and the regression driver do not)."""
+    names = sorted(os.path.splitext(os.path.basename(p))[0] for p in glob.glob(os.path.join(SCRIPT_DIR, "bench_*.py")))
+    return [name for name in names if hasattr(importlib.import_module(name), "run_benchmark")]
+
+def load_durations(history_file=HISTORY_FILE, results_dir=RESULTS_DIR):
+    """
+    Seconds per unit: the latest test_runner run that covered each test, overridden
+    by the moving averages stored after sharded runs.
+    """
+    durations = {}
+    runs = sorted(glob.glob(os.path.join(results_dir, "run_*", "results.json")), key=os.path.getmtime)
+    for path in runs:
+        try:
+            with open(path) as f:
+                tests = json.load(f)["tests"]
+        except (OSError, ValueError, KeyError):
+            continue
+        durations.update({t["name"]: t["duration_s"] for t in tests if t.get("duration_s")})
+    if os.path.exists(history_file):
+        with open(history_file) as f:
+            durations.update(json.load(f))
+    return durations
+
+def update_durations(results, history_file=HISTORY_FILE):
+    """Folds the measured durations of a sharded run into the stored moving averages."""
+    history = {}
+    if os.path.exists(history_file):
+        with open(history_file) as f:
+            history = json.load(f)
+    for r in results:
+        if r["duration_s"]:
+            previous = history.get(r["name"])
+            history[r["name"]] = r["duration_s"] if previous is None else \
+                HISTORY_WEIGHT * r["duration_s"] + (1 - HISTORY_WEIGHT) * previous
+    os.makedirs(os.path.dirname(history_file), exist_ok=True)
+    with open(history_file, "w") as f:
+        json.dump(history, f, indent=2, sort_keys=True)
+
+def shard_cost(units, durations, pool=True):
+    """Predicted seconds for one node: its longest test lane, then its benchmarks one by one."""
+    if not units:
+        return 0.0
+    tests = [u for u in units if not is_benchmark(u)]
+    lanes = plan_lanes(tests, pool) if tests else []
+    return NODE_OVERHEAD + max((sum(durations[t] for t in lane) for lane in lanes), default=0.0) + \
+        sum(durations[u] for u in units if is_benchmark(u))
+
+def plan_shards(units, shards, durations, pool=True):
+    """
+    Longest-processing-time-first placement: returns (shards, predicted seconds per
+    shard). `durations` must cover every unit.
+    """
+    plan = [[] for _ in range(max(1, min(shards, len(units))))]
+    costs = [0.0] * len(plan)
+    for unit in sorted(units, key=lambda u: (-durations[u], u)):
+        # Ties go to the shard with the fewest units, then the lowest index
+        index = min(range(len(plan)),
+                    key=lambda i: (shard_cost(plan[i] + [unit], durations, pool), len(plan[i]), i))
+        plan[index].append(unit)
+        costs[index] = shard_cost(plan[index], durations, pool)
+    return plan, costs
+
+def fill_durations(units, durations):
+    """Copy of `durations` with a guess (median of the known units) for every unknown unit."""
+    known = [durations[u] for u in units if u in durations]
+    guess = statistics.median(known) if known else DEFAULT_DURATION
+    return {u: durations.get(u, guess) for u in units} | durations
+
+def run_benchmark_unit(name, workspace, version, base_port):
+    """Runs one benchmark module like a test: TestResult, captured output.log and trace.json."""
+    os.makedirs(workspace, exist_ok=True)
+    result = TestResult(name)
+    timeline = start_timeline(name)
+    with open(os.path.join(workspace, "output.log"), "w") as out, \
+            contextlib.redirect_stdout(out), contextlib.redirect_stderr(out):
+        try:
+            module = importlib.import_module(name)
+            result.phase("action")
+            version, metrics = module.run_benchmark(version, base_port)
+            result.phase("validation")
+            output = write_results(module.BENCHMARK, version, {}, metrics, os.path.join(workspace, f"{name}.json"))
+            result.metric("output", output)
+            if metrics.get("all_intact") is False:
+                raise AssertionError("Some messages or files were lost or corrupted")
+        except Exception as e:
+            result.fail(e)
+    stop_timeline()
+    timeline.export(os.path.join(workspace, "trace.json"))
+    return dict(result.finish().as_dict(), workspace=workspace)
+
+def run_shard(index, units, shard_dir, version, base_port, bench_port, jobs=None, pool=True):
+    """
+    Worker entry (one node): runs the shard's tests through test_runner.run_all,
+    then its benchmarks, and writes <shard_dir>/shard.json.
+    """
+    env = resolve_environment(version)
+    set_environment(env)
+    tests = [u for u in units if not is_benchmark(u)]
+    started = time.monotonic()
+    results = []
+    if tests:
+        tests_json = os.path.join(shard_dir, "tests.json")
+        run_all(tests, jobs, base_port, shard_dir, tests_json, os.path.join(shard_dir, "junit.xml"), env.version, pool)
+        with open(tests_json) as f:
+            results += json.load(f)["tests"]
+    for unit in units:
+        if is_benchmark(unit):
+            print(f"📊 Benchmark {unit}...")
+            results.append(run_benchmark_unit(unit, os.path.join(shard_dir, unit), env.version, bench_port))
+            print(f"{'✅' if results[-1]['status'] == 'passed' else '❌'} {unit} {results[-1]['status']} "
+                  f"in {results[-1]['duration_s']:.1f}s")
+    report = {"shard": index, "pid": os.getpid(), "units": units, "wall_s": time.monotonic() - started,
+              "results": results}
+    with open(os.path.join(shard_dir, "shard.json"), "w") as f:
+        json.dump(report, f, indent=2)
+    return sum(r["status"] not in OK_STATUSES for r in results)
+
+@contextlib.contextmanager
+def network_namespaces(count):
+    """Creates NETNS_PREFIX<i> namespaces with their loopback up; yields their names and deletes them."""
+    if shutil.which("ip") is None or os.geteuid() != 0:
+        raise RuntimeError("❌ --netns needs root and iproute2 (ip netns)")
+    names = [f"{NETNS_PREFIX}{i}" for i in range(count)]
+    try:
+        for name in names:
+            subprocess.run(["ip", "netns", "delete", name], stderr=subprocess.DEVNULL)  # left by a killed run
+            subprocess.run(["ip", "netns", "add", name], check=True)
+            subprocess.run(["ip", "-n", name, "link", "set", "lo", "up"], check=True)
+        yield names
+    finally:
+        for name in names:
+            subprocess.run(["ip", "netns", "delete", name], stderr=subprocess.DEVNULL)
+
+def worker_command(index, units, shard_dir, version, base_port, bench_port, jobs, pool):
+    cmd = [sys.executable, "-u", os.path.abspath(__file__), "--worker", str(index), "--shard-dir", shard_dir,
+           "--version", version, "--base-port", str(base_port), "--bench-port", str(bench_port)] + units
+    if jobs:
+        cmd += ["-j", str(jobs)]
+    if not pool:
+        cmd.append("--no-pool")
+    return cmd
+
+def shard_failure(unit, error):
+    crashed = TestResult(unit)
+    crashed.fail(RuntimeError(error))
+    return crashed.finish().as_dict()
+
+def run_sharded(units, shards=2, netns=False, version=None, results_dir=SHARDS_DIR, base_port=BASE_PORT,
+                bench_port=BENCH_BASE_PORT, jobs=None, pool=True, plan_only=False):
+    try:
+        env = resolve_environment(version)
+    except (RuntimeError, ValueError, FileNotFoundError) as e:
+        print(e)
+        return len(units)
+    durations = fill_durations(units, load_durations())
+    plan, predicted = plan_shards(units, shards, durations, pool)
+    print(f"🧩 {len(units)} unit(s) in {len(plan)} shard(s) against version {env.version}, "
+          f"predicted makespan {max(predicted):.1f}s (serial {sum(durations[u] for u in units):.1f}s)")
+    for index, (shard, cost) in enumerate(zip(plan, predicted)):
+        print(f"   - shard {index}: ~{cost:.1f}s: {', '.join(shard)}")
+    if plan_only:
+        return 0
+
+    run_dir = os.path.join(results_dir, time.strftime("run_%Y%m%d_%H%M%S"))
+    os.makedirs(run_dir, exist_ok=True)
+    print(f"📁 Shard reports: {run_dir}")
+    started_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+    start = time.monotonic()
+    timeline = start_timeline("shards")
+    results, shard_reports = [], []
+    with network_namespaces(len(plan)) if netns else contextlib.nullcontext() as namespaces:
+        workers = []
+        for index, shard in enumerate(plan):
+            shard_dir = os.path.join(run_dir, f"shard_{index}")
+            os.makedirs(shard_dir)
+            # Separate namespaces have separate loopbacks: every node can use the same ports
+            offset = 0 if netns else index * SHARD_PORT_SPAN
+            cmd = worker_command(index, shard, shard_dir, env.version, base_port + offset, bench_port + offset,
+                                 jobs, pool)
+            if namespaces:
+                cmd = ["ip", "netns", "exec", namespaces[index]] + cmd
+            proc, _ = spawn(cmd, os.path.join(shard_dir, "worker.log"), mode="w", cwd=SCRIPT_DIR)
+            workers.append((index, shard, shard_dir, proc, Timeline.now_us()))
+            print(f"🚀 Shard {index} (pid {proc.pid}{f', netns {namespaces[index]}' if namespaces else ''}): "
+                  f"{len(shard)} unit(s)")
+
+        for index, shard, shard_dir, proc, started_us in workers:
+            code = proc.wait()
+            timeline.complete(f"shard {index}", started_us, Timeline.now_us(), "shard", pid=proc.pid)
+            report_path = os.path.join(shard_dir, "shard.json")
+            if os.path.exists(report_path):
+                with open(report_path) as f:
+                    report = json.load(f)
+            else:
+                error = f"shard {index} worker exited with code {code} without a report (see {shard_dir}/worker.log)"
+                report = {"shard": index, "units": shard, "wall_s": None,
+                          "results": [shard_failure(unit, error) for unit in shard]}
+            failed = sum(r["status"] not in OK_STATUSES for r in report["results"])
+            print(f"{'✅' if not failed else '❌'} Shard {index} finished in {time.monotonic() - start:.1f}s, "
+                  f"{failed} failure(s)")
+            results += report["results"]
+            shard_reports.append(report)
+    stop_timeline()
+
+    wall = time.monotonic() - start
+    results.sort(key=lambda r: units.index(r["name"]) if r["name"] in units else len(units))
+    failures = sum(r["status"] not in OK_STATUSES for r in results)
+    busy = sum(r["duration_s"] or 0 for r in results)
+    suite = {
+        "started_at": started_at,
+        "version": env.version,
+        "run_dir": run_dir,
+        "isolation": "netns" if netns else "loopback",
+        "shards": [{"units": report["units"], "predicted_s": cost, "wall_s": report["wall_s"]}
+                   for report, cost in zip(shard_reports, predicted)],
+        "predicted_makespan_s": max(predicted),
+        "tests": len(results),
+        "failures": failures,
+        "wall_s": wall,
+        "test_time_s": busy,
+        "parallel_speedup": busy / wall if wall > 0 else None,
+    }
+    json_path = os.path.join(run_dir, "results.json")
+    junit_path = os.path.join(run_dir, "junit.xml")
+    trace_path = os.path.join(run_dir, "trace.json")
+    write_json_report(results, suite, json_path)
+    write_junit(results, suite, junit_path)
+    timeline.export(os.path.join(run_dir, "shards_trace.json"))
+    merge_traces([os.path.join(run_dir, "shards_trace.json")] +
+                 [os.path.join(r["workspace"], "trace.json") for r in results if r.get("workspace")], trace_path)
+    update_durations(results)
+
+    print(f"\n⏱️ {len(plan)} shard(s) finished in {wall:.1f}s (predicted {max(predicted):.1f}s, {busy:.1f}s of "
+          f"unit time), {failures} failure(s).")
+    print(f"📁 Results: {json_path}, {junit_path}, timeline: {trace_path}")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Run tests and benchmarks split into shards over local nodes.")
+    parser.add_argument("units", nargs="*", help="Test or benchmark modules (default: every test)")
+    parser.add_argument("-n", "--shards", type=int, default=2, help="Number of nodes (worker processes)")
+    parser.add_argument("--bench", default=None, help="Comma-separated benchmarks to add, or 'all'")
+    parser.add_argument("--netns", action="store_true", help="Run every node in its own network namespace (root)")
+    parser.add_argument("--plan", action="store_true", help="Print the shard plan and exit")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Worker processes per node for its tests")
+    parser.add_argument("--version", choices=list_versions(), default=None, help="bins/ version to run against")
+    parser.add_argument("--base-port", type=int, default=BASE_PORT, help="First test port of node 0")
+    parser.add_argument("--bench-port", type=int, default=BENCH_BASE_PORT, help="First benchmark port of node 0")
+    parser.add_argument("--results-dir", default=SHARDS_DIR, help="Folder receiving the sharded runs")
+    parser.add_argument("--no-pool", action="store_true", help="Start a fresh server for every test")
+    parser.add_argument("--worker", type=int, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--shard-dir", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        sys.exit(1 if run_shard(args.worker, args.units, args.shard_dir, args.version, args.base_port,
+                                args.bench_port, args.jobs, not args.no_pool) else 0)
+
+    benchmarks = available_benchmarks()
+    units = list(args.units or TESTS)
+    if args.bench:
+        units += benchmarks if args.bench == "all" else args.bench.split(",")
+    unknown = [u for u in units if u not in TESTS and u not in benchmarks]
+    if unknown:
+        parser.error(f"Unknown test or benchmark: {', '.join(unknown)}")
+    if args.shards < 1:
+        parser.error("--shards must be at least 1")
+    sys.exit(1 if run_sharded(list(dict.fromkeys(units)), args.shards, args.netns, args.version, args.results_dir,
+                              args.base_port, args.bench_port, args.jobs, not args.no_pool, args.plan) else 0)
+
+if __name__ == "__main__":
+    main()
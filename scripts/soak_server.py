@@ -0,0 +1,232 @@
+# /**
+#  * @file soak_server.py
+#  * @brief Long-running soak test of the server binary with resource tracking.
+#  *        Keeps a configurable mix of traffic running for minutes to hours:
+#  *        - chat: a ring of native clients sending at a fixed rate
+#  *        - file: a sender/receiver pair transferring a generated file periodically
+#  *        - churn: short-lived clients connecting and leaving (LIST broadcasts)
+#  *        Meanwhile the server's RSS, open FDs, threads and CPU are sampled from
+#  *        /proc/<pid> into resources.csv. The run fails when the server dies or when
+#  *        memory, FD or thread counts keep growing (see proc_monitor.detect_growth).
+#  *
+#  *        Usage:
+#  *        - python scripts/soak_server.py --duration 2h
+#  *        - python scripts/soak_server.py --duration 10m --chat-clients 8 --churn-every 0.5
+#  *
+#  * @author Oussama Amara
+#  * @version 1.0
+#  * @date 2025-10-23
+#  */
+
+import argparse, asyncio, json, logging, os, re, sys, time
+from bench_common import launch_server, BENCH_BASE_PORT
+from bench_file_transfer import generate_file, parse_size
+from proc_monitor import ProcMonitor, detect_growth
+from protocol_client import ProtocolClient, connect_clients, raise_fd_limit
+from test_runner import ROOT_DIR
+from utils import list_versions
+
+SOAK_DIR = os.path.join(ROOT_DIR, "results", "soak")
+REPORT_EVERY = 60  # seconds between progress lines
+
+def parse_duration(text):
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)([smh]?)", text.strip().lower())
+    if not match:
+        raise ValueError(f"Invalid duration: {text}")
+    return float(match.group(1)) * {"": 1, "s": 1, "m": 60, "h": 3600}[match.group(2)]
+
+class SoakStats:
+    def __init__(self):
+        self.counters = {
+            "chat_sent": 0, "chat_received": 0,
+            "files_ok": 0, "files_failed": 0,
+            "churn_connects": 0, "churn_failures": 0,
+            "list_broadcasts": 0, "errors": 0,
+        }
+
+    def add(self, name, value=1):
+        self.counters[name] += value
+
+async def chat_traffic(port, clients, rate, stats, stop):
+    peers, failures = await connect_clients(clients, port=port)
+    stats.add("errors", len(failures))
+    if len(peers) < 2:
+        raise RuntimeError(f"❌ Chat traffic needs 2 clients, {len(peers)} connected")
+    await asyncio.gather(*(peer.wait_started() for peer in peers))
+
+    # The first peer also watches LIST broadcasts caused by the churn task
+    peers[0].on_frame = lambda frame, now: stats.add("list_broadcasts") if frame.kind == "LIST" else None
+
+    async def drain(peer):
+        while True:
+            await peer.messages.get()
+            stats.add("chat_received")
+
+    async def send(index, peer):
+        target = peers[(index + 1) % len(peers)].client_id
+        while not stop.is_set():
+            try:
+                await peer.send_chat(target, f"soak {stats.counters['chat_sent']}")
+                stats.add("chat_sent")
+            except (ConnectionError, OSError):
+                stats.add("errors")
+                return
+            try:
+                await asyncio.wait_for(stop.wait(), 1.0 / rate)
+            except asyncio.TimeoutError:
+                pass
+
+    drains = [asyncio.create_task(drain(peer)) for peer in peers]
+    await asyncio.gather(*(send(i, peer) for i, peer in enumerate(peers)))
+    for task in drains:
+        task.cancel()
+    await asyncio.gather(*(peer.close() for peer in peers))
+
+async def file_traffic(server, every, size, stats, stop):
+    filename = "soak_file.bin"
+    generate_file(os.path.join(server.to_send_dir, filename), size)
+    sender = ProtocolClient(port=server.file_port, name="soak_sender")
+    receiver = ProtocolClient(port=server.file_port, name="soak_receiver", received_dir=server.received_dir)
+    await sender.connect()
+    await receiver.connect()
+    await asyncio.gather(sender.wait_started(), receiver.wait_started())
+    received = os.path.join(server.received_dir, filename)
+
+    while not stop.is_set():
+        try:
+            await sender.request_file(receiver.client_id, filename)
+            await receiver.wait_for(lambda f: f.channel == "file" and f.kind == "INCOMING", 30)
+            transfer = receiver.transfers.pop(filename)
+            await asyncio.wait_for(transfer.done.wait(), 30 + size / (1 << 20))
+            ok = transfer.status == "DONE" and os.path.getsize(received) == size
+            stats.add("files_ok" if ok else "files_failed")
+        except (asyncio.TimeoutError, ConnectionError, OSError, KeyError) as e:
+            logging.warning(f"Soak file transfer failed: {e}")
+            stats.add("files_failed")
+            receiver.current_transfer = None
+        if os.path.exists(received):
+            os.remove(received)
+        try:
+            await asyncio.wait_for(stop.wait(), every)
+        except asyncio.TimeoutError:
+            pass
+    await asyncio.gather(sender.close(), receiver.close())
+
+async def churn_traffic(port, every, stats, stop):
+    index = 0
+    while not stop.is_set():
+        client = ProtocolClient(port=port, name=f"churn_{index}")
+        try:
+            await client.connect()
+            stats.add("churn_connects")
+        except (asyncio.TimeoutError, ConnectionError, OSError):
+            stats.add("churn_failures")
+        await client.close()
+        index += 1
+        try:
+            await asyncio.wait_for(stop.wait(), every)
+        except asyncio.TimeoutError:
+            pass
+
+async def soak(server, monitor, args, stats):
+    stop = asyncio.Event()
+    tasks = []
+    if args.chat_clients >= 2:
+        tasks.append(asyncio.create_task(chat_traffic(server.chat_port, args.chat_clients, args.chat_rate, stats, stop)))
+    if args.file_every > 0:
+        tasks.append(asyncio.create_task(file_traffic(server, args.file_every, parse_size(args.file_size), stats, stop)))
+    if args.churn_every > 0:
+        tasks.append(asyncio.create_task(churn_traffic(server.chat_port, args.churn_every, stats, stop)))
+
+    start = time.monotonic()
+    next_report = start + REPORT_EVERY
+    while time.monotonic() - start < args.duration:
+        await asyncio.sleep(1)
+        if monitor.exited.is_set():
+            print("❌ Server process exited during the soak run.")
+            break
+        failed = [t for t in tasks if t.done() and t.exception()]
+        if failed:
+            print(f"❌ Traffic task failed: {failed[0].exception()}")
+            break
+        if time.monotonic() >= next_report:
+            next_report += REPORT_EVERY
+            last = monitor.samples[-1] if monitor.samples else {}
+            print(f"⏱️ {int(time.monotonic() - start)}s rss={last.get('rss_kb')}kB fds={last.get('fds')} "
+                  f"threads={last.get('threads')} cpu={last.get('cpu_percent')}% {stats.counters}")
+
+    stop.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    return [r for r in results if isinstance(r, Exception)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Soak the server with mixed traffic and track its resources.")
+    parser.add_argument("--duration", default="1h", help="Run length, e.g. 90s, 30m, 4h")
+    parser.add_argument("--interval", type=float, default=5.0, help="Seconds between resource samples")
+    parser.add_argument("--chat-clients", type=int, default=4, help="Clients in the chat ring (0 disables chat)")
+    parser.add_argument("--chat-rate", type=float, default=5.0, help="Messages/sec per chat client")
+    parser.add_argument("--file-every", type=float, default=10.0, help="Seconds between file transfers (0 disables)")
+    parser.add_argument("--file-size", default="256K", help="Size of the transferred file")
+    parser.add_argument("--churn-every", type=float, default=2.0, help="Seconds between churn connections (0 disables)")
+    parser.add_argument("--rss-limit-mb", type=float, default=16.0, help="Allowed RSS trend growth after warm-up")
+    parser.add_argument("--fd-limit", type=int, default=16, help="Allowed open-FD trend growth after warm-up")
+    parser.add_argument("--thread-limit", type=int, default=8, help="Allowed thread-count trend growth after warm-up")
+    parser.add_argument("--version", choices=list_versions(), default=None)
+    parser.add_argument("--base-port", type=int, default=BENCH_BASE_PORT)
+    args = parser.parse_args()
+    try:
+        args.duration = parse_duration(args.duration)
+    except ValueError as e:
+        parser.error(str(e))
+
+    raise_fd_limit()
+    out_dir = os.path.join(SOAK_DIR, time.strftime("soak_%Y%m%d_%H%M%S"))
+    stats = SoakStats()
+    with launch_server(args.version, args.base_port, workspace=out_dir) as server:
+        monitor = ProcMonitor(server.pid, args.interval, os.path.join(out_dir, "resources.csv")).start()
+        print(f"🧪 Soaking server {server.version} for {args.duration:.0f}s, samples -> {monitor.csv_path}")
+        errors = asyncio.run(soak(server, monitor, args, stats))
+        server_died = monitor.exited.is_set()
+        monitor.stop()
+
+    checks = {
+        "rss_kb": args.rss_limit_mb * 1024,
+        "fds": args.fd_limit,
+        "threads": args.thread_limit,
+    }
+    growth = {}
+    leaks = []
+    for key, limit in checks.items():
+        leaking, details = detect_growth(monitor.samples, key, limit)
+        growth[key] = details
+        if leaking:
+            leaks.append(key)
+
+    summary = {
+        "version": server.version,
+        "duration_s": args.duration,
+        "samples": len(monitor.samples),
+        "server_died": server_died,
+        "traffic_errors": [str(e) for e in errors],
+        "counters": stats.counters,
+        "growth": growth,
+        "leaks": leaks,
+    }
+    with open(os.path.join(out_dir, "summary.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+    print(f"📁 Soak results in {out_dir}")
+    print(f"📊 {stats.counters}")
+
+    for key in checks:
+        details = growth[key]
+        if "slope_per_hour" in details:
+            print(f"   - {key}: {details['start']} -> {details['end']} (peak {details['peak']}, "
+                  f"{details['slope_per_hour']:+.1f}/h){' ⚠️ growing' if key in leaks else ''}")
+    if server_died or leaks or errors:
+        reasons = (["server died"] if server_died else []) + [f"{k} growth" for k in leaks] + [str(e) for e in errors]
+        print(f"❌ Soak failed: {', '.join(reasons)}")
+        sys.exit(1)
+    print("✅ Soak passed: no unbounded resource growth detected.")
+
+if __name__ == "__main__":
+    main()
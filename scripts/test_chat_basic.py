@@ -20,49 +20,40 @@
 #  * @date 2025-10-12
 #  */
 
-import subprocess, time, logging, re
-from utils import get_binary_path, get_config_path, clear_logs
-
-logging.info("🧪 Starting test: chat_basic")
-
-def run_chat_test():
+import logging
+from utils import resolve_environment, get_client_env, clear_logs, spawn, wait_for_pattern, HANDSHAKE_TIMEOUT, EVENT_TIMEOUT
+from log_assert import LogAssert, tail
+from server_pool import acquire_server, release_server
+from test_result import TestResult, run_standalone
+
+def run_chat_test(env=None):
+    result = TestResult("chat_basic")
+    logging.info("🧪 Starting test: chat_basic")
     try:
+        result.phase("launch")
+        env = env or resolve_environment()
         clear_logs()
-        server_bin = get_binary_path("server")
-        client_bin = get_binary_path("client")
-        server_cfg = get_config_path("server")
-        client_cfg = get_config_path("client_local")
+        server_bin = env.binary("server")
+        client_bin = env.binary("client")
+        server_cfg = env.config("server")
+        client_cfg = env.config("client_local")
+        client_env = get_client_env("client_local")
 
         print("-> Server bin path :", server_bin)
         print("-> Client bin path :", client_bin)
         print("-> Server config   :", server_cfg)
         print("-> Client config   :", client_cfg)
 
-        server_log = open("logs/server.log", "a")
-        client_a_log = open("logs/client_a.log", "a")
-        client_b_log = open("logs/client_b.log", "a")
-
-        server = subprocess.Popen([server_bin, server_cfg], stdout=server_log, stderr=subprocess.STDOUT)
+        server, server_out = acquire_server(env, "logs/server.log")
         print("✅ Server process started.")
-        time.sleep(1)
 
-        client_a = subprocess.Popen([client_bin, client_cfg], stdin=subprocess.PIPE, stdout=client_a_log, stderr=subprocess.STDOUT)
-        client_b = subprocess.Popen([client_bin, client_cfg], stdin=subprocess.PIPE, stdout=client_b_log, stderr=subprocess.STDOUT)
+        client_a, a_out = spawn([client_bin, client_cfg], "logs/client_a.log", stdin=True, env=client_env)
+        client_b, b_out = spawn([client_bin, client_cfg], "logs/client_b.log", stdin=True, env=client_env)
         print("✅ Client A and B started.")
-        time.sleep(10)
-
-        server_log.flush(); server_log.close()
-        client_a_log.flush(); client_a_log.close()
-        client_b_log.flush(); client_b_log.close()
-
-        with open("logs/client_a.log") as a_log, open("logs/client_b.log") as b_log:
-            a_lines = a_log.readlines()
-            b_lines = b_log.readlines()
 
-            id_a = next((re.search(r"Assigned client ID: (\d+)", line).group(1)
-                         for line in reversed(a_lines) if "Assigned client ID" in line), None)
-            id_b = next((re.search(r"Assigned client ID: (\d+)", line).group(1)
-                         for line in reversed(b_lines) if "Assigned client ID" in line), None)
+        result.phase("handshake")
+        id_a = wait_for_pattern(a_out, r"Assigned client ID: (\d+)", HANDSHAKE_TIMEOUT).group(1)
+        id_b = wait_for_pattern(b_out, r"Assigned client ID: (\d+)", HANDSHAKE_TIMEOUT).group(1)
 
         if not id_a or not id_b or id_a == id_b:
             raise RuntimeError("❌ Could not resolve distinct client IDs")
@@ -70,45 +61,52 @@ def run_chat_test():
         print(f"🆔 Client A ID: {id_a}")
         print(f"🆔 Client B ID: {id_b}")
 
+        # Interaction is gated until the server pairs both clients
+        wait_for_pattern(a_out, r"You may begin\|START", HANDSHAKE_TIMEOUT)
+
+        result.phase("action")
         # Send message from A to B
+        mark = a_out.mark()
         client_a.stdin.write(f"{id_b}\n".encode())
         client_a.stdin.flush()
-        time.sleep(1)
+        wait_for_pattern(a_out, r"Enter message:", EVENT_TIMEOUT, start=mark)
         client_a.stdin.write(b"chat Hello from A\n")
         client_a.stdin.flush()
         print("📤 Message sent from A to B.")
-        time.sleep(5)
-
-        with open("logs/server.log") as s_log, open("logs/client_a.log") as a_log, open("logs/client_b.log") as b_log:
-            s_lines = s_log.readlines()
-            a_content = a_log.read()
-            b_content = b_log.read()
-
-            # ✅ Server forwarding check
-            s_recent = [line for line in reversed(s_lines) if f"[CHAT] Forwarding from {id_a} to {id_b}" in line or f"[CHAT] Forwarding from {id_b} to {id_a}" in line]
-            assert s_recent, "❌ Server did not forward chat message."
-            print("🔍 Server log preview:\n", "".join(s_recent[:1]))
-
-            # ✅ Client frame check (either direction)
-            frame_pattern = re.compile(
-                fr"Received frame: \w+\|chat\|({id_a}|{id_b})\|({id_a}|{id_b})\|chat Hello from A\|READY"
-            )
-            if not frame_pattern.search(a_content) and not frame_pattern.search(b_content):
-                print("⚠️ Chat frame not found in either client log.")
-                print("📄 Last 20 lines of A log:\n", "\n".join(a_content.splitlines()[-20:]))
-                print("📄 Last 20 lines of B log:\n", "\n".join(b_content.splitlines()[-20:]))
-                raise AssertionError("❌ Chat frame not found.")
+        wait_for_pattern(server_out, fr"\[CHAT\] Forwarding from {id_a} to {id_b}", EVENT_TIMEOUT)
+        wait_for_pattern(b_out, r"Received frame: \w+\|chat\|.*Hello from A", EVENT_TIMEOUT)
+
+        result.phase("validation")
+        # ✅ Server forwarding check
+        s_log = LogAssert("logs/server.log")
+        s_log.expect("forward", fr"\[CHAT\] Forwarding from ({id_a} to {id_b}|{id_b} to {id_a})")
+        s_log.check()
+        print("🔍 Server log preview:\n", s_log["forward"].matches[-1][3])
+
+        # ✅ Client frame check (either direction)
+        frame_regex = fr"Received frame: \w+\|chat\|({id_a}|{id_b})\|({id_a}|{id_b})\|chat Hello from A\|READY"
+        client_logs = [LogAssert("logs/client_a.log"), LogAssert("logs/client_b.log")]
+        for log in client_logs:
+            log.expect("chat_frame", frame_regex)
+            log.scan(final=True)
+        if all(log.unmet for log in client_logs):
+            print("⚠️ Chat frame not found in either client log.")
+            print("📄 Last 20 lines of A log:\n", tail("logs/client_a.log"))
+            print("📄 Last 20 lines of B log:\n", tail("logs/client_b.log"))
+            raise AssertionError("❌ Chat frame not found.")
 
         logging.info("✅ chat_basic test passed.")
     except Exception as e:
+        result.fail(e)
         logging.error(f"❌ chat_basic test failed: {e}")
     finally:
         try:
-            server.terminate()
             client_a.terminate()
             client_b.terminate()
+            release_server(server)
         except:
             logging.warning("⚠️ Could not terminate one or more processes.")
+    return result.finish()
 
 if __name__ == "__main__":
-    run_chat_test()
+    run_standalone(run_chat_test)
@@ -14,20 +14,27 @@
 #  * @date 2025-10-12
 #  */
 
-import subprocess, time, logging, re
-from utils import get_binary_path, get_config_path, clear_logs
+import logging, re
+from utils import resolve_environment, get_client_env, clear_logs, spawn, wait_for_pattern, STARTUP_TIMEOUT, HANDSHAKE_TIMEOUT, EVENT_TIMEOUT
+from log_assert import LogAssert
+from test_result import TestResult, run_standalone
 
-logging.info("🧪 Starting test: chunked_chat_message")
+REQUIRES_PRISTINE_SERVER = True  # expects client IDs 1 and 2
 
-def run_chunked_chat():
+def run_chunked_chat(env=None):
+    result = TestResult("chunked_chat_message")
+    logging.info("🧪 Starting test: chunked_chat_message")
     try:
+        result.phase("launch")
+        env = env or resolve_environment()
         clear_logs()
         long_message = "chat " + ("This is a long message. " * 50) + "\n"
 
-        server_bin = get_binary_path("server")
-        client_bin = get_binary_path("client")
-        server_cfg = get_config_path("server")
-        client_cfg = get_config_path("client_local")
+        server_bin = env.binary("server")
+        client_bin = env.binary("client")
+        server_cfg = env.config("server")
+        client_cfg = env.config("client_local")
+        client_env = get_client_env("client_local")
 
         print("🔧 Paths resolved:")
         print("   - Server bin :", server_bin)
@@ -35,35 +42,21 @@ def run_chunked_chat():
         print("   - Server cfg :", server_cfg)
         print("   - Client cfg :", client_cfg)
 
-        server_log = open("logs/server.log", "a")
-        client_a_log = open("logs/client_a.log", "a")
-        client_b_log = open("logs/client_b.log", "a")
-
         print("🚀 Launching server and clients...")
-        server = subprocess.Popen([server_bin, server_cfg], stdout=server_log, stderr=subprocess.STDOUT)
-        time.sleep(1)
-
-        client_a = subprocess.Popen([client_bin, client_cfg], stdin=subprocess.PIPE, stdout=client_a_log, stderr=subprocess.STDOUT)
-        client_b = subprocess.Popen([client_bin, client_cfg], stdin=subprocess.PIPE, stdout=client_b_log, stderr=subprocess.STDOUT)
-        time.sleep(10)
+        server, server_out = spawn([server_bin, server_cfg], "logs/server.log")
+        wait_for_pattern(server_out, r"Server listening", STARTUP_TIMEOUT, count=3)
 
-        server_log.flush(); server_log.close()
-        client_a_log.flush(); client_a_log.close()
-        client_b_log.flush(); client_b_log.close()
+        client_a, a_out = spawn([client_bin, client_cfg], "logs/client_a.log", stdin=True, env=client_env)
+        client_b, b_out = spawn([client_bin, client_cfg], "logs/client_b.log", stdin=True, env=client_env)
 
         print("📁 Logs written to:")
         print("   - logs/server.log")
         print("   - logs/client_a.log")
         print("   - logs/client_b.log")
 
-        with open("logs/client_a.log") as a_log, open("logs/client_b.log") as b_log:
-            a_lines = a_log.readlines()
-            b_lines = b_log.readlines()
-
-            id_a = next((re.search(r"Assigned client ID: (\d+)", line).group(1)
-                         for line in reversed(a_lines) if "Assigned client ID" in line), None)
-            id_b = next((re.search(r"Assigned client ID: (\d+)", line).group(1)
-                         for line in reversed(b_lines) if "Assigned client ID" in line), None)
+        result.phase("handshake")
+        id_a = wait_for_pattern(a_out, r"Assigned client ID: (\d+)", HANDSHAKE_TIMEOUT).group(1)
+        id_b = wait_for_pattern(b_out, r"Assigned client ID: (\d+)", HANDSHAKE_TIMEOUT).group(1)
 
         if not id_a or not id_b or id_a == id_b:
             print("❌ Failed to resolve distinct client IDs.")
@@ -72,40 +65,49 @@ def run_chunked_chat():
         print(f"🆔 Client A ID: {id_a}")
         print(f"🆔 Client B ID: {id_b}")
 
+        wait_for_pattern(a_out, r"You may begin\|START", HANDSHAKE_TIMEOUT)
+
+        result.phase("action")
         print(f"📤 Sending long message from A to B (target ID: {id_b})...")
+        mark = a_out.mark()
         client_a.stdin.write(f"{id_b}\n".encode())
         client_a.stdin.flush()
-        time.sleep(1)
+        wait_for_pattern(a_out, r"Enter message:", EVENT_TIMEOUT, start=mark)
         client_a.stdin.write(long_message.encode())
         client_a.stdin.flush()
-        time.sleep(8)
-
-        with open("logs/server.log") as s_log, open("logs/client_a.log") as a_log, open("logs/client_b.log") as b_log:
-            s_content = s_log.read()
-            a_content = a_log.read()
-            b_content = b_log.read()
-
-            # ✅ Server forwarding check
-            forwarding_match = re.search(fr"\[CHAT\] Forwarding from {id_a} to {id_b}: chat .*?This is a long message", s_content)
-
-            assert forwarding_match, "❌ Server did not forward chunked message."
-            print("🔍 Server forwarding confirmed.")
-
-            # ✅ Receiver frame check
-            received_match = re.search(fr"Received frame: \w+\|chat\|{id_a}\|{id_b}\|chat This is a long message", b_content)
-            assert received_match, "❌ Receiver did not log reassembled chat frame."
-            print("🔍 Receiver log confirmed.")
-
-            # ✅ Sender chunk count check
-            chunk_match = re.search(r"Chat message sent in (\d+) chunk\(s\)", a_content)
-            if chunk_match:
-                print(f"📦 Sender confirms chunked delivery: {chunk_match.group(1)} chunk(s)")
-            else:
-                print("⚠️ No chunk count found in sender log.")
+        wait_for_pattern(a_out, r"Chat message sent in \d+ chunk\(s\)", EVENT_TIMEOUT, start=mark)
+        wait_for_pattern(b_out, fr"Received frame: \w+\|chat\|{id_a}\|{id_b}\|chat This is a long message", EVENT_TIMEOUT)
+
+        result.phase("validation")
+        # ✅ Server forwarding check
+        s_log = LogAssert("logs/server.log")
+        s_log.expect("forward", fr"\[CHAT\] Forwarding from {id_a} to {id_b}: chat .*?This is a long message")
+        s_log.scan(final=True)
+        assert not s_log.unmet, "❌ Server did not forward chunked message."
+        print("🔍 Server forwarding confirmed.")
+
+        # ✅ Receiver frame check
+        b_log = LogAssert("logs/client_b.log")
+        b_log.expect("reassembled", fr"Received frame: \w+\|chat\|{id_a}\|{id_b}\|chat This is a long message")
+        b_log.scan(final=True)
+        assert not b_log.unmet, "❌ Receiver did not log reassembled chat frame."
+        print("🔍 Receiver log confirmed.")
+
+        # ✅ Sender chunk count check
+        a_log = LogAssert("logs/client_a.log")
+        chunks = a_log.expect("chunk_count", r"Chat message sent in (\d+) chunk\(s\)")
+        a_log.scan(final=True)
+        if chunks.met:
+            count = re.search(chunks.regex, chunks.matches[0][3]).group(1)
+            print(f"📦 Sender confirms chunked delivery: {count} chunk(s)")
+            result.metric("chunks", int(count))
+        else:
+            print("⚠️ No chunk count found in sender log.")
 
         print("✅ Test passed: chunked message delivered and reassembled.")
         logging.info("✅ chunked_chat_message test passed.")
     except Exception as e:
+        result.fail(e)
         print(f"❌ Test failed: {e}")
         logging.error(f"❌ chunked_chat_message test failed: {e}")
     finally:
@@ -116,6 +118,7 @@ def run_chunked_chat():
             print("🛑 Processes terminated.")
         except:
             logging.warning("⚠️ Could not terminate one or more processes.")
+    return result.finish()
 
 if __name__ == "__main__":
-    run_chunked_chat()
+    run_standalone(run_chunked_chat)
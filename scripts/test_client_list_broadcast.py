@@ -13,18 +13,25 @@
 #  * @date 2025-10-13
 #  */
 
-import subprocess, time, logging, re
-from utils import get_binary_path, get_config_path, clear_logs
+import logging
+from utils import resolve_environment, get_client_env, clear_logs, spawn, wait_for_pattern, STARTUP_TIMEOUT, HANDSHAKE_TIMEOUT, EVENT_TIMEOUT
+from log_assert import LogAssert, tail
+from test_result import TestResult, run_standalone
 
-logging.info("🧪 Starting test: client_list_broadcast")
+REQUIRES_PRISTINE_SERVER = True  # expects LIST frames listing only its own clients
 
-def run_list_broadcast():
+def run_list_broadcast(env=None):
+    result = TestResult("client_list_broadcast")
+    logging.info("🧪 Starting test: client_list_broadcast")
     try:
+        result.phase("launch")
+        env = env or resolve_environment()
         clear_logs()
-        server_bin = get_binary_path("server")
-        client_bin = get_binary_path("client")
-        server_cfg = get_config_path("server")
-        client_cfg = get_config_path("client_local")
+        server_bin = env.binary("server")
+        client_bin = env.binary("client")
+        server_cfg = env.config("server")
+        client_cfg = env.config("client_local")
+        client_env = get_client_env("client_local")
 
         print("🔧 Paths resolved:")
         print("   - Server bin :", server_bin)
@@ -32,48 +39,45 @@ def run_list_broadcast():
         print("   - Server cfg :", server_cfg)
         print("   - Client cfg :", client_cfg)
 
-        server_log = open("logs/server.log", "a")
-        client_a_log = open("logs/client_a.log", "a")
-        client_b_log = open("logs/client_b.log", "a")
-
         print("🚀 Launching server and clients...")
-        server = subprocess.Popen([server_bin, server_cfg], stdout=server_log, stderr=subprocess.STDOUT)
-        time.sleep(1)
+        server, server_out = spawn([server_bin, server_cfg], "logs/server.log")
+        wait_for_pattern(server_out, r"Server listening", STARTUP_TIMEOUT, count=3)
 
-        client_a = subprocess.Popen([client_bin, client_cfg], stdout=client_a_log, stderr=subprocess.STDOUT)
-        time.sleep(1)
+        client_a, a_out = spawn([client_bin, client_cfg], "logs/client_a.log", stdin=True, env=client_env)
+        wait_for_pattern(a_out, r"Assigned client ID: \d+", HANDSHAKE_TIMEOUT)
 
-        client_b = subprocess.Popen([client_bin, client_cfg], stdout=client_b_log, stderr=subprocess.STDOUT)
-        time.sleep(15)
+        client_b, b_out = spawn([client_bin, client_cfg], "logs/client_b.log", stdin=True, env=client_env)
+        result.phase("handshake")
+        id_b = wait_for_pattern(b_out, r"Assigned client ID: (\d+)", HANDSHAKE_TIMEOUT).group(1)
+        wait_for_pattern(a_out, fr"Received frame: \w+\|system\|0\|\d+\|.*{id_b},Client\|LIST", HANDSHAKE_TIMEOUT)
 
+        result.phase("action")
         client_b.terminate()
-        time.sleep(5)
-
-        server_log.flush(); server_log.close()
-        client_a_log.flush(); client_a_log.close()
-        client_b_log.flush(); client_b_log.close()
+        wait_for_pattern(server_out, fr"Client {id_b} disconnected", EVENT_TIMEOUT)
 
         print("📁 Logs written to:")
         print("   - logs/server.log")
         print("   - logs/client_a.log")
         print("   - logs/client_b.log")
 
+        result.phase("validation")
         # Validate LIST frames in client A log
-        with open("logs/client_a.log") as a_log:
-            content = a_log.read()
-            connect_match = re.search(r"Received frame: \w+\|system\|0\|\d+\|.*,Client\|LIST", content)
-            disconnect_match = re.search(r"Received frame: \w+\|system\|0\|\d+\|\d+,Client\|LIST", content)
+        a_log = LogAssert("logs/client_a.log")
+        a_log.expect("list_on_connect", r"Received frame: \w+\|system\|0\|\d+\|.*,Client\|LIST")
+        a_log.expect("list_on_disconnect", r"Received frame: \w+\|system\|0\|\d+\|\d+,Client\|LIST")
+        a_log.scan(final=True)
 
-            if not connect_match or not disconnect_match:
-                print("📄 Client A log preview:\n", "\n".join(content.splitlines()[-40:]))
-                raise AssertionError("❌ Client A did not receive LIST frame updates.")
+        if a_log.unmet:
+            print("📄 Client A log preview:\n", tail("logs/client_a.log", 40))
+            raise AssertionError("❌ Client A did not receive LIST frame updates.")
 
-            print("🔍 LIST frame on connect confirmed.")
-            print("🔍 LIST frame on disconnect confirmed.")
+        print("🔍 LIST frame on connect confirmed.")
+        print("🔍 LIST frame on disconnect confirmed.")
 
         print("✅ Test passed: LIST frame broadcast verified.")
         logging.info("✅ client_list_broadcast test passed.")
     except Exception as e:
+        result.fail(e)
         print(f"❌ Test failed: {e}")
         logging.error(f"❌ client_list_broadcast test failed: {e}")
     finally:
@@ -83,6 +87,7 @@ def run_list_broadcast():
             print("🛑 Processes terminated.")
         except:
             logging.warning("⚠️ Could not terminate one or more processes.")
+    return result.finish()
 
 if __name__ == "__main__":
-    run_list_broadcast()
\ No newline at end of file
+    run_standalone(run_list_broadcast)
@@ -18,19 +18,26 @@
 #  * @date 2025-10-18
 #  */
 
-import subprocess, time, shutil, logging, re
-from utils import get_binary_path, get_config_path, clear_logs
+import shutil, logging
+from utils import resolve_environment, get_client_env, clear_logs, spawn, wait_for_pattern, STARTUP_TIMEOUT, HANDSHAKE_TIMEOUT, EVENT_TIMEOUT
+from log_assert import assert_log
+from test_result import TestResult, run_standalone
 import os
 
-logging.info("🧪 Starting test: file_transfer")
+REQUIRES_PRISTINE_SERVER = True  # the server reads assets/to_send/ from its own folder; frames carry fixed client IDs
 
-def run_file_test():
+def run_file_test(env=None):
+    result = TestResult("file_transfer")
+    logging.info("🧪 Starting test: file_transfer")
     try:
+        result.phase("launch")
+        env = env or resolve_environment()
         clear_logs()
-        server_bin = get_binary_path("server")
-        client_bin = get_binary_path("client")
-        server_cfg = get_config_path("server")
-        client_cfg = get_config_path("client_local_file")
+        server_bin = env.binary("server")
+        client_bin = env.binary("client")
+        server_cfg = env.config("server")
+        client_cfg = env.config("client_local_file")
+        client_env = get_client_env("client_local_file")
 
         print("🔧 Paths resolved:")
         print("   - Server bin :", server_bin)
@@ -45,38 +52,24 @@ def run_file_test():
             print("📁 Test file moved to: assets/to_send/test_file.txt")
         except Exception as e:
             logging.error(f"❌ Failed to prepare test file: {e}")
-            return
-
-        server_log = open("logs/server.log", "a")
-        client_a_log = open("logs/client_a.log", "a")
-        client_b_log = open("logs/client_b.log", "a")
+            raise
 
         print("🚀 Launching server and clients...")
-        server = subprocess.Popen([server_bin, server_cfg], stdout=server_log, stderr=subprocess.STDOUT)
-        time.sleep(5)
-
-        client_a = subprocess.Popen([client_bin, client_cfg], stdin=subprocess.PIPE, stdout=client_a_log, stderr=subprocess.STDOUT)
-        client_b = subprocess.Popen([client_bin, client_cfg], stdin=subprocess.PIPE, stdout=client_b_log, stderr=subprocess.STDOUT)
-        time.sleep(20)
+        server, server_out = spawn([server_bin, server_cfg], "logs/server.log")
+        wait_for_pattern(server_out, r"Server listening", STARTUP_TIMEOUT, count=3)
 
-        server_log.flush(); server_log.close()
-        client_a_log.flush(); client_a_log.close()
-        client_b_log.flush(); client_b_log.close()
+        client_a, a_out = spawn([client_bin, client_cfg], "logs/client_a.log", stdin=True, env=client_env)
+        client_b, b_out = spawn([client_bin, client_cfg], "logs/client_b.log", stdin=True, env=client_env)
 
         print("📁 Logs written to:")
         print("   - logs/server.log")
         print("   - logs/client_a.log")
         print("   - logs/client_b.log")
 
+        result.phase("handshake")
         # Extract client IDs
-        with open("logs/client_a.log") as a_log, open("logs/client_b.log") as b_log:
-            a_lines = a_log.readlines()
-            b_lines = b_log.readlines()
-
-            id_a = next((re.search(r"Assigned client ID: (\d+)", line).group(1)
-                         for line in reversed(a_lines) if "Assigned client ID" in line), None)
-            id_b = next((re.search(r"Assigned client ID: (\d+)", line).group(1)
-                         for line in reversed(b_lines) if "Assigned client ID" in line), None)
+        id_a = wait_for_pattern(a_out, r"Assigned client ID: (\d+)", HANDSHAKE_TIMEOUT).group(1)
+        id_b = wait_for_pattern(b_out, r"Assigned client ID: (\d+)", HANDSHAKE_TIMEOUT).group(1)
 
         if not id_a or not id_b or id_a == id_b:
             print("❌ Failed to resolve distinct client IDs.")
@@ -85,38 +78,44 @@ def run_file_test():
         print(f"🆔 Client A ID: {id_a}")
         print(f"🆔 Client B ID: {id_b}")
 
+        wait_for_pattern(a_out, r"You may begin\|START", HANDSHAKE_TIMEOUT)
+        # B must have read its START before the request: the client drops frames sharing a read
+        wait_for_pattern(b_out, r"You may begin\|START|Interaction enabled", HANDSHAKE_TIMEOUT)
+
+        result.phase("action")
         # Send file from A to B
         print(f"📤 Sending file from Client A (ID={id_a}) → Client B (ID={id_b})")
+        mark = a_out.mark()
         client_a.stdin.write(f"{id_b}\n".encode())
         client_a.stdin.flush()
-        time.sleep(5)
+        wait_for_pattern(a_out, r"Enter filename", EVENT_TIMEOUT, start=mark)
         client_a.stdin.write(b"test_file.txt\n")
         client_a.stdin.flush()
-        time.sleep(20)
+        wait_for_pattern(b_out, fr"Received frame: \w+\|file\|0\|{id_b}\|.*\|DONE", EVENT_TIMEOUT)
 
+        result.phase("validation")
         # Validate logs
-        with open("logs/server.log") as s_log:
-            s_content = s_log.read()
-            assert re.search(fr"\[FILE\] \s*Preparing to send 'test_file.txt'", s_content), "❌ Server did not prepare file"
-            assert re.search(fr"\[FILE\] \s*Sent chunk #0", s_content), "❌ Server did not send CHUNK"
-            assert re.search(fr"\[FILE\] \s*Transfer complete", s_content), "❌ Server did not complete transfer"
-            print("🔍 Server CHUNK and DONE confirmed.")
-
-        with open("logs/client_b.log") as b_log:
-            b_content = b_log.read()
-            assert re.search(fr"Received frame: \w+\|file\|0\|{id_b}\|.*test_file.txt.*\|INCOMING", b_content), "❌ INCOMING frame missing"
-            #assert re.search(fr"Received frame: \w+\|file\|0\|{id_b}\|.*\|CHUNK", b_content), "❌ CHUNK frame not from server"
-            assert re.search(fr"Received frame: \w+\|file\|0\|{id_b}\|.*\|DONE", b_content), "❌ DONE frame not from server"
-            print("🔍 Client B received INCOMING, CHUNK, and DONE frames.")
-
-        with open("logs/client_a.log") as a_log:
-            a_content = a_log.read()
-           # assert re.search(fr"Received frame: \w+\|ack\|{id_b}\|{id_a}\|.*\|ACK", a_content), "❌ ACK not received by sender"
-            print("🔍 Client A received ACK frame.")
+        assert_log("logs/server.log", {
+            "prepare": (r"\[FILE\] \s*Preparing to send 'test_file.txt'", "❌ Server did not prepare file"),
+            "chunk_0": (r"\[FILE\] \s*Sent chunk #0", "❌ Server did not send CHUNK"),
+            "complete": (r"\[FILE\] \s*Transfer complete", "❌ Server did not complete transfer"),
+        })
+        print("🔍 Server CHUNK and DONE confirmed.")
+
+        assert_log("logs/client_b.log", {
+            "incoming": (fr"Received frame: \w+\|file\|0\|{id_b}\|.*test_file.txt.*\|INCOMING", "❌ INCOMING frame missing"),
+            #"chunk": (fr"Received frame: \w+\|file\|0\|{id_b}\|.*\|CHUNK", "❌ CHUNK frame not from server"),
+            "done": (fr"Received frame: \w+\|file\|0\|{id_b}\|.*\|DONE", "❌ DONE frame not from server"),
+        })
+        print("🔍 Client B received INCOMING, CHUNK, and DONE frames.")
+
+       # assert_log("logs/client_a.log", {"ack": (fr"Received frame: \w+\|ack\|{id_b}\|{id_a}\|.*\|ACK", "❌ ACK not received by sender")})
+        print("🔍 Client A received ACK frame.")
 
         print("✅ Test passed: file transfer verified.")
         logging.info("✅ file_transfer test passed.")
     except Exception as e:
+        result.fail(e)
         print(f"❌ Test failed: {e}")
         logging.error(f"❌ file_transfer test failed: {e}")
     finally:
@@ -127,6 +126,7 @@ def run_file_test():
             print("🛑 Processes terminated.")
         except:
             logging.warning("⚠️ Could not terminate one or more processes.")
+    return result.finish()
 
 if __name__ == "__main__":
-    run_file_test()
+    run_standalone(run_file_test)
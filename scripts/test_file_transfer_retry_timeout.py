@@ -1,33 +1,56 @@
 # /**
 #  * @file test_file_transfer_retry_timeout.py
-#  * @brief Simulates packet loss to trigger RETRY and TIMEOUT during file transfer.
-#  *        Ensures client resends chunks and handles failure gracefully.
+#  * @brief Drops file chunks on the wire to trigger RETRY during a file transfer.
+#  *        The receiver's file connection goes through fault_proxy.run_proxy, which drops
+#  *        DROPPED_CHUNKS of a multi-chunk file once each, so the retries are caused by
+#  *        the test rather than by timing.
 #  *        Uses config files for file-capable clients and prints resolved paths for debugging.
 #  *
 #  *        Log assertions:
-#  *        - Receiver: "Requested retry for missing chunk #0"
-#  *        - Receiver: "Receiving 'test_file.txt': 100.00%"
-#  *        - Receiver: "File 'test_file.txt' saved"
+#  *        - Receiver: "Requested retry for chunk #N", exactly once per dropped chunk
+#  *          (the binary also logs "Requested retry for missing chunk #0" for every
+#  *          chunk it receives; those are not counted)
+#  *        - Server: "Sent chunk #N" again for every retried chunk
+#  *          (known defect: while the server never resends, the test is reported as xfailed)
+#  *        - Receiver: "Receiving 'retry_file.txt': 100.00%" and "File 'retry_file.txt' saved"
 #  *        - Sender: "Received frame: ...|ack|Y|X|...|ACK"
+#  *          (known defect: while the receiver logs "ACK sent to sender 0", the
+#  *          test is reported as xfailed)
 #  *
 #  * @author Oussama Amara
 #  * @version 1.2
 #  * @date 2025-10-18
 #  */
 
-import subprocess, time, shutil, logging, re
-from utils import get_binary_path, get_config_path, clear_logs
+import contextlib, logging, math, re, time
+from utils import resolve_environment, get_client_env, clear_logs, spawn, wait_for_pattern, STARTUP_TIMEOUT, HANDSHAKE_TIMEOUT, EVENT_TIMEOUT, PORT_ENV_VARS
+from log_assert import assert_log
+from test_result import TestResult, run_standalone
+from fault_proxy import run_proxy, Shaping
+from protocol import CHUNK_SIZE
 import os
 
-logging.info("🧪 Starting test: file_transfer_retry_timeout")
+REQUIRES_PRISTINE_SERVER = True  # the server reads assets/to_send/ from its own folder
 
-def run_retry_timeout_test():
+RETRY_FILE = "retry_file.txt"
+RETRY_FILE_LINES = 28     # ~1.2 KB: 5 chunks, so chunks can go missing before the last one
+DROPPED_CHUNKS = (1, 2)   # dropped once each on the way to the receiver
+CHUNK_GAP = 0.02          # Seconds between forwarded frames: the client drops frames sharing a read
+RESEND_TIMEOUT = 3        # Seconds for the server to resend a retried chunk
+
+def run_retry_timeout_test(env=None):
+    result = TestResult("file_transfer_retry_timeout")
+    logging.info("🧪 Starting test: file_transfer_retry_timeout")
+    stack = contextlib.ExitStack()
     try:
+        result.phase("launch")
+        env = env or resolve_environment()
         clear_logs()
-        server_bin = get_binary_path("server")
-        client_bin = get_binary_path("client")
-        server_cfg = get_config_path("server")
-        client_cfg = get_config_path("client_local_file")
+        server_bin = env.binary("server")
+        client_bin = env.binary("client")
+        server_cfg = env.config("server")
+        client_cfg = env.config("client_local_file")
+        client_env = get_client_env("client_local_file")
 
         print("🔧 Paths resolved:")
         print("   - Server bin :", server_bin)
@@ -39,43 +62,41 @@ def run_retry_timeout_test():
         try:
             os.makedirs("assets/to_send", exist_ok=True)
             os.makedirs("assets/received", exist_ok=True)
-            shutil.copy("assets/test_file.txt", "assets/to_send/test_file.txt")
-            print("📁 File placed at: assets/to_send/test_file.txt")
+            with open(f"assets/to_send/{RETRY_FILE}", "w") as f:
+                f.writelines(f"Line {i:02d}: payload of the retry test file\n" for i in range(RETRY_FILE_LINES))
+            chunks = math.ceil(os.path.getsize(f"assets/to_send/{RETRY_FILE}") / CHUNK_SIZE)
+            print(f"📁 File placed at: assets/to_send/{RETRY_FILE} ({chunks} chunks)")
             print("📂 Folder ensured: assets/received/")
         except Exception as e:
             logging.error(f"❌ Failed to prepare test file or folders: {e}")
-            return
-
-        server_log = open("logs/server.log", "a")
-        client_a_log = open("logs/client_a.log", "a")
-        client_b_log = open("logs/client_b.log", "a")
+            raise
 
         print("🚀 Launching server and clients...")
-        server = subprocess.Popen([server_bin, server_cfg], stdout=server_log, stderr=subprocess.STDOUT)
-        time.sleep(1)
-
-        client_a = subprocess.Popen([client_bin, client_cfg], stdin=subprocess.PIPE, stdout=client_a_log, stderr=subprocess.STDOUT)
-        client_b = subprocess.Popen([client_bin, client_cfg], stdout=client_b_log, stderr=subprocess.STDOUT)
-        time.sleep(10)
-
-        server_log.flush(); server_log.close()
-        client_a_log.flush(); client_a_log.close()
-        client_b_log.flush(); client_b_log.close()
+        server, server_out = spawn([server_bin, server_cfg], "logs/server.log")
+        wait_for_pattern(server_out, r"Server listening", STARTUP_TIMEOUT, count=3)
+        # Ports are bound in chat, file, game order
+        file_port = int(wait_for_pattern(server_out, r"Listening on [\d.]+:(\d+)", STARTUP_TIMEOUT, count=2).group(1))
+
+        # Only the receiver goes through the proxy: each dropped chunk is dropped once
+        drops = Shaping(drop=1, match=r"\|CHUNK\|(%s)\|" % "|".join(map(str, DROPPED_CHUNKS)), limit=len(DROPPED_CHUNKS),
+                        gap=CHUNK_GAP)
+        proxy = stack.enter_context(run_proxy([(0, file_port)], downstream=drops))
+        proxy_port = str(proxy.ports[0])
+        print(f"🔀 Receiver routed through proxy port {proxy_port}, dropping chunk(s) {DROPPED_CHUNKS}")
+
+        client_a, a_out = spawn([client_bin, client_cfg], "logs/client_a.log", stdin=True, env=client_env)
+        receiver_env = dict(client_env, CONFIG_PORT=proxy_port, **{PORT_ENV_VARS["file"]: proxy_port})
+        client_b, b_out = spawn([client_bin, client_cfg], "logs/client_b.log", stdin=True, env=receiver_env)
 
         print("📁 Logs written to:")
         print("   - logs/server.log")
         print("   - logs/client_a.log")
         print("   - logs/client_b.log")
 
+        result.phase("handshake")
         # Extract client IDs
-        with open("logs/client_a.log") as a_log, open("logs/client_b.log") as b_log:
-            a_lines = a_log.readlines()
-            b_lines = b_log.readlines()
-
-            id_a = next((re.search(r"Assigned client ID: (\d+)", line).group(1)
-                         for line in reversed(a_lines) if "Assigned client ID" in line), None)
-            id_b = next((re.search(r"Assigned client ID: (\d+)", line).group(1)
-                         for line in reversed(b_lines) if "Assigned client ID" in line), None)
+        id_a = wait_for_pattern(a_out, r"Assigned client ID: (\d+)", HANDSHAKE_TIMEOUT).group(1)
+        id_b = wait_for_pattern(b_out, r"Assigned client ID: (\d+)", HANDSHAKE_TIMEOUT).group(1)
 
         if not id_a or not id_b or id_a == id_b:
             print("❌ Failed to resolve distinct client IDs.")
@@ -84,32 +105,69 @@ def run_retry_timeout_test():
         print(f"🆔 Client A ID: {id_a}")
         print(f"🆔 Client B ID: {id_b}")
 
+        wait_for_pattern(a_out, r"You may begin\|START", HANDSHAKE_TIMEOUT)
+        # B must have read its START before the request: the client drops frames sharing a read
+        wait_for_pattern(b_out, r"You may begin\|START|Interaction enabled", HANDSHAKE_TIMEOUT)
+
+        result.phase("action")
         # Send file from A to B
         print(f"📤 Sending file from Client A (ID={id_a}) → Client B (ID={id_b})")
+        mark = a_out.mark()
         client_a.stdin.write(f"{id_b}\n".encode())
         client_a.stdin.flush()
-        time.sleep(0.5)
-        client_a.stdin.write(b"test_file.txt\n")
+        wait_for_pattern(a_out, r"Enter filename", EVENT_TIMEOUT, start=mark)
+        client_a.stdin.write(f"{RETRY_FILE}\n".encode())
         client_a.stdin.flush()
-        time.sleep(10)
-
-        # Validate retry and timeout behavior
-        with open("logs/client_b.log") as b_log:
-            b_content = b_log.read()
-            retry_count = len(re.findall(r"Requested retry for missing chunk #0", b_content))
-            assert retry_count >= 5, f"❌ Retry count too low: {retry_count}"
-            assert "Receiving 'test_file.txt': 100.00%" in b_content, "❌ File not fully received"
-            assert "File 'test_file.txt' saved" in b_content, "❌ File not saved on receiver"
-            print(f"🔍 Receiver retried chunk #0 {retry_count} times and saved file.")
-
-        with open("logs/client_a.log") as a_log:
-            a_content = a_log.read()
-            assert re.search(fr"Received frame: \w+\|ack\|{id_b}\|{id_a}\|.*\|ACK", a_content), "❌ ACK not received by sender"
-            print("🔍 Sender received ACK frame.")
-
-        print("✅ Test passed: retry and timeout behavior verified.")
+        # The gaps are noticed once the last chunk arrived
+        wait_for_pattern(b_out, r"Requested retry for chunk #", EVENT_TIMEOUT, count=len(DROPPED_CHUNKS))
+
+        result.phase("validation")
+        dropped = proxy.stats["down"]["dropped"]
+        assert dropped == len(DROPPED_CHUNKS), f"❌ Proxy dropped {dropped} chunk(s), expected {len(DROPPED_CHUNKS)}"
+
+        # Known binary defect: the server ignores RETRY and never resends a chunk
+        resent = []
+        deadline = time.monotonic() + RESEND_TIMEOUT
+        for index in DROPPED_CHUNKS:
+            try:
+                wait_for_pattern(server_out, fr"Sent chunk #{index} ", max(0, deadline - time.monotonic()), count=2)
+                resent.append(index)
+            except TimeoutError:
+                pass
+
+        retried = [int(i) for i in re.findall(r"Requested retry for chunk #(\d+)", b_out.text())]
+        result.metric("retries", len(retried))
+        assert sorted(retried) == sorted(DROPPED_CHUNKS), \
+            f"❌ Retries requested for chunk(s) {retried}, expected one for each of {list(DROPPED_CHUNKS)}"
+        print(f"🔍 Receiver requested one retry for each dropped chunk: {retried}")
+
+        if not resent:
+            result.xfail("server does not resend chunks requested with RETRY")
+            print("⚠️ Server did not resend the retried chunks (known binary defect).")
+        else:
+            assert resent == list(DROPPED_CHUNKS), f"❌ Server resent chunk(s) {resent} of {list(DROPPED_CHUNKS)}"
+            wait_for_pattern(b_out, f"File '{RETRY_FILE}' saved", EVENT_TIMEOUT)
+            assert_log("logs/client_b.log", {
+                "progress": (re.escape(f"Receiving '{RETRY_FILE}': 100.00%"), "❌ File not fully received"),
+                "saved": (re.escape(f"File '{RETRY_FILE}' saved"), "❌ File not saved on receiver"),
+            })
+            print("🔍 Receiver got the resent chunks and saved the file.")
+
+            # Known binary defect: the receiver addresses its ACK to client 0, not the sender
+            ack_dest = wait_for_pattern(b_out, fr"ACK sent to sender (\d+) from receiver {id_b}\b", EVENT_TIMEOUT).group(1)
+            if ack_dest == "0":
+                result.xfail("receiver sends the file ACK to client 0 instead of the sender")
+                print("⚠️ Receiver addressed its ACK to client 0 (known binary defect).")
+            else:
+                assert_log("logs/client_a.log", {
+                    "ack": (fr"Received frame: \w+\|ack\|{id_b}\|{id_a}\|.*\|ACK", "❌ ACK not received by sender"),
+                })
+                print("🔍 Sender received ACK frame.")
+
+        print("✅ Test passed: retry behavior verified.")
         logging.info("✅ file_transfer_retry_timeout test passed.")
     except Exception as e:
+        result.fail(e)
         print(f"❌ Test failed: {e}")
         logging.error(f"❌ file_transfer_retry_timeout test failed: {e}")
     finally:
@@ -120,6 +178,8 @@ def run_retry_timeout_test():
             print("🛑 Processes terminated.")
         except:
             logging.warning("⚠️ Could not terminate one or more processes.")
+        stack.close()
+    return result.finish()
 
 if __name__ == "__main__":
-    run_retry_timeout_test()
+    run_standalone(run_retry_timeout_test)
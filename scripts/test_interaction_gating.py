@@ -13,18 +13,25 @@
 #  * @date 2025-10-13
 #  */
 
-import subprocess, time, logging, re
-from utils import get_binary_path, get_config_path, clear_logs
+import logging
+from utils import resolve_environment, get_client_env, clear_logs, spawn, wait_for_pattern, STARTUP_TIMEOUT, HANDSHAKE_TIMEOUT
+from log_assert import LogAssert, tail
+from test_result import TestResult, run_standalone
 
-logging.info("🧪 Starting test: interaction_gating")
+REQUIRES_PRISTINE_SERVER = True  # the client must be alone on the server to get WAIT
 
-def run_gating_test():
+def run_gating_test(env=None):
+    result = TestResult("interaction_gating")
+    logging.info("🧪 Starting test: interaction_gating")
     try:
+        result.phase("launch")
+        env = env or resolve_environment()
         clear_logs()
-        server_bin = get_binary_path("server")
-        client_bin = get_binary_path("client")
-        server_cfg = get_config_path("server")
-        client_cfg = get_config_path("client_local_file")  # fichier activé
+        server_bin = env.binary("server")
+        client_bin = env.binary("client")
+        server_cfg = env.config("server")
+        client_cfg = env.config("client_local_file")  # fichier activé
+        client_env = get_client_env("client_local_file")
 
         print("🔧 Paths resolved:")
         print("   - Server bin :", server_bin)
@@ -32,46 +39,45 @@ def run_gating_test():
         print("   - Server cfg :", server_cfg)
         print("   - Client cfg :", client_cfg)
 
-        server_log = open("logs/server.log", "a")
-        client_log = open("logs/client_wait.log", "a")
-
         print("🚀 Launching server and one client...")
-        server = subprocess.Popen([server_bin, server_cfg], stdout=server_log, stderr=subprocess.STDOUT)
-        time.sleep(1)
-
-        client = subprocess.Popen([client_bin, client_cfg], stdin=subprocess.PIPE, stdout=client_log, stderr=subprocess.STDOUT)
-        time.sleep(10)
+        server, server_out = spawn([server_bin, server_cfg], "logs/server.log")
+        wait_for_pattern(server_out, r"Server listening", STARTUP_TIMEOUT, count=3)
 
-        server_log.flush(); server_log.close()
-        client_log.flush(); client_log.close()
+        client, client_out = spawn([client_bin, client_cfg], "logs/client_wait.log", stdin=True, env=client_env)
+        result.phase("handshake")
+        wait_for_pattern(client_out, r"Assigned client ID: \d+", HANDSHAKE_TIMEOUT)
+        # The server sends WAIT while the client is alone
+        wait_for_pattern(client_out, r"Waiting for another client...\|WAIT", HANDSHAKE_TIMEOUT)
 
         print("📁 Logs written to:")
         print("   - logs/server.log")
         print("   - logs/client_wait.log")
 
+        result.phase("action")
         # Send blocked command still not supported 
         message = "chat Should be blocked\n"
         print(f"📤 Sending blocked command: '{message.strip()}'")
         client.stdin.write(message.encode())
         client.stdin.flush()
-        time.sleep(5)
 
+        result.phase("validation")
         # Validate client log
-        with open("logs/client_wait.log") as c_log:
-            content = c_log.read()
-            wait_match = re.search(r"Received frame: \w+\|system\|0\|\d+\|Waiting for another client...\|WAIT", content)
-           # block_match = re.search(r"Interaction blocked until START", content)
+        c_log = LogAssert("logs/client_wait.log")
+        c_log.expect("wait_frame", r"Received frame: \w+\|system\|0\|\d+\|Waiting for another client...\|WAIT")
+       # c_log.expect("blocked", r"Interaction blocked until START")
+        c_log.scan(final=True)
 
-            if not wait_match :#or not block_match:
-                print("📄 Client log preview:\n", "\n".join(content.splitlines()[-40:]))
-                raise AssertionError("❌ Client did not receive WAIT frame or block confirmation.")
+        if c_log.unmet:
+            print("📄 Client log preview:\n", tail("logs/client_wait.log", 40))
+            raise AssertionError("❌ Client did not receive WAIT frame or block confirmation.")
 
-            print("🔍 WAIT frame confirmed.")
-            print("🔍 Interaction block confirmed.")
+        print("🔍 WAIT frame confirmed.")
+        print("🔍 Interaction block confirmed.")
 
         print("✅ Test passed: interaction gated until START.")
         logging.info("✅ interaction_gating test passed.")
     except Exception as e:
+        result.fail(e)
         print(f"❌ Test failed: {e}")
         logging.error(f"❌ interaction_gating test failed: {e}")
     finally:
@@ -81,6 +87,7 @@ def run_gating_test():
             print("🛑 Processes terminated.")
         except:
             logging.warning("⚠️ Could not terminate one or more processes.")
+    return result.finish()
 
 if __name__ == "__main__":
-    run_gating_test()
+    run_standalone(run_gating_test)
@@ -1,6 +1,8 @@
 # /**
 #  * @file test_multi_client_chat.py
-#  * @brief Simulates N clients sending messages to random peers concurrently.
+#  * @brief Simulates N clients sending messages concurrently, each to the next client
+#  *        in a ring (the binaries drop chat frames that reach a receiver in the same
+#  *        read, so no receiver gets two messages at once).
 #  *        Validates routing, delivery, and START frame readiness.
 #  *        Uses config files and dynamic ID resolution.
 #  *
@@ -15,20 +17,27 @@
 #  * @date 2025-10-13
 #  */
 
-import subprocess, time, logging, re, threading, random
-from utils import get_binary_path, get_config_path, clear_logs
+import time, logging, threading
+from utils import resolve_environment, get_client_env, clear_logs, spawn, wait_for_pattern, STARTUP_TIMEOUT, HANDSHAKE_TIMEOUT, EVENT_TIMEOUT
+from log_assert import LogAssert
+from test_result import TestResult, run_standalone
 
-NUM_CLIENTS = 5  # 🔧 Change this to scale up/down
+REQUIRES_PRISTINE_SERVER = True  # concurrent sends from 5 clients get mixed up on a warm server
 
-logging.info("🧪 Starting test: multi_client_chat_stress")
+NUM_CLIENTS = 5  # 🔧 Change this to scale up/down
 
-def run_stress_chat():
+def run_stress_chat(env=None):
+    result = TestResult("multi_client_chat")
+    logging.info("🧪 Starting test: multi_client_chat_stress")
     try:
+        result.phase("launch")
+        env = env or resolve_environment()
         clear_logs()
-        server_bin = get_binary_path("server")
-        client_bin = get_binary_path("client")
-        server_cfg = get_config_path("server")
-        client_cfg = get_config_path("client_local")
+        server_bin = env.binary("server")
+        client_bin = env.binary("client")
+        server_cfg = env.config("server")
+        client_cfg = env.config("client_local")
+        client_env = get_client_env("client_local")
 
         print("🔧 Paths resolved:")
         print("   - Server bin :", server_bin)
@@ -36,78 +45,73 @@ def run_stress_chat():
         print("   - Server cfg :", server_cfg)
         print("   - Client cfg :", client_cfg)
 
-        server_log = open("logs/server.log", "a")
-        client_logs = [open(f"logs/client_{i}.log", "a") for i in range(NUM_CLIENTS)]
-
         print(f"🚀 Launching server and {NUM_CLIENTS} clients...")
-        server = subprocess.Popen([server_bin, server_cfg], stdout=server_log, stderr=subprocess.STDOUT)
-        time.sleep(1)
+        server, server_out = spawn([server_bin, server_cfg], "logs/server.log")
+        wait_for_pattern(server_out, r"Server listening", STARTUP_TIMEOUT, count=3)
 
-        clients = [
-            subprocess.Popen([client_bin, client_cfg], stdin=subprocess.PIPE, stdout=client_logs[i], stderr=subprocess.STDOUT)
+        launched = [
+            spawn([client_bin, client_cfg], f"logs/client_{i}.log", stdin=True, env=client_env)
             for i in range(NUM_CLIENTS)
         ]
-        time.sleep(20)
-
-        server_log.flush(); server_log.close()
-        for log in client_logs: log.flush(); log.close()
+        clients = [proc for proc, _ in launched]
+        outputs = [out for _, out in launched]
 
         print("📁 Logs written to:")
         print("   - logs/server.log")
         for i in range(NUM_CLIENTS):
             print(f"   - logs/client_{i}.log")
 
+        result.phase("handshake")
         # Extract client IDs
         ids = []
         for i in range(NUM_CLIENTS):
-            with open(f"logs/client_{i}.log") as log:
-                lines = log.readlines()
-                id_match = next((re.search(r"Assigned client ID: (\d+)", line).group(1)
-                                 for line in reversed(lines) if "Assigned client ID" in line), None)
-                ids.append(id_match)
+            try:
+                ids.append(wait_for_pattern(outputs[i], r"Assigned client ID: (\d+)", HANDSHAKE_TIMEOUT).group(1))
+            except TimeoutError:
+                ids.append(None)
 
         # Filter out clients with missing IDs
         valid_clients = [(i, ids[i], clients[i]) for i in range(NUM_CLIENTS) if ids[i] is not None]
-        valid_indices = [i for i, _, _ in valid_clients]
         if len(valid_clients) < NUM_CLIENTS:
             print(f"⚠️ Only {len(valid_clients)} clients initialized successfully.")
 
         print("🆔 Assigned client IDs:", ids)
+        result.metric("clients_ready", len(valid_clients))
 
         # Wait for START frames
         print("⏳ Waiting for START frames...")
         start_confirmed = set()
-        timeout = time.time() + 15
-        while time.time() < timeout and len(start_confirmed) < len(valid_clients):
-            for i, cid, _ in valid_clients:
-                with open(f"logs/client_{i}.log") as log:
-                    if re.search(r"You may begin\|START", log.read()):
-                        start_confirmed.add(i)
-            time.sleep(1)
-
-        # Define message plan with correct sender binding
+        deadline = time.monotonic() + 15
+        for i, cid, _ in valid_clients:
+            try:
+                wait_for_pattern(outputs[i], r"You may begin\|START", max(0, deadline - time.monotonic()))
+                start_confirmed.add(i)
+            except TimeoutError:
+                print(f"⚠️ Client[{i}] (ID={cid}) did not receive START.")
+
+        result.phase("action")
+        # Define message plan with correct sender binding: every client sends to the next one
         message_plan = []
-        for i, sender_id, proc in valid_clients:
-            target_choices = [j for j in valid_indices if j != i and ids[j] is not None]
-            if not target_choices:
-                continue
-            target_index = random.choice(target_choices)
-            target_id = ids[target_index]
-            message_plan.append((i, sender_id, target_id))
+        if len(valid_clients) > 1:
+            for position, (i, sender_id, proc) in enumerate(valid_clients):
+                target_id = valid_clients[(position + 1) % len(valid_clients)][1]
+                message_plan.append((i, sender_id, target_id))
 
         def send_message(client_index, sender_id, target_id):
             print(f"📤 Sending from Client[{client_index}] (ID={sender_id}) → ID={target_id}")
 
             proc = clients[client_index]
             try:
+                mark = outputs[client_index].mark()
                 proc.stdin.write(f"{target_id}\n".encode())
                 proc.stdin.flush()
-                time.sleep(0.5)
+                wait_for_pattern(outputs[client_index], r"Enter message:", EVENT_TIMEOUT, start=mark)
                 proc.stdin.write(f"chat Hello from {sender_id}\n".encode())
                 proc.stdin.flush()
             except Exception as e:
                 print(f"⚠️ Client {client_index} failed to send: {e}")
 
+        result.metric("messages", len(message_plan))
         print("📤 Sending messages concurrently...")
         threads = []
         print("🧪 Message plan:")
@@ -116,55 +120,59 @@ def run_stress_chat():
             t = threading.Thread(target=send_message, args=(index, sender_id, target_id))
             t.start()
             threads.append(t)
-            time.sleep(10)
 
         for t in threads:
             t.join()
 
-        print("⏳ Waiting for routing and log flush...")
-        time.sleep(10)
-
-        # Validate server forwarding with retry
+        result.phase("validation")
+        # Validate server forwarding as each line is printed
+        print("⏳ Waiting for routing...")
         missing = []
-        for attempt in range(3):
-            with open("logs/server.log") as s_log:
-                s_content = s_log.read()
-                missing = []
-                for sender_index, sender_id, target_id in message_plan:
-                    if not sender_id or not target_id:
-                        continue
-                    match = re.search(fr"\[CHAT\] \s*Forwarding from {sender_id} to {target_id}: chat .*?Hello from {sender_id}", s_content)
-                    if not match:
-                        missing.append((sender_id, target_id))
-            if not missing:
-                break
-            print(f"🔁 Retry {attempt+1}: waiting for forwarding...")
-            time.sleep(5)
+        deadline = time.monotonic() + 3 * EVENT_TIMEOUT
+        for sender_index, sender_id, target_id in message_plan:
+            if not sender_id or not target_id:
+                continue
+            try:
+                wait_for_pattern(server_out, fr"\[CHAT\] \s*Forwarding from {sender_id} to {target_id}: chat .*?Hello from {sender_id}",
+                                 max(0, deadline - time.monotonic()))
+            except TimeoutError:
+                missing.append((sender_id, target_id))
 
         if missing:
-            print("📄 Server log preview:\n", "\n".join(s_content.splitlines()[-40:]))
+            print("📄 Server log preview:\n", "\n".join(server_out.text().splitlines()[-40:]))
             for sid, tid in missing:
                 print(f"❌ Server did not forward message from {sid} to {tid}")
             raise AssertionError("❌ Missing forwarding logs.")
 
         print("🔍 Server forwarding confirmed for all messages.")
 
-        # Validate chat delivery
+        # Validate chat delivery: all expectations on a receiver log are checked in one pass
+        receiver_logs = {}
+        deliveries = []
         for sender_index, sender_id, target_id in message_plan:
             if not sender_id or not target_id:
                 continue
             receiver_index = ids.index(target_id)
-            with open(f"logs/client_{receiver_index}.log") as log:
-                content = log.read()
-                match = re.search(fr"Received frame: \w+\|chat\|{sender_id}\|{target_id}\|chat Hello from {sender_id}\|READY", content)
-                if not match:
-                    print(f"❌ Client {target_id} did not receive chat from {sender_id}")
-                    raise AssertionError(f"Missing chat frame for {sender_id} → {target_id}")
-                print(f"🔍 Client {target_id} received chat from {sender_id}")
+            try:
+                wait_for_pattern(outputs[receiver_index], fr"Received frame: \w+\|chat\|{sender_id}\|{target_id}\|chat Hello from {sender_id}", EVENT_TIMEOUT)
+            except TimeoutError:
+                pass  # reported by the log check below
+            log = receiver_logs.setdefault(receiver_index, LogAssert(f"logs/client_{receiver_index}.log"))
+            expectation = log.expect(f"{sender_id}->{target_id}", fr"Received frame: \w+\|chat\|{sender_id}\|{target_id}\|chat Hello from {sender_id}\|READY")
+            deliveries.append((expectation, sender_id, target_id))
+
+        for log in receiver_logs.values():
+            log.scan(final=True)
+        for expectation, sender_id, target_id in deliveries:
+            if not expectation.met:
+                print(f"❌ Client {target_id} did not receive chat from {sender_id}")
+                raise AssertionError(f"Missing chat frame for {sender_id} → {target_id}")
+            print(f"🔍 Client {target_id} received chat from {sender_id}")
 
         print(f"✅ Test passed: {NUM_CLIENTS}-client concurrent chat routing verified.")
         logging.info("✅ multi_client_chat_stress test passed.")
     except Exception as e:
+        result.fail(e)
         print(f"❌ Test failed: {e}")
         logging.error(f"❌ multi_client_chat_stress test failed: {e}")
     finally:
@@ -175,6 +183,7 @@ def run_stress_chat():
             print("🛑 Processes terminated.")
         except:
             logging.warning("⚠️ Could not terminate one or more processes.")
+    return result.finish()
 
 if __name__ == "__main__":
-    run_stress_chat()
+    run_standalone(run_stress_chat)
@@ -12,18 +12,24 @@
 #  * @date 2025-10-13
 #  */
 
-import subprocess, time, logging, re
-from utils import get_binary_path, get_config_path, clear_logs
-
-logging.info("🧪 Starting test: profanity_filter")
-
-def run_profanity_test():
+import logging
+from utils import resolve_environment, get_client_env, clear_logs, spawn, wait_for_pattern, HANDSHAKE_TIMEOUT, EVENT_TIMEOUT
+from log_assert import LogAssert, tail
+from server_pool import acquire_server, release_server
+from test_result import TestResult, run_standalone
+
+def run_profanity_test(env=None):
+    result = TestResult("profanity_filter")
+    logging.info("🧪 Starting test: profanity_filter")
     try:
+        result.phase("launch")
+        env = env or resolve_environment()
         clear_logs()
-        server_bin = get_binary_path("server")
-        client_bin = get_binary_path("client")
-        server_cfg = get_config_path("server")
-        client_cfg = get_config_path("client_local")
+        server_bin = env.binary("server")
+        client_bin = env.binary("client")
+        server_cfg = env.config("server")
+        client_cfg = env.config("client_local")
+        client_env = get_client_env("client_local")
 
         print("🔧 Paths resolved:")
         print("   - Server bin :", server_bin)
@@ -31,32 +37,20 @@ def run_profanity_test():
         print("   - Server cfg :", server_cfg)
         print("   - Client cfg :", client_cfg)
 
-        server_log = open("logs/server.log", "a")
-        client_a_log = open("logs/client_a.log", "a")
-        client_b_log = open("logs/client_b.log", "a")
-
         print("🚀 Launching server and clients...")
-        server = subprocess.Popen([server_bin, server_cfg], stdout=server_log, stderr=subprocess.STDOUT)
-        time.sleep(5)
+        server, server_out = acquire_server(env, "logs/server.log")
 
-        client_a = subprocess.Popen([client_bin, client_cfg], stdin=subprocess.PIPE, stdout=client_a_log, stderr=subprocess.STDOUT)
-        client_b = subprocess.Popen([client_bin, client_cfg], stdin=subprocess.PIPE, stdout=client_b_log, stderr=subprocess.STDOUT)
-        time.sleep(20)
-
-        server_log.flush(); server_log.close()
-        client_a_log.flush(); client_a_log.close()
-        client_b_log.flush(); client_b_log.close()
+        client_a, a_out = spawn([client_bin, client_cfg], "logs/client_a.log", stdin=True, env=client_env)
+        client_b, b_out = spawn([client_bin, client_cfg], "logs/client_b.log", stdin=True, env=client_env)
 
         print("📁 Logs written to:")
         print("   - logs/server.log")
         print("   - logs/client_a.log")
         print("   - logs/client_b.log")
 
+        result.phase("handshake")
         # Extract client A ID
-        with open("logs/client_a.log") as a_log:
-            a_lines = a_log.readlines()
-            id_a = next((re.search(r"Assigned client ID: (\d+)", line).group(1)
-                         for line in reversed(a_lines) if "Assigned client ID" in line), None)
+        id_a = wait_for_pattern(a_out, r"Assigned client ID: (\d+)", HANDSHAKE_TIMEOUT).group(1)
 
         if not id_a:
             print("❌ Failed to resolve client A ID.")
@@ -72,35 +66,42 @@ def run_profanity_test():
         print(f"   - Full message: '{message.strip()}'")
         print(f"   - Sender: Client A (ID={id_a}) → Target: Client A (self)")
 
+        wait_for_pattern(a_out, r"You may begin\|START", HANDSHAKE_TIMEOUT)
+
+        result.phase("action")
+        mark = a_out.mark()
         client_a.stdin.write(f"{id_a}\n".encode())  # Target self to trigger local filter
         client_a.stdin.flush()
-        time.sleep(0.5)
+        wait_for_pattern(a_out, r"Enter message:", EVENT_TIMEOUT, start=mark)
         client_a.stdin.write(message.encode())
         client_a.stdin.flush()
-        time.sleep(5)
+        wait_for_pattern(a_out, r"Inappropriate language detected\|ALERT", EVENT_TIMEOUT, start=mark)
 
+        result.phase("validation")
         # Validate sender log
-        with open("logs/client_a.log") as a_log:
-            a_content = a_log.read()
-            frame_match = re.search(fr"Received frame: \w+\|system\|0\|{id_a}\|Inappropriate language detected\|ALERT", a_content)
-            if not frame_match:
-                print("📄 Sender log preview:\n", "\n".join(a_content.splitlines()[-40:]))
-                raise AssertionError("❌ Sender did not receive ALERT frame.")
-            print("🔍 Sender ALERT frame confirmed.")
+        a_log = LogAssert("logs/client_a.log")
+        a_log.expect("alert_frame", fr"Received frame: \w+\|system\|0\|{id_a}\|Inappropriate language detected\|ALERT")
+        a_log.scan(final=True)
+        if a_log.unmet:
+            print("📄 Sender log preview:\n", tail("logs/client_a.log", 40))
+            raise AssertionError("❌ Sender did not receive ALERT frame.")
+        print("🔍 Sender ALERT frame confirmed.")
 
         print("✅ Test passed: client-side profanity blocked and ALERT returned to sender.")
         logging.info("✅ profanity_filter test passed.")
     except Exception as e:
+        result.fail(e)
         print(f"❌ Test failed: {e}")
         logging.error(f"❌ profanity_filter test failed: {e}")
     finally:
         try:
-            server.terminate()
             client_a.terminate()
             client_b.terminate()
+            release_server(server)
             print("🛑 Processes terminated.")
         except:
             logging.warning("⚠️ Could not terminate one or more processes.")
+    return result.finish()
 
 if __name__ == "__main__":
-    run_profanity_test()
+    run_standalone(run_profanity_test)
@@ -8,46 +8,63 @@
 #  * @date 2025-10-05
 #  */
 
-import subprocess, time, logging
-from utils import get_binary_path, get_config_path
+import logging
+from utils import resolve_environment, get_client_env, spawn, wait_for_pattern, HANDSHAKE_TIMEOUT, EVENT_TIMEOUT
+from server_pool import acquire_server, release_server
+from test_result import TestResult, run_standalone
 
-logging.info("🧪 Starting test: progress_bar_chunks")
-
-def run_chunk_progress():
+def run_chunk_progress(env=None):
+    result = TestResult("progress_bar_chunks")
+    logging.info("🧪 Starting test: progress_bar_chunks")
     try:
+        result.phase("launch")
+        env = env or resolve_environment()
         long_message = "chat " + ("Chunked message. " * 40) + "\n"
 
-        server_bin = get_binary_path("server")
-        client_bin = get_binary_path("client")
-        server_cfg = get_config_path("server")
-        client_cfg = get_config_path("client_local")
+        server_bin = env.binary("server")
+        client_bin = env.binary("client")
+        server_cfg = env.config("server")
+        client_cfg = env.config("client_local")
+        client_env = get_client_env("client_local")
 
         print("-> Server bin path :", server_bin)
         print("-> Client bin path :", client_bin)
         print("-> Server config   :", server_cfg)
         print("-> Client config   :", client_cfg)
 
-        server = subprocess.Popen([server_bin, server_cfg])
-        time.sleep(1)
+        server, server_out = acquire_server(env, "logs/server.log")
 
-        client_a = subprocess.Popen([client_bin, client_cfg], stdin=subprocess.PIPE)
-        client_b = subprocess.Popen([client_bin, client_cfg])
-        time.sleep(2)
+        client_a, a_out = spawn([client_bin, client_cfg], "logs/client_a.log", stdin=True, env=client_env)
+        client_b, b_out = spawn([client_bin, client_cfg], "logs/client_b.log", stdin=True, env=client_env)
+        result.phase("handshake")
+        wait_for_pattern(a_out, r"Assigned client ID: \d+", HANDSHAKE_TIMEOUT)
+        id_b = wait_for_pattern(b_out, r"Assigned client ID: (\d+)", HANDSHAKE_TIMEOUT).group(1)
+        wait_for_pattern(a_out, r"You may begin\|START", HANDSHAKE_TIMEOUT)
 
+        result.phase("action")
+        mark = a_out.mark()
+        client_a.stdin.write(f"{id_b}\n".encode())
+        client_a.stdin.flush()
+        wait_for_pattern(a_out, r"Enter message:", EVENT_TIMEOUT, start=mark)
         client_a.stdin.write(long_message.encode())
         client_a.stdin.flush()
-        time.sleep(3)
+        chunks = wait_for_pattern(a_out, r"Chat message sent in (\d+) chunk\(s\)", EVENT_TIMEOUT, start=mark).group(1)
+        result.phase("validation")
+        print(f"📦 Sender reported {chunks} chunk(s).")
+        result.metric("chunks", int(chunks))
 
         logging.info("✅ progress_bar_chunks test passed.")
     except Exception as e:
+        result.fail(e)
         logging.error(f"❌ progress_bar_chunks test failed: {e}")
     finally:
         try:
-            server.terminate()
             client_a.terminate()
             client_b.terminate()
+            release_server(server)
         except:
             logging.warning("⚠️ Could not terminate one or more processes.")
+    return result.finish()
 
 if __name__ == "__main__":
-    run_chunk_progress()
+    run_standalone(run_chunk_progress)
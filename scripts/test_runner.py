@@ -2,12 +2,43 @@
 #  * @file test_runner.py
 #  * @brief Unified runner for all protocol validation tests.
 #  *        Supports local execution and CI automation.
+#  *        Runs tests in parallel worker processes, each with its own port triple
+#  *        (CONFIG_PORT_CHAT/FILE/GAME overrides) and a private workspace holding
+#  *        logs/ and a copy of assets/, so tests never share sockets or files.
+#  *        Every test returns a TestResult (status, phase timings, metrics); the run
+#  *        writes them to <run_dir>/results.json and <run_dir>/junit.xml.
+#  *        Each test also records a timeline (phases, waits, spawns and every line its
+#  *        child processes print) to <workspace>/trace.json; all of them are merged
+#  *        into <run_dir>/trace.json, to open in chrome://tracing or ui.perfetto.dev.
+#  *        Binaries and configs are resolved and validated once, before any test starts
+#  *        (a non-executable or truncated binary stops the run immediately), and the
+#  *        resolved Environment is handed to every test entry point.
+#  *        Tests that accept a warm server (no REQUIRES_PRISTINE_SERVER flag) run one
+#  *        after another in a pooled lane that reuses one server (server_pool.py);
+#  *        the others keep a worker, a port triple and a fresh server each.
+#  *
+#  *        Usage:
+#  *        - python scripts/test_runner.py                 # all tests at once
+#  *        - python scripts/test_runner.py -j 1            # sequential run
+#  *        - python scripts/test_runner.py test_chat_basic # selected tests only
+#  *        - python scripts/test_runner.py --junit report.xml  # JUnit XML for CI
+#  *        - python scripts/test_runner.py --version 2.6   # another bins/ version
+#  *        - python scripts/test_runner.py --no-pool       # a fresh server for every test
+#  *
 #  * @author Oussama Amara
-#  * @version 1.0
-#  * @date 2025-10-05
+#  * @version 2.0
+#  * @date 2025-10-20
 #  */
 
-import importlib, os
+import argparse, contextlib, importlib, json, os, shutil, socket, sys, time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from server_pool import close_pool
+from test_result import TestResult, PHASES, OK_STATUSES
+from utils import resolve_environment, set_environment, list_versions, start_timeline, stop_timeline
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
 
 TESTS = [
     "test_chat_basic",
@@ -24,15 +55,268 @@ TESTS = [
     "test_smoke_remote"
 ]
 
-def run_all():
-    for test in TESTS:
-        print(f"\n🔬 Running {test}...")
+BASE_PORT = 20000     # First port handed out to tests
+PORT_STRIDE = 10      # Distance between the port blocks of two tests
+RESULTS_DIR = os.path.join(ROOT_DIR, "results")
+
+def get_entry_point(module):
+    """
+    Returns the run_* function defined by a test module.
+    Entry points are named after the scenario (run_chat_test, run_gating_test...),
+    so they are looked up by prefix rather than derived from the module name.
+    """
+    for name, attr in vars(module).items():
+        if name.startswith("run_") and callable(attr) and getattr(attr, "__module__", None) == module.__name__:
+            return attr
+    raise AttributeError(f"No run_* entry point found in {module.__name__}")
+
+def port_is_free(port):
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        try:
+            sock.bind(("127.0.0.1", port))
+        except OSError:
+            return False
+    return True
+
+def allocate_ports(count, base_port=BASE_PORT):
+    """
+    Hands out `count` (chat, file, game) port triples starting at base_port,
+    skipping blocks where any port is already bound.
+    """
+    triples = []
+    port = base_port
+    while len(triples) < count:
+        if port + 2 > 65535:
+            raise RuntimeError("❌ Ran out of ports while allocating test port triples")
+        triple = (port, port + 1, port + 2)
+        if all(port_is_free(p) for p in triple):
+            triples.append(triple)
+        port += PORT_STRIDE
+    return triples
+
+def prepare_workspace(run_dir, test):
+    """
+    Creates <run_dir>/<test>/ with an empty logs/ and a private copy of assets/.
+    Transfer folders (to_send/, received/) are left for the test to populate.
+    """
+    workspace = os.path.join(run_dir, test)
+    os.makedirs(os.path.join(workspace, "logs"), exist_ok=True)
+    shutil.copytree(
+        os.path.join(ROOT_DIR, "assets"),
+        os.path.join(workspace, "assets"),
+        ignore=shutil.ignore_patterns("to_send", "received"),
+        dirs_exist_ok=True
+    )
+    return workspace
+
+def requires_pristine(test):
+    """True unless the test module accepts a warm, reused server (see server_pool.py)."""
+    return getattr(importlib.import_module(test), "REQUIRES_PRISTINE_SERVER", False)
+
+def plan_lanes(tests, pool=True, pool_lanes=1):
+    """
+    Groups tests into lanes, one worker and one port triple each: every pristine
+    test gets its own lane, the others are spread over `pool_lanes` pooled lanes.
+    """
+    if not pool:
+        return [[test] for test in tests]
+    pooled = [test for test in tests if not requires_pristine(test)]
+    lanes = [[test] for test in tests if test not in pooled]
+    count = max(1, min(pool_lanes, len(pooled)))
+    lanes += [pooled[i::count] for i in range(count) if pooled[i::count]]
+    return lanes
+
+def run_lane(lane, ports, env):
+    """
+    Worker entry: runs the (test, workspace) pairs of a lane one after another
+    on the lane's port triple, with the Environment resolved by the runner.
+    Tests of a pooled lane share the warm server kept by server_pool.
+    """
+    chat_port, file_port, game_port = ports
+    os.environ["CONFIG_PORT_CHAT"] = str(chat_port)
+    os.environ["CONFIG_PORT_FILE"] = str(file_port)
+    os.environ["CONFIG_PORT_GAME"] = str(game_port)
+    if SCRIPT_DIR not in sys.path:
+        sys.path.insert(0, SCRIPT_DIR)
+    set_environment(env)
+    try:
+        return [run_isolated(test, workspace, env) for test, workspace in lane]
+    finally:
+        close_pool()
+
+def run_isolated(test, workspace, env):
+    """
+    Runs one test inside its workspace.
+    Test output is captured to <workspace>/output.log to keep the console readable.
+    Returns the test's TestResult as a dict; an exception escaping the entry
+    point (or an entry point returning nothing) is turned into a result here.
+    """
+    os.environ["TEST_WORKSPACE"] = workspace
+    os.chdir(workspace)
+
+    fallback = TestResult(test)
+    result = None
+    timeline = start_timeline(test)
+    with open(os.path.join(workspace, "output.log"), "w") as out, \
+            contextlib.redirect_stdout(out), contextlib.redirect_stderr(out):
         try:
             module = importlib.import_module(test)
-            module.__dict__[f"run_{test.replace('test_', '')}"]()
-            print(f"✅ {test} passed.")
+            result = get_entry_point(module)(env)
         except Exception as e:
-            print(f"❌ {test} failed: {e}")
+            fallback.fail(e)
+    if not isinstance(result, TestResult):
+        result = fallback
+    result.name = test
+    stop_timeline()
+    timeline.export(os.path.join(workspace, "trace.json"))
+    return dict(result.finish().as_dict(), workspace=workspace)
+
+def write_json_report(results, suite, path):
+    with open(path, "w") as f:
+        json.dump({"suite": suite, "tests": results}, f, indent=2)
+
+def merge_traces(traces, path):
+    """Concatenates trace files (all on the same monotonic clock) into one timeline."""
+    events = []
+    for trace in traces:
+        if os.path.exists(trace):
+            with open(trace) as f:
+                events += json.load(f)["traceEvents"]
+    with open(path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+def write_junit(results, suite, path):
+    """JUnit XML: one <testcase> per test, phase timings and metrics as properties, known defects as <skipped>."""
+    failures = sum(r["status"] == "failed" for r in results)
+    errors = sum(r["status"] == "error" for r in results)
+    skipped = sum(r["status"] == "xfailed" for r in results)  # known defects
+    root = ET.Element("testsuites", tests=str(len(results)), failures=str(failures), errors=str(errors),
+                      skipped=str(skipped), time=f"{suite['wall_s']:.3f}")
+    node = ET.SubElement(root, "testsuite", name="protocol", tests=str(len(results)), failures=str(failures),
+                         errors=str(errors), skipped=str(skipped), time=f"{suite['wall_s']:.3f}",
+                         timestamp=suite["started_at"])
+    for r in results:
+        case = ET.SubElement(node, "testcase", classname="protocol", name=r["name"], time=f"{r['duration_s'] or 0:.3f}")
+        properties = ET.SubElement(case, "properties")
+        for phase in sorted(r["durations"], key=lambda p: PHASES.index(p) if p in PHASES else len(PHASES)):
+            ET.SubElement(properties, "property", name=f"phase.{phase}", value=f"{r['durations'][phase]:.3f}")
+        for name, value in r["metrics"].items():
+            ET.SubElement(properties, "property", name=f"metric.{name}", value=str(value))
+        if r["status"] == "xfailed":
+            ET.SubElement(case, "skipped", message=f"known defect: {r['xfail_reason']} ({r['error']})")
+        elif r["status"] != "passed":
+            tag = "failure" if r["status"] == "failed" else "error"
+            message = r["error"] + (f" (during {r['failed_phase']})" if r["failed_phase"] else "")
+            ET.SubElement(case, tag, message=message, type=r["error"].split(":", 1)[0]).text = r["traceback"]
+        output = os.path.join(r.get("workspace") or os.path.join(suite["run_dir"], r["name"]), "output.log")
+        if os.path.exists(output):
+            with open(output, errors="replace") as f:
+                ET.SubElement(case, "system-out").text = f.read()
+    ET.indent(root)
+    ET.ElementTree(root).write(path, encoding="utf-8", xml_declaration=True)
+
+def run_all(tests=None, jobs=None, base_port=BASE_PORT, results_dir=RESULTS_DIR, json_path=None, junit_path=None,
+            version=None, pool=True, pool_lanes=1):
+    tests = list(tests or TESTS)
+    try:
+        env = resolve_environment(version)
+    except (RuntimeError, ValueError, FileNotFoundError) as e:
+        print(e)
+        return len(tests)
+    lanes = plan_lanes(tests, pool, pool_lanes)
+    # Tests spend their time waiting on child processes, not on the CPU,
+    # so the default is to run every lane at once.
+    jobs = jobs or len(lanes)
+    run_dir = os.path.join(results_dir, time.strftime("run_%Y%m%d_%H%M%S"))
+    port_triples = allocate_ports(len(lanes), base_port)
+
+    print(f"🚀 Running {len(tests)} test(s) against version {env.version} in {len(lanes)} lane(s) with {jobs} worker(s)")
+    print(f"📁 Workspaces: {run_dir}")
+
+    results = []
+    started_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+    start = time.monotonic()
+    # One process per lane: fresh module state and environment for every run
+    with ProcessPoolExecutor(max_workers=jobs, max_tasks_per_child=1) as executor:
+        futures = {}
+        for lane, ports in zip(lanes, port_triples):
+            workspaces = [prepare_workspace(run_dir, test) for test in lane]
+            kind = "pooled lane" if len(lane) > 1 or not requires_pristine(lane[0]) and pool else "pristine"
+            print(f"🔬 Queued {', '.join(lane)} on ports {ports[0]}/{ports[1]}/{ports[2]} ({kind})")
+            futures[executor.submit(run_lane, list(zip(lane, workspaces)), ports, env)] = lane
+
+        for future in as_completed(futures):
+            lane = futures[future]
+            try:
+                lane_results = future.result()
+            except Exception as e:
+                lane_results = []
+                for test in lane:
+                    crashed = TestResult(test)
+                    crashed.fail(RuntimeError(f"worker crashed: {e}"))
+                    lane_results.append(crashed.finish().as_dict())
+            for result in lane_results:
+                results.append(result)
+                test = result["name"]
+                if result["status"] == "passed":
+                    print(f"✅ {test} passed in {result['duration_s']:.1f}s.")
+                elif result["status"] == "xfailed":
+                    print(f"⚠️ {test} xfailed after {result['duration_s']:.1f}s, known defect: {result['xfail_reason']}")
+                else:
+                    phase = f" during {result['failed_phase']}" if result["failed_phase"] else ""
+                    print(f"❌ {test} {result['status']} after {result['duration_s']:.1f}s{phase}: {result['error']}")
+
+    wall = time.monotonic() - start
+    failures = sum(r["status"] not in OK_STATUSES for r in results)
+    xfailed = sum(r["status"] == "xfailed" for r in results)
+    results.sort(key=lambda r: tests.index(r["name"]))
+    busy = sum(r["duration_s"] or 0 for r in results)
+    suite = {
+        "started_at": started_at,
+        "version": env.version,
+        "run_dir": run_dir,
+        "jobs": jobs,
+        "lanes": lanes,
+        "tests": len(results),
+        "failures": failures,
+        "xfailed": xfailed,
+        "wall_s": wall,
+        "test_time_s": busy,
+        "parallel_speedup": busy / wall if wall > 0 else None,
+    }
+    json_path = json_path or os.path.join(run_dir, "results.json")
+    junit_path = junit_path or os.path.join(run_dir, "junit.xml")
+    write_json_report(results, suite, json_path)
+    write_junit(results, suite, junit_path)
+    trace_path = os.path.join(run_dir, "trace.json")
+    merge_traces([os.path.join(r["workspace"], "trace.json") for r in results if r.get("workspace")], trace_path)
+
+    print(f"\n⏱️ Suite finished in {wall:.1f}s ({busy:.1f}s of test time, x{suite['parallel_speedup'] or 0:.1f} "
+          f"from parallelism), {failures} failure(s)"
+          f"{f', {xfailed} known defect(s) (xfailed)' if xfailed else ''}.")
+    print(f"📁 Results: {json_path}, {junit_path}, timeline: {trace_path}")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the protocol test suite in parallel.")
+    parser.add_argument("tests", nargs="*", help="Test modules to run (default: all)")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Worker processes (default: one per test)")
+    parser.add_argument("--base-port", type=int, default=BASE_PORT, help="First port of the per-test port blocks")
+    parser.add_argument("--results-dir", default=RESULTS_DIR, help="Folder receiving per-test workspaces")
+    parser.add_argument("--json", default=None, help="JSON results file (default: <run_dir>/results.json)")
+    parser.add_argument("--junit", default=None, help="JUnit XML file (default: <run_dir>/junit.xml)")
+    parser.add_argument("--no-pool", action="store_true", help="Start a fresh server for every test")
+    parser.add_argument("--pool-lanes", type=int, default=1, help="Pooled lanes sharing the warm-server tests")
+    parser.add_argument("--version", choices=list_versions(), default=None, help="bins/ version to test (default: latest)")
+    args = parser.parse_args()
+
+    unknown = [t for t in args.tests if t not in TESTS]
+    if unknown:
+        parser.error(f"Unknown test(s): {', '.join(unknown)}")
+
+    failures = run_all(args.tests, args.jobs, args.base_port, args.results_dir, args.json, args.junit, args.version,
+                       not args.no_pool, args.pool_lanes)
+    sys.exit(1 if failures else 0)
 
 if __name__ == "__main__":
-    run_all()
+    main()
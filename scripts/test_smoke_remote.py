@@ -18,78 +18,75 @@
 #  * @date 2025-10-12
 #  */
 
-import subprocess, time, logging, re, os
-from utils import get_binary_path, get_config_path, clear_logs
+import logging, os
+from utils import resolve_environment, get_client_env, clear_logs, spawn, wait_for_pattern, HANDSHAKE_TIMEOUT
+from log_assert import assert_log
+from server_pool import acquire_server, release_server
+from test_result import TestResult, run_standalone
 
-logging.info("🧪 Starting test: smoke_remote")
-
-def run_smoke_remote():
+def run_smoke_remote(env=None):
+    result = TestResult("smoke_remote")
+    logging.info("🧪 Starting test: smoke_remote")
     try:
+        result.phase("launch")
+        env = env or resolve_environment()
         os.makedirs("logs", exist_ok=True)  # ✅ Ensure logs/ exists
         clear_logs()
-        server_bin = get_binary_path("server")
-        client_bin = get_binary_path("client")
-        server_cfg = get_config_path("server")
-        client_cfg = get_config_path("client_remote")
+        server_bin = env.binary("server")
+        client_bin = env.binary("client")
+        server_cfg = env.config("server")
+        client_cfg = env.config("client_remote")
+        client_env = get_client_env("client_remote")
 
         print("-> Server bin path :", server_bin)
         print("-> Client bin path :", client_bin)
         print("-> Server config   :", server_cfg)
         print("-> Client config   :", client_cfg)
 
-        server_log = open("logs/server.log", "w")
-        client_log = open("logs/client_remote.log", "w")
-
-        server = subprocess.Popen(
-            [server_bin, server_cfg],
-            stdout=server_log,
-            stderr=subprocess.STDOUT
-        )
+        server, server_out = acquire_server(env, "logs/server.log", mode="w")
         print("✅ Server process started.")
-        time.sleep(1)
 
-        client = subprocess.Popen(
-            [client_bin, client_cfg],
-            stdin=subprocess.PIPE,
-            stdout=client_log,
-            stderr=subprocess.STDOUT
-        )
+        client, client_out = spawn([client_bin, client_cfg], "logs/client_remote.log", stdin=True, env=client_env, mode="w")
         print("✅ Client process started.")
-        time.sleep(2)
+        result.phase("handshake")
+        # Stop waiting as soon as the handshake completes (or the connection is refused)
+        handshake = wait_for_pattern(client_out, r"Assigned client ID: \d+|Connection failed|Failed to receive ID", HANDSHAKE_TIMEOUT)
+        if handshake.group(0).startswith("Assigned"):
+            wait_for_pattern(server_out, r"Sent ID_ASSIGN", HANDSHAKE_TIMEOUT)
 
+        result.phase("action")
         client.stdin.write(b"ping\n")
         client.stdin.flush()
-        time.sleep(1)
 
-        server_log.flush()
-        server_log.close()
-        client_log.flush()
-        client_log.close()
-        print("📁 Server log closed.")
-        print("📁 Client log closed.")
+        print("📁 Server log: logs/server.log")
+        print("📁 Client log: logs/client_remote.log")
 
+        result.phase("validation")
         # ✅ Log validation
         with open("logs/server.log") as s_log, open("logs/client_remote.log") as c_log:
-            s_content = s_log.read()
-            c_content = c_log.read()
-
-            print("🔍 Server log preview:\n", s_content[:300])
-            print("🔍 Client log preview:\n", c_content[:300])
+            print("🔍 Server log preview:\n", s_log.read(300))
+            print("🔍 Client log preview:\n", c_log.read(300))
 
-            assert "Accepted connection" in s_content
-            assert "Sent ID_ASSIGN" in s_content
-            assert "Connected to server" in c_content
-            assert re.search(r"Assigned client ID: \d+", c_content)
+        assert_log("logs/server.log", {
+            "accepted": r"Accepted connection",
+            "id_assign": r"Sent ID_ASSIGN",
+        })
+        assert_log("logs/client_remote.log", {
+            "connected": r"Connected to server",
+            "assigned": r"Assigned client ID: \d+",
+        })
 
         logging.info("✅ smoke_remote test passed.")
     except Exception as e:
+        result.fail(e)
         logging.error(f"❌ smoke_remote test failed: {e}")
     finally:
         try:
-            server.terminate()
             client.terminate()
+            release_server(server)
         except:
             logging.warning("⚠️ Could not terminate one or more processes.")
+    return result.finish()
 
 if __name__ == "__main__":
-    run_smoke_remote()
+    run_standalone(run_smoke_remote)
@@ -5,89 +5,490 @@
 #  *        Ensures clean test environments by clearing logs before each run.
 #  *
 #  *        Functions:
+#  *        - resolve_environment(version): Versions, binaries and configs resolved and validated once
+#  *        - configure_logging(path): Sets up test_debug.log in the workspace (lazily, on first use)
+#  *        - list_versions(): Lists version folders in bins/, oldest first (scanned once)
 #  *        - get_latest_version(): Detects latest version folder in bins/
-#  *        - get_binary_path(name): Resolves platform-specific binary path
+#  *        - get_binary_path(name, version): Resolves platform-specific binary path (latest by default)
 #  *        - get_config_path(name): Resolves config file path by alias
+#  *        - get_workspace_dir(): Resolves the per-test workspace (logs/ and assets/)
+#  *        - get_client_env(name): Builds a client environment honoring port overrides
 #  *        - clear_logs(): Empties logs/ folder before each test
+#  *        - spawn(cmd, log_path): Starts a child whose stdout is tailed by an OutputTail
+#  *        - wait_for_pattern(stream, regex, timeout): Blocks until a child prints a matching line
+#  *        - start_timeline() / get_timeline(): Records spans and child output as a Chrome trace
+#  *        - phase(name): Context manager / decorator timing a span on the active timeline
 #  *
 #  * @author Oussama Amara
 #  * @version 2.3
 #  * @date 2025-10-12
 #  */
 
-import platform, os, re, logging
+import contextlib, functools, json, platform, os, re, logging, subprocess, threading, time
 
-# Setup logger
-logging.basicConfig(
-    filename="test_debug.log",
-    level=logging.DEBUG,
-    format="%(asctime)s [%(levelname)s] %(message)s"
-)
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+BINS_DIR = os.path.join(ROOT_DIR, "bins")
+CONFIGS_DIR = os.path.join(ROOT_DIR, "configs")
 
-def get_latest_version():
-    SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-    bins_dir = os.path.join(SCRIPT_DIR, "..", "bins")
-    versions = []
+BINARIES = ("server", "client")
+CONFIG_FILES = {
+    "server": "server.cfg",
+    "client_local": "client_local.cfg",
+    "client_remote": "client_remote.cfg",
+    "client_remote_file": "client_remote_file.cfg",
+    "client_local_file": "client_local_file.cfg",
+}
+# First bytes of a runnable binary per platform
+BINARY_MAGIC = {"Windows": b"MZ", "Darwin": b"\xcf\xfa\xed\xfe"}
+ELF_MAGIC = b"\x7fELF"
+
+LOG_FILE = "test_debug.log"
+
+# Harness messages go through this logger; nothing is written until configure_logging()
+logger = logging.getLogger("protocol_tests")
+_logging_configured = False
+
+def configure_logging(path=None):
+    """
+    Sends log messages to test_debug.log in the current workspace, once per process.
+    Called on first use (TestResult, spawn) rather than on import, so importing
+    utils from a tool or another directory leaves no stray log file behind.
+    """
+    global _logging_configured
+    if _logging_configured:
+        return
+    _logging_configured = True
+    logging.basicConfig(
+        filename=path or os.path.join(get_workspace_dir(), LOG_FILE),
+        level=logging.DEBUG,
+        format="%(asctime)s [%(levelname)s] %(message)s"
+    )
+
+# Environment overrides understood by the server and client binaries
+PORT_ENV_VARS = {
+    "chat": "CONFIG_PORT_CHAT",
+    "file": "CONFIG_PORT_FILE",
+    "game": "CONFIG_PORT_GAME",
+}
+
+# Channel served by each client config (the client enters file mode when its port is the file port)
+CONFIG_CHANNELS = {
+    "client_local": "chat",
+    "client_remote": "chat",
+    "client_local_file": "file",
+    "client_remote_file": "file",
+}
+
+WORKSPACE_ENV = "TEST_WORKSPACE"
+
+# Default timeouts (seconds) for event-driven waits
+STARTUP_TIMEOUT = 10     # Server bound to its ports
+HANDSHAKE_TIMEOUT = 20   # Client connected and assigned an ID / received START
+EVENT_TIMEOUT = 15       # Expected outcome of an action (forwarding, delivery, save)
+
+TRACE_MAX_EVENTS = 100000  # Child output lines stop being traced past this many events
+
+class Timeline:
+    """
+    Monotonic timestamps of harness spans (phases, waits, spawns) and of every
+    line printed by child processes, exported as Chrome trace-event JSON
+    (chrome://tracing, ui.perfetto.dev). The harness and each child get their
+    own track, keyed by pid, so server delays and harness overhead line up.
+    """
+
+    def __init__(self, name="test"):
+        self.name = name
+        self.pid = os.getpid()
+        self.events = []
+        self._lock = threading.Lock()
+        self._add_meta(self.pid, f"harness: {name}")
+
+    @staticmethod
+    def now_us():
+        return time.monotonic_ns() // 1000
+
+    def _add(self, event):
+        with self._lock:
+            self.events.append(event)
+
+    def _add_meta(self, pid, name):
+        self._add({"name": "process_name", "ph": "M", "pid": pid, "tid": pid, "args": {"name": name}})
 
-    logging.debug(f"Scanning bins directory: {bins_dir}")
+    def add_process(self, pid, name):
+        self._add_meta(pid, name)
 
+    def complete(self, name, start_us, end_us, cat="harness", pid=None, args=None):
+        self._add({"name": name, "cat": cat, "ph": "X", "ts": start_us, "dur": max(0, end_us - start_us),
+                   "pid": pid or self.pid, "tid": pid or self.pid, "args": args or {}})
+
+    def instant(self, name, ts_us=None, cat="output", pid=None, args=None):
+        if len(self.events) >= TRACE_MAX_EVENTS:
+            return
+        self._add({"name": name, "cat": cat, "ph": "i", "s": "t", "ts": ts_us or self.now_us(),
+                   "pid": pid or self.pid, "tid": pid or self.pid, "args": args or {}})
+
+    @contextlib.contextmanager
+    def span(self, name, cat="harness", **args):
+        start = self.now_us()
+        try:
+            yield
+        finally:
+            self.complete(name, start, self.now_us(), cat, args=args)
+
+    def to_dict(self):
+        with self._lock:
+            return {"traceEvents": list(self.events), "displayTimeUnit": "ms"}
+
+    def export(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f)
+        return path
+
+_timeline = None
+
+def start_timeline(name="test"):
+    """Activates a new Timeline; spawn(), wait_for_pattern() and phase() record into it."""
+    global _timeline
+    _timeline = Timeline(name)
+    return _timeline
+
+def get_timeline():
+    return _timeline
+
+def stop_timeline():
+    global _timeline
+    timeline, _timeline = _timeline, None
+    return timeline
+
+class phase(contextlib.ContextDecorator):
+    """
+    Times a span on the active timeline (no-op without one):
+    `with phase("spawn server"): ...` or `@phase("validate")`.
+    """
+
+    def __init__(self, name, cat="harness"):
+        self.name = name
+        self.cat = cat
+
+    def __enter__(self):
+        self.start = Timeline.now_us()
+        return self
+
+    def __exit__(self, *exc):
+        if _timeline is not None:
+            _timeline.complete(self.name, self.start, Timeline.now_us(), self.cat,
+                               args={"error": repr(exc[1])} if exc[1] else None)
+        return False
+
+@functools.lru_cache(maxsize=None)
+def _scan_versions():
+    logger.debug(f"Scanning bins directory: {BINS_DIR}")
+    versions = []
     try:
-        for entry in os.listdir(bins_dir):
+        for entry in os.listdir(BINS_DIR):
             if re.match(r'^\d+\.\d+$', entry):
                 versions.append(entry)
-                logging.debug(f"Found version folder: {entry}")
+                logger.debug(f"Found version folder: {entry}")
     except FileNotFoundError:
-        logging.error(f"Bins directory not found: {bins_dir}")
+        logger.error(f"Bins directory not found: {BINS_DIR}")
         raise
 
     if not versions:
-        logging.error("No version folders found in bins/")
+        logger.error("No version folders found in bins/")
         raise FileNotFoundError("No version folders found in bins/")
 
     versions.sort(key=lambda v: [int(x) for x in v.split('.')])
-    latest = versions[-1]
-    logging.info(f"Latest version selected: {latest}")
+    return tuple(versions)
+
+def list_versions():
+    """Returns the version folders found in bins/, oldest first. bins/ is scanned once per process."""
+    return list(_scan_versions())
+
+def get_latest_version():
+    latest = _scan_versions()[-1]
+    logger.info(f"Latest version selected: {latest}")
     return latest
 
-def get_binary_path(name):
+def get_binary_path(name, version=None):
+    """Path of binary `name` for `version` (default: the resolved environment's, else the latest)."""
+    if _environment is not None and version in (None, _environment.version) and name in _environment.binaries:
+        return _environment.binaries[name]
+    version = version or get_latest_version()
     system = platform.system()
-    version = get_latest_version()
-    SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-    base = os.path.join(SCRIPT_DIR, "..", "bins", version, "windows" if system == "Windows" else "linux")
+    base = os.path.join(BINS_DIR, version, "windows" if system == "Windows" else "linux")
     ext = ".exe" if system == "Windows" else ""
     binary_path = os.path.abspath(os.path.join(base, f"{name}{ext}"))
 
-    logging.info(f"Resolved binary path for '{name}': {binary_path}")
+    logger.info(f"Resolved binary path for '{name}': {binary_path}")
     return binary_path
 
 def get_config_path(name):
-    SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-    config_map = {
-        "server": "server.cfg",
-        "client_local": "client_local.cfg",
-        "client_remote": "client_remote.cfg",
-        "client_remote_file": "client_remote_file.cfg",
-        "client_local_file": "client_local_file.cfg",
-    }
-    filename = config_map.get(name)
+    filename = CONFIG_FILES.get(name)
     if not filename:
         raise ValueError(f"Unknown config name: {name}")
-    config_path = os.path.abspath(os.path.join(SCRIPT_DIR, "..", "configs", filename))
-    logging.info(f"Resolved config path for '{name}': {config_path}")
-    return config_path
+    return os.path.join(CONFIGS_DIR, filename)
+
+def check_binary(path):
+    """Returns what is wrong with the binary at `path` (missing, not executable, bad header), or None."""
+    if not os.path.isfile(path):
+        return "missing"
+    with open(path, "rb") as f:
+        magic = f.read(4)
+    expected = BINARY_MAGIC.get(platform.system(), ELF_MAGIC)
+    if not magic.startswith(expected):
+        return f"not a {platform.system()} executable (header {magic!r}, expected {expected!r})"
+    if platform.system() != "Windows" and not os.access(path, os.X_OK):
+        return "not executable (chmod +x)"
+    return None
+
+class Environment:
+    """
+    Versions, binary paths and config paths resolved once per run. validate()
+    checks every binary and config up front, so a broken drop in bins/ fails
+    before any test spends its timeouts on a process that never starts.
+    Plain attributes only: the runner pickles it to its worker processes.
+    """
+
+    def __init__(self, version=None):
+        self.versions = list_versions()
+        if version and version not in self.versions:
+            raise ValueError(f"Unknown version {version}, available: {', '.join(self.versions)}")
+        self.version = version or self.versions[-1]
+        self.binaries = {name: get_binary_path(name, self.version) for name in BINARIES}
+        self.configs = {name: get_config_path(name) for name in CONFIG_FILES}
+
+    def binary(self, name):
+        return self.binaries[name]
+
+    def config(self, name):
+        if name not in self.configs:
+            raise ValueError(f"Unknown config name: {name}")
+        return self.configs[name]
+
+    def problems(self):
+        found = [f"{path}: {problem}" for path, problem in
+                 ((path, check_binary(path)) for path in self.binaries.values()) if problem]
+        found += [f"{path}: missing" for path in self.configs.values() if not os.path.isfile(path)]
+        return found
+
+    def validate(self):
+        problems = self.problems()
+        if problems:
+            raise RuntimeError(f"❌ Version {self.version} is not runnable:\n   - " + "\n   - ".join(problems))
+        return self
+
+_environment = None
+
+def resolve_environment(version=None, validate=True):
+    """
+    Returns the Environment of this process, resolving (and validating) it on
+    first use. Later calls reuse it, and so does get_binary_path() without a version.
+    """
+    global _environment
+    if _environment is None or (version and version != _environment.version):
+        environment = Environment(version)
+        if validate:
+            environment.validate()
+        _environment = environment
+    return _environment
+
+def set_environment(environment):
+    """Installs an Environment resolved elsewhere (the runner hands its own to every worker)."""
+    global _environment
+    _environment = environment
+    return environment
+
+def get_workspace_dir():
+    """
+    Returns the directory holding logs/ and assets/ for the current test.
+    The parallel runner points TEST_WORKSPACE at a private folder per test;
+    standalone runs fall back to the repository root.
+    """
+    return os.path.abspath(os.environ.get(WORKSPACE_ENV) or ROOT_DIR)
+
+def get_client_env(name):
+    """
+    Returns the environment for a client launched with the given config alias.
+    When the runner assigned a port triple (CONFIG_PORT_CHAT/FILE/GAME), the
+    client's own CONFIG_PORT is pointed at the port of its channel.
+    """
+    env = os.environ.copy()
+    channel = CONFIG_CHANNELS.get(name)
+    if channel is None:
+        raise ValueError(f"Unknown client config name: {name}")
+    port = env.get(PORT_ENV_VARS[channel])
+    if port:
+        env["CONFIG_PORT"] = port
+        logger.info(f"Client '{name}' routed to {channel} port {port}")
+    return env
 
 def clear_logs():
     """
     Clears all files in the logs/ directory to ensure clean test output.
     Creates the folder if it doesn't exist.
     """
-    SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-    logs_dir = os.path.join(SCRIPT_DIR, "..", "logs")
+    logs_dir = os.path.join(get_workspace_dir(), "logs")
     os.makedirs(logs_dir, exist_ok=True)
 
     for f in os.listdir(logs_dir):
         try:
             os.remove(os.path.join(logs_dir, f))
-            logging.debug(f"Deleted log file: {f}")
+            logger.debug(f"Deleted log file: {f}")
         except Exception as e:
-            logging.warning(f"⚠️ Could not delete log file {f}: {e}")
+            logger.warning(f"⚠️ Could not delete log file {f}: {e}")
+
+class OutputTail:
+    """
+    Tails a child's stdout pipe on a background reader thread.
+    Every chunk is appended to the log file (logs/ keeps its role for later
+    inspection) and kept in memory so wait_for_pattern() can wake up as soon
+    as the expected line is printed. Prompts printed without a trailing newline
+    are visible as the current partial line.
+    With `max_lines`, only the most recent lines are kept in memory (long
+    benchmark runs); line indices stay absolute and `dropped` counts the rest.
+    A child shared by several tests (server_pool) is handed over with
+    redirect(): the log file changes and waits start from that point on.
+    `on_line(line, monotonic_ts)`, when set, is called on the reader thread for
+    every complete line (benchmarks timing the server's own log lines).
+    """
+
+    def __init__(self, stream, log_path=None, mode="a", name=None, max_lines=None, pid=None):
+        self.name = name or log_path or "child"
+        self.pid = pid
+        self.timeline = _timeline
+        self.lines = []
+        self.dropped = 0
+        self.base = 0
+        self.max_lines = max_lines
+        self.partial = ""
+        self.closed = False
+        self.on_line = None
+        self._cond = threading.Condition()
+        if log_path:
+            os.makedirs(os.path.dirname(log_path) or ".", exist_ok=True)
+        self._log = open(log_path, mode) if log_path else None
+        self._thread = threading.Thread(target=self._pump, args=(stream,), daemon=True)
+        self._thread.start()
+
+    def _pump(self, stream):
+        fd = stream.fileno()
+        while True:
+            try:
+                data = os.read(fd, 65536)
+            except OSError:
+                data = b""
+            if not data:
+                break
+            text = data.decode(errors="replace")
+            with self._cond:
+                if self._log:
+                    self._log.write(text)
+                    self._log.flush()
+                pieces = (self.partial + text).split("\n")
+                self.partial = pieces.pop()
+                self.lines.extend(line + "\n" for line in pieces)
+                if self.timeline is not None:
+                    now = Timeline.now_us()
+                    for line in pieces:
+                        self.timeline.instant(line[:120], now, pid=self.pid, args={"line": line})
+                if self.max_lines and len(self.lines) > 2 * self.max_lines:
+                    excess = len(self.lines) - self.max_lines
+                    del self.lines[:excess]
+                    self.dropped += excess
+                self._cond.notify_all()
+            if self.on_line:
+                now = time.monotonic()
+                for line in pieces:
+                    self.on_line(line, now)
+        with self._cond:
+            if self.partial:
+                self.lines.append(self.partial)
+                self.partial = ""
+            self.closed = True
+            self._cond.notify_all()
+            if self._log:
+                self._log.close()
+                self._log = None
+
+    def mark(self):
+        """Returns the current line index, to wait only for output printed after this point."""
+        with self._cond:
+            return self.dropped + len(self.lines)
+
+    def redirect(self, log_path, mode="a"):
+        """Mirrors further output to `log_path` and ignores earlier lines in waits (default start)."""
+        os.makedirs(os.path.dirname(log_path) or ".", exist_ok=True)
+        with self._cond:
+            if self._log:
+                self._log.close()
+            self._log = open(log_path, mode)
+            self.name = log_path
+            self.base = self.dropped + len(self.lines)
+            self.timeline = _timeline
+
+    def text(self, start=None):
+        with self._cond:
+            start = self.base if start is None else start
+            return "".join(self.lines[max(0, start - self.dropped):]) + self.partial
+
+    def wait_for(self, regex, timeout=EVENT_TIMEOUT, start=None, count=1):
+        pattern = re.compile(regex)
+        deadline = time.monotonic() + timeout
+        found = 0
+        index = self.base if start is None else start
+        with self._cond:
+            while True:
+                index = max(index, self.dropped)
+                while index < self.dropped + len(self.lines):
+                    match = pattern.search(self.lines[index - self.dropped])
+                    index += 1
+                    if match:
+                        found += 1
+                        if found >= count:
+                            return match
+                match = pattern.search(self.partial)
+                if match and found + 1 >= count:
+                    return match
+                remaining = deadline - time.monotonic()
+                if self.closed or remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+        reason = "stream closed" if self.closed else f"timed out after {timeout}s"
+        tail = "".join(self.lines[-10:]) + self.partial
+        logger.error(f"Pattern '{regex}' not seen in {self.name} ({reason}). Last output:\n{tail}")
+        raise TimeoutError(f"❌ '{regex}' not seen in {self.name} ({reason})")
+
+def wait_for_pattern(stream, regex, timeout=EVENT_TIMEOUT, start=None, count=1):
+    """
+    Blocks until `stream` (an OutputTail) prints a line matching `regex`
+    and returns the re.Match. Only lines from index `start` onwards are
+    considered (see OutputTail.mark(); by default since the stream was
+    spawned or last redirected); `count` waits for the Nth match.
+    Raises TimeoutError if the line does not appear in time or the child exits.
+    """
+    with phase(f"wait {regex}", cat="wait"):
+        match = stream.wait_for(regex, timeout, start, count)
+    logger.debug(f"Matched '{regex}' in {stream.name}: {match.group(0)}")
+    return match
+
+def spawn(cmd, log_path, stdin=False, env=None, mode="a", cwd=None, max_lines=None):
+    """
+    Starts a child process with stdout/stderr piped into an OutputTail that
+    mirrors the output to `log_path`. Returns (process, tail).
+    """
+    configure_logging()
+    with phase(f"spawn {os.path.basename(cmd[0])}", cat="spawn"):
+        proc = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE if stdin else None,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            env=env,
+            cwd=cwd
+        )
+    logger.info(f"Spawned {os.path.basename(cmd[0])} (pid {proc.pid}) -> {log_path}")
+    if _timeline is not None:
+        _timeline.add_process(proc.pid, f"{os.path.basename(cmd[0])} {log_path}")
+    return proc, OutputTail(proc.stdout, log_path, mode, name=log_path, max_lines=max_lines, pid=proc.pid)